@@ -0,0 +1,291 @@
+"""
+Versioned binary artifact bundle for the prediction API
+Packs the model weights, scaler statistics, feature order and zone distance
+table into a single file that the API memory-maps at startup, so worker
+processes share the same read-only pages instead of each parsing CSV/pickle files
+
+Build the bundle after training (run from model/api):
+    python artifact_bundle.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+BUNDLE_MAGIC = b'TAXIFARE'
+BUNDLE_FORMAT_VERSION = 1
+DEFAULT_BUNDLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'best_models', 'taxi_fare_bundle.bin'
+)
+
+# Array data is aligned so every memory-mapped view is properly aligned
+ALIGNMENT = 64
+
+# magic, format version, JSON header length
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def compute_model_version(weights, scaler_mean, scaler_scale):
+    """
+    Content hash identifying a set of model weights and scaler statistics
+    """
+    digest = hashlib.sha256()
+    for name in sorted(weights):
+        digest.update(name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(weights[name]).tobytes())
+    for values in (scaler_mean, scaler_scale):
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def source_fingerprints(paths):
+    """
+    Content hash of each existing training output a bundle is built from,
+    keyed by file name (missing files are left out)
+    """
+    fingerprints = {}
+    for path in paths:
+        if path and os.path.exists(path):
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            fingerprints[os.path.basename(path)] = digest.hexdigest()[:16]
+    return fingerprints
+
+
+def stale_sources(recorded, paths):
+    """
+    Names of the source files that differ from the ones a bundle was built from
+    A bundle without recorded sources (built before they were stored) can't be
+    checked, so every existing source file counts as changed
+    """
+    current = source_fingerprints(paths)
+    if recorded is None:
+        return sorted(current)
+    return sorted(name for name, fingerprint in current.items() if recorded.get(name) != fingerprint)
+
+
+def _array_views(mapping, array_index, data_start):
+    """Zero-copy views of every array in a mapped container file"""
+    arrays = {}
+    for name, spec in array_index.items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        view = mapping[start:start + count * dtype.itemsize].view(dtype)
+        arrays[name] = view.reshape(spec['shape'])
+    return arrays
+
+
+def create_container(path, magic, format_version, header, array_specs):
+    """
+    Create a container file (preamble, JSON header, aligned array data) and
+    return writable memory-mapped views of its arrays, so large arrays can be
+    filled in place without holding them in RAM
+
+    The file is created as path + '.tmp'; call commit_container() once the
+    arrays are filled so readers never see a partial file
+
+    Args:
+        array_specs: Dict of array name -> (dtype, shape)
+
+    Returns:
+        (tmp_path, dict of array name -> writable view)
+    """
+    array_index = {}
+    offset = 0
+    for name, (dtype, shape) in array_specs.items():
+        dtype = np.dtype(dtype)
+        offset = _align(offset)
+        array_index[name] = {
+            'dtype': dtype.str,
+            'shape': [int(n) for n in shape],
+            'offset': offset
+        }
+        offset += dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+    header = dict(header, arrays=array_index)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(magic, format_version, len(header_bytes)))
+        f.write(header_bytes)
+        f.truncate(data_start + offset)
+
+    mapping = np.memmap(tmp_path, dtype=np.uint8, mode='r+')
+    return tmp_path, _array_views(mapping, array_index, data_start)
+
+
+def commit_container(tmp_path, path, arrays):
+    """Flush a container created by create_container() and move it into place"""
+    for value in arrays.values():
+        base = value
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        if base is not None:
+            base.flush()
+    os.replace(tmp_path, path)
+
+
+def open_container(path, magic, format_version):
+    """
+    Memory-map a container file read-only
+
+    Returns:
+        (header dict, dict of array name -> read-only view)
+    """
+    mapping = np.memmap(path, dtype=np.uint8, mode='r')
+
+    file_magic, file_version, header_length = _PREAMBLE.unpack(bytes(mapping[:_PREAMBLE.size]))
+    if file_magic != magic:
+        raise ValueError(f"{path} is not a {magic.decode('ascii')} file")
+    if file_version != format_version:
+        raise ValueError(f"Unsupported format version {file_version} in {path} (expected {format_version})")
+
+    header_end = _PREAMBLE.size + header_length
+    header = json.loads(bytes(mapping[_PREAMBLE.size:header_end]).decode('utf-8'))
+    return header, _array_views(mapping, header['arrays'], _align(header_end))
+
+
+def write_bundle(path, weights, scaler_mean, scaler_scale, feature_order, distances=None, sources=None):
+    """
+    Write a bundle file
+
+    Args:
+        path: Output file path
+        weights: Dict of state_dict name -> numpy array
+        scaler_mean, scaler_scale: StandardScaler statistics in feature_order
+        feature_order: List of feature names the model expects
+        distances: Optional dense (N, N) float32 distance table indexed by LocationID
+        sources: Optional source_fingerprints() of the files the artifacts were loaded from
+
+    Returns:
+        The bundle header dict
+    """
+    arrays = {f'weights/{name}': np.ascontiguousarray(value) for name, value in weights.items()}
+    arrays['scaler/mean'] = np.ascontiguousarray(scaler_mean, dtype=np.float64)
+    arrays['scaler/scale'] = np.ascontiguousarray(scaler_scale, dtype=np.float64)
+    if distances is not None:
+        arrays['distances'] = np.ascontiguousarray(distances, dtype=np.float32)
+
+    # Hidden sizes follow from the Linear weight shapes (all but the output layer)
+    linear_weights = [value for name, value in weights.items()
+                      if name.endswith('.weight') and value.ndim == 2]
+    model_config = {
+        'input_size': len(feature_order),
+        'hidden_sizes': [int(w.shape[0]) for w in linear_weights[:-1]]
+    }
+
+    header = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': compute_model_version(weights, scaler_mean, scaler_scale),
+        'created': datetime.now().isoformat(),
+        'feature_order': list(feature_order),
+        'model_config': model_config,
+        'sources': sources
+    }
+
+    tmp_path, views = create_container(
+        path, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, header,
+        {name: (value.dtype, value.shape) for name, value in arrays.items()}
+    )
+    for name, value in arrays.items():
+        views[name][...] = value
+    commit_container(tmp_path, path, views)
+
+    return header
+
+
+class ArtifactBundle:
+    """
+    Read-only, memory-mapped view of a bundle file
+    All arrays are zero-copy views into the mapping
+    """
+    def __init__(self, path):
+        self.path = path
+        self.header, self.arrays = open_container(path, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION)
+
+    @property
+    def model_version(self):
+        return self.header['model_version']
+
+    @property
+    def feature_order(self):
+        return self.header['feature_order']
+
+    @property
+    def model_config(self):
+        return self.header['model_config']
+
+    @property
+    def sources(self):
+        return self.header.get('sources')
+
+    @property
+    def weights(self):
+        prefix = 'weights/'
+        return {name[len(prefix):]: value for name, value in self.arrays.items() if name.startswith(prefix)}
+
+    @property
+    def scaler_mean(self):
+        return self.arrays['scaler/mean']
+
+    @property
+    def scaler_scale(self):
+        return self.arrays['scaler/scale']
+
+    @property
+    def distances(self):
+        return self.arrays.get('distances')
+
+
+def load_bundle(path):
+    """Memory-map a bundle file"""
+    return ArtifactBundle(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the prediction API artifact bundle')
+    parser.add_argument('--output', default=DEFAULT_BUNDLE_PATH, help='Bundle file to write')
+    args = parser.parse_args()
+
+    # Load the artifacts exactly the way the API does, skipping any existing bundle
+    import predictionAPI
+
+    predictionAPI.load_model_and_scaler(bundle_path=None)
+
+    weights = predictionAPI.model_weights
+    distances = None
+    if predictionAPI.distance_matrix is not None:
+        distances = predictionAPI.distance_matrix.distances
+
+    header = write_bundle(
+        args.output,
+        weights,
+        predictionAPI.scaler.mean_,
+        predictionAPI.scaler.scale_,
+        predictionAPI.feature_engine.feature_order,
+        distances,
+        source_fingerprints(predictionAPI.BUNDLE_SOURCE_PATHS)
+    )
+
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"✅ Bundle written to {args.output} ({size_kb:.0f} KB)")
+    print(f"   Model version: {header['model_version']}")
+    print(f"   Feature order: {len(header['feature_order'])} features")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+ASGI version of the Taxi Fare Prediction API
+Serves the same routes with the same request/response shapes as the Flask app
+(the routes share the handlers in predictionAPI). Request bodies are read
+without blocking the event loop, and JSON parsing plus inference run on a
+bounded thread pool, so one process can hold thousands of idle keep-alive
+connections while only ASGI_INFERENCE_THREADS requests use the CPU at once.
+
+Usage (run from model/api):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import predictionAPI
+from predictionAPI import REQUEST_ERRORS_TOTAL, REQUEST_SECONDS, REQUESTS_TOTAL, STAGE_SECONDS, logger
+from metrics import REGISTRY
+
+# Threads running JSON parsing and inference
+ASGI_INFERENCE_THREADS = int(os.environ.get('ASGI_INFERENCE_THREADS', 4))
+
+# Requests allowed to wait for an inference thread; beyond this the API answers 503
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 1024))
+
+# Largest accepted request body (bytes)
+ASGI_MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 64 * 1024 * 1024))
+
+# (method, path) -> handler; GET handlers take no body, POST handlers take the parsed
+# JSON and the model routing headers
+GET_ROUTES = {
+    '/': lambda: (predictionAPI.health_payload(), 200),
+    '/ready': predictionAPI.readiness_payload,
+    '/metrics': lambda: (REGISTRY.render(), 200),
+    '/models': predictionAPI.models_payload,
+    '/features': lambda: (predictionAPI.features_payload(), 200)
+}
+POST_ROUTES = {
+    '/predict': predictionAPI.handle_predict,
+    '/predict_from_locations': predictionAPI.handle_predict_from_locations,
+    '/predict_from_coordinates': predictionAPI.handle_predict_from_coordinates,
+    '/predict/batch': predictionAPI.handle_predict_batch
+}
+
+_executor = None
+_pending = 0
+
+
+def collect_asgi_metrics():
+    """Requests holding or waiting for an ASGI inference thread, read at scrape time"""
+    return [('taxi_fare_asgi_pending_requests', 'gauge', 'Requests running on or queued for the ASGI thread pool',
+             [({}, _pending)])]
+
+
+REGISTRY.register_collector(collect_asgi_metrics)
+
+
+def parse_json_body(body):
+    """Parsed JSON body, or None when it is empty or not valid JSON (like get_json(silent=True))"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def run_post_handler(handler, body, routing):
+    """Parse the body and run a handler (called on the inference pool)"""
+    with STAGE_SECONDS.time('parse'):
+        data = parse_json_body(body)
+    return handler(data, **routing)
+
+
+def model_routing(headers):
+    """X-Model and X-Routing-Key request headers as handler keyword arguments"""
+    model_name = headers.get(b'x-model')
+    routing_key = headers.get(b'x-routing-key')
+    return {
+        'model_name': model_name.decode('latin-1') if model_name else None,
+        'routing_key': routing_key.decode('latin-1') if routing_key else None
+    }
+
+
+async def read_body(receive):
+    """Read the full request body; None if it exceeds ASGI_MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def send_json(send, payload, status, content_type=b'application/json'):
+    with STAGE_SECONDS.time('serialize'):
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def not_found_payload():
+    payload = predictionAPI.not_found_payload()
+    payload['available_endpoints'] = ([f'GET {path}' for path in GET_ROUTES]
+                                      + [f'POST {path}' for path in POST_ROUTES]
+                                      + ['GET|POST /admin/reload'])
+    return payload
+
+
+async def run_in_pool(function, *args):
+    """
+    Run function on the bounded inference pool
+    Returns None when too many requests are already waiting
+    """
+    global _pending
+
+    if _pending >= ASGI_MAX_PENDING:
+        return None
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+    finally:
+        _pending -= 1
+
+
+async def handle_http(scope, receive, send):
+    """Route one request and record its latency and status"""
+    start_time = time.perf_counter()
+    method = scope['method']
+    path = scope['path']
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    status_codes = []
+
+    async def send_with_status(message):
+        if message['type'] == 'http.response.start':
+            status_codes.append(message['status'])
+        await send(message)
+
+    try:
+        await route_request(scope, method, path, receive, send_with_status)
+    finally:
+        route = path if path in GET_ROUTES or path in POST_ROUTES or path == '/admin/reload' else 'unmatched'
+        status = status_codes[0] if status_codes else 500
+        if route != '/metrics':
+            REQUEST_SECONDS.observe(time.perf_counter() - start_time, route)
+        REQUESTS_TOTAL.inc(route, method, str(status))
+        if status >= 400:
+            REQUEST_ERRORS_TOTAL.inc(route)
+
+
+async def route_request(scope, method, path, receive, send):
+    """Dispatch to the shared handlers and send the response"""
+    headers = dict(scope['headers'])
+
+    # CORS preflight, matching flask-cors defaults
+    if method == 'OPTIONS':
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'access-control-allow-origin', b'*'),
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'*'),
+                (b'content-length', b'0')
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    if method in ('GET', 'HEAD') and path in GET_ROUTES:
+        result = await run_in_pool(GET_ROUTES[path])
+    elif method == 'POST' and path in POST_ROUTES:
+        body = await read_body(receive)
+        if body is None:
+            await send_json(send, {
+                'status': 'error',
+                'message': f'Request body missing or larger than {ASGI_MAX_BODY_BYTES} bytes'
+            }, 413)
+            return
+        result = await run_in_pool(run_post_handler, POST_ROUTES[path], body, model_routing(headers))
+    elif path == '/admin/reload' and method in ('GET', 'POST'):
+        params = parse_qs(scope['query_string'].decode('latin-1')) if method == 'POST' else None
+        token = headers.get(b'x-admin-token', b'').decode('latin-1') or None
+        client = scope.get('client') or ('', 0)
+        result = await run_in_pool(predictionAPI.handle_admin_reload,
+                                   {name: values[-1] for name, values in params.items()} if params is not None else None,
+                                   token, client[0])
+    elif path in GET_ROUTES or path in POST_ROUTES:
+        await send_json(send, {'status': 'error', 'message': 'Method not allowed'}, 405)
+        return
+    else:
+        await send_json(send, not_found_payload(), 404)
+        return
+
+    if result is None:
+        await send_json(send, {'status': 'error', 'message': 'Server busy, retry later'}, 503)
+        return
+
+    payload, status = result
+    if path == '/metrics':
+        await send_json(send, payload, status, b'text/plain; version=0.0.4')
+    else:
+        await send_json(send, payload, status)
+
+
+async def handle_lifespan(receive, send):
+    global _executor
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                _executor = ThreadPoolExecutor(max_workers=ASGI_INFERENCE_THREADS, thread_name_prefix='inference')
+                await asyncio.get_running_loop().run_in_executor(_executor, predictionAPI.load_model_and_scaler)
+                predictionAPI.start_reload_watcher()
+                logger.info(f"ASGI app ready ({ASGI_INFERENCE_THREADS} inference threads, "
+                            f"up to {ASGI_MAX_PENDING} pending requests)")
+            except Exception as e:
+                logger.error(f"Failed to start API: {str(e)}")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            predictionAPI.reloader.stop_watching()
+            if predictionAPI.coalescer is not None:
+                predictionAPI.coalescer.stop()
+            _executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    elif scope['type'] == 'http':
+        await handle_http(scope, receive, send)
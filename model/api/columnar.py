@@ -0,0 +1,87 @@
+"""
+Columnar request decoding for service-to-service batch scoring
+Trips arrive either as an Arrow IPC stream with one column per feature, or as
+a raw little-endian float32 buffer in feature_order, and are decoded straight
+into the (N, F) float32 model input without building per-trip dicts. Fares go
+back as a packed little-endian float32 array.
+"""
+
+import numpy as np
+
+ARROW_STREAM_MIMETYPES = ('application/vnd.apache.arrow.stream', 'application/x-arrow-stream')
+RAW_FLOAT32_MIMETYPES = ('application/octet-stream', 'application/x-float32')
+
+# Raw buffer layouts: one trip per row ((N, F), C order) or one feature per row ((F, N))
+RAW_LAYOUTS = ('rows', 'columns')
+
+
+def decode_raw_float32(body, n_features, layout='rows'):
+    """
+    View a raw float32 buffer as an (N, n_features) feature matrix without copying
+    The 'columns' layout is returned as a transposed view of the (F, N) buffer
+    """
+    if layout not in RAW_LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}' (expected one of {RAW_LAYOUTS})")
+
+    row_bytes = 4 * n_features
+    if len(body) % row_bytes:
+        raise ValueError(f"Body is {len(body)} bytes, not a multiple of {row_bytes} "
+                         f"({n_features} float32 features per trip)")
+
+    values = np.frombuffer(body, dtype='<f4')
+    if layout == 'rows':
+        return values.reshape(-1, n_features)
+    return values.reshape(n_features, -1).T
+
+
+def decode_arrow_stream(body, feature_order, defaults, day_mapping):
+    """
+    Decode an Arrow IPC stream into an (N, F) float32 feature matrix
+    Columns are matched by feature name (case-insensitively); missing columns
+    and null values take the feature defaults, and pickup_day may hold day
+    names. Numeric columns are read through zero-copy NumPy views, so each
+    value is copied once, into its place in the model input.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    columns = {name.lower(): name for name in table.column_names}
+    features_array = np.empty((table.num_rows, len(feature_order)), dtype=np.float32)
+
+    for j, feature in enumerate(feature_order):
+        name = columns.get(feature.lower())
+        default = defaults.get(feature, 0.0)
+        if name is None:
+            features_array[:, j] = default
+            continue
+
+        column = table.column(name)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            if feature != 'pickup_day':
+                raise ValueError(f"Column '{name}' must be numeric, got {column.type}")
+            features_array[:, j] = [default if day is None else day_mapping.get(day, 0)
+                                    for day in column.to_pylist()]
+            continue
+        if pa.types.is_dictionary(column.type) or not (pa.types.is_integer(column.type)
+                                                       or pa.types.is_floating(column.type)):
+            raise ValueError(f"Column '{name}' must be numeric, got {column.type}")
+
+        if column.null_count:
+            column = pc.fill_null(column.cast(pa.float32()), pa.scalar(default, type=pa.float32()))
+        for start, chunk in _chunk_offsets(column):
+            features_array[start:start + len(chunk), j] = chunk.to_numpy(zero_copy_only=True)
+
+    return features_array
+
+
+def _chunk_offsets(column):
+    start = 0
+    for chunk in column.chunks:
+        yield start, chunk
+        start += len(chunk)
+
+
+def encode_fares(fares):
+    """Pack fares as little-endian float32 bytes"""
+    return np.ascontiguousarray(fares, dtype='<f4').tobytes()
@@ -0,0 +1,142 @@
+"""
+CPU concurrency settings for inference
+torch sizes its intra-op pool to every core by default, so each single-row
+forward pass wakes all of them; with several request threads or worker
+processes that oversubscribes the host and p99 latency climbs. This module
+pins torch's intra- and inter-op threads and provides a fixed-size inference
+pool, so the number of concurrent forward passes is bounded no matter how many
+request threads the server runs. peak_rss_mb reports the memory of a process
+and its worker processes for the offline pool-based tools.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ('inline', 'pool')
+
+
+def configure_torch_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Set torch's intra-op and inter-op thread counts for this process
+    None (or 0) leaves a setting at torch's default. Returns the resulting
+    (intra, inter) counts; no-op without torch.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None, None
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads and torch.get_num_interop_threads() != inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            # Only allowed once, before any inter-op work (e.g. again in a forked worker)
+            logger.warning(f"Could not set torch inter-op threads to {inter_op_threads}: {e}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def peak_rss_mb():
+    """Peak resident memory (MB) of this process and of its largest finished child, or (None, None) on Windows"""
+    if resource is None:
+        return None, None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+class PoolFullError(RuntimeError):
+    """Raised when the inference pool queue is full"""
+
+
+class InferencePool:
+    """
+    Fixed-size pool of threads that run inference calls
+
+    Args:
+        threads: Threads running calls (the maximum number of concurrent forward passes)
+        max_queue: Calls allowed to wait for a thread; beyond this run() raises PoolFullError
+        name: Thread name prefix
+        on_wait: Optional callback given each call's queue wait in seconds
+    """
+    def __init__(self, threads=1, max_queue=256, name='inference', on_wait=None):
+        self.threads = threads
+        self.max_queue = max_queue
+        self.on_wait = on_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.busy = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+
+        self._workers = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+                         for i in range(threads)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def on_pool_thread(self):
+        return getattr(self._local, 'is_worker', False)
+
+    def run(self, function, *args, **kwargs):
+        """
+        Run function on the pool and return its result (blocking the caller)
+        Calls made from a pool thread run directly, so nested calls can't deadlock
+        """
+        if self.on_pool_thread:
+            return function(*args, **kwargs)
+
+        future = Future()
+        try:
+            self._queue.put_nowait((function, args, kwargs, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise PoolFullError(f"Inference queue is full ({self.max_queue} calls waiting)")
+        return future.result()
+
+    def _run(self):
+        self._local.is_worker = True
+        while True:
+            function, args, kwargs, future, submitted = self._queue.get()
+            wait_seconds = time.perf_counter() - submitted
+            with self._lock:
+                self.busy += 1
+                self.wait_seconds_total += wait_seconds
+            if self.on_wait is not None:
+                self.on_wait(wait_seconds)
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                'threads': self.threads,
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'busy_threads': self.busy,
+                'completed_total': completed,
+                'rejected_total': self.rejected,
+                'mean_wait_ms': round(self.wait_seconds_total / completed * 1000, 3) if completed else 0.0
+            }
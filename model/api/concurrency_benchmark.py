@@ -0,0 +1,162 @@
+"""
+Benchmark of torch thread and inference pool settings
+Runs each combination of intra-op threads, execution mode (inline or pool) and
+client concurrency in a fresh process (torch thread counts are fixed per
+process), drives a single-row workload (handle_predict) and a batch workload
+(handle_predict_batch) from concurrent client threads, and reports throughput
+and p50/p99 latency, then the best setting for each workload by p99.
+
+Usage (run from model/api):
+    python concurrency_benchmark.py
+    python concurrency_benchmark.py --intra 1 2 4 0 --clients 1 8 32 --output concurrency.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+TRIPS_CSV = os.path.join(API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv')
+
+
+def run_config(workload, clients, duration, batch_size):
+    """Drive one workload from `clients` threads for `duration` seconds in this process"""
+    import logging
+
+    import pandas as pd
+
+    import predictionAPI
+
+    logging.getLogger('predictionAPI').setLevel(logging.ERROR)
+    predictionAPI.load_model_and_scaler()
+
+    trips = pd.read_csv(TRIPS_CSV, index_col=0).drop(columns=['fare_amount']).head(5000).to_dict('records')
+    if workload == 'single':
+        def call(i):
+            return predictionAPI.handle_predict(dict(trips[i % len(trips)]))
+    else:
+        def call(i):
+            start = (i * batch_size) % (len(trips) - batch_size)
+            return predictionAPI.handle_predict_batch({'trips': [dict(trip) for trip in trips[start:start + batch_size]]})
+
+    for i in range(20):
+        call(i)
+
+    deadline = time.perf_counter() + duration
+    results = [[] for _ in range(clients)]
+
+    def client(index):
+        latencies = results[index]
+        i = index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            _, status = call(i)
+            latencies.append((time.perf_counter() - start, status))
+            i += clients
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for client_samples in results for sample in client_samples]
+    latencies_ms = np.array([latency for latency, _ in samples]) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    rows = len(samples) * (1 if workload == 'single' else batch_size)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status in samples if status != 200),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'rows_per_second': round(rows / elapsed, 1),
+        'latency_ms': {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+    }
+
+
+def spawn_config(config, duration, batch_size):
+    """Run one configuration in a child process and return its results"""
+    env = dict(os.environ)
+    env.update({
+        'TORCH_INTRA_OP_THREADS': str(config['intra']),
+        'TORCH_INTER_OP_THREADS': str(config['inter']),
+        'INFERENCE_EXECUTION': config['execution'],
+        'INFERENCE_POOL_THREADS': str(config['pool_threads']),
+        'INFERENCE_POOL_MAX_QUEUE': str(max(256, config['clients'] * 2))
+    })
+    command = [sys.executable, os.path.abspath(__file__), '--child', config['workload'],
+               '--child-clients', str(config['clients']), '--duration', str(duration),
+               '--batch-size', str(batch_size)]
+    output = subprocess.run(command, env=env, cwd=API_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the best torch thread and inference pool settings')
+    parser.add_argument('--workloads', nargs='+', choices=['single', 'batch'], default=['single', 'batch'])
+    parser.add_argument('--intra', type=int, nargs='+', default=[1, 2, 0],
+                        help='torch intra-op threads to try (0 = torch default, one per core)')
+    parser.add_argument('--inter', type=int, default=1, help='torch inter-op threads')
+    parser.add_argument('--execution', nargs='+', choices=['inline', 'pool'], default=['inline', 'pool'])
+    parser.add_argument('--pool-threads', type=int, nargs='+', default=[1, 2], help='Inference pool sizes to try')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32], help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per configuration')
+    parser.add_argument('--batch-size', type=int, default=256, help='Trips per batch request')
+    parser.add_argument('--output', help='Save results as JSON')
+    parser.add_argument('--child', choices=['single', 'batch'], help=argparse.SUPPRESS)
+    parser.add_argument('--child-clients', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_config(args.child, args.child_clients, args.duration, args.batch_size)))
+        return
+
+    configs = []
+    for workload, intra, clients, execution in itertools.product(args.workloads, args.intra, args.clients, args.execution):
+        for pool_threads in (args.pool_threads if execution == 'pool' else [0]):
+            configs.append({'workload': workload, 'intra': intra, 'inter': args.inter, 'execution': execution,
+                            'pool_threads': pool_threads, 'clients': clients})
+
+    print(f"🚕 Concurrency benchmark: {len(configs)} configurations, {args.duration}s each, "
+          f"{os.cpu_count()} CPUs")
+    print(f"   {'workload':<8} {'intra':>5} {'execution':<9} {'pool':>4} {'clients':>7} "
+          f"{'req/s':>9} {'rows/s':>11} {'p50 ms':>8} {'p99 ms':>8}")
+
+    results = []
+    for config in configs:
+        stats = spawn_config(config, args.duration, args.batch_size)
+        results.append(dict(config, **stats))
+        intra = config['intra'] or 'all'
+        print(f"   {config['workload']:<8} {intra:>5} {config['execution']:<9} {config['pool_threads'] or '-':>4} "
+              f"{config['clients']:>7} {stats['requests_per_second']:>9,.1f} {stats['rows_per_second']:>11,.0f} "
+              f"{stats['latency_ms']['p50']:8.2f} {stats['latency_ms']['p99']:8.2f}")
+
+    print("\n📊 Lowest p99 per workload and client count")
+    best = {}
+    for (workload, clients), group in itertools.groupby(
+            sorted(results, key=lambda r: (r['workload'], r['clients'])), key=lambda r: (r['workload'], r['clients'])):
+        winner = min(group, key=lambda r: (r['latency_ms']['p99'], -r['requests_per_second']))
+        best[f'{workload}/{clients}'] = winner
+        setting = f"TORCH_INTRA_OP_THREADS={winner['intra']} INFERENCE_EXECUTION={winner['execution']}"
+        if winner['execution'] == 'pool':
+            setting += f" INFERENCE_POOL_THREADS={winner['pool_threads']}"
+        print(f"   {workload:<8} {clients:>3} clients: {setting} "
+              f"(p99 {winner['latency_ms']['p99']:.2f} ms, {winner['requests_per_second']:,.0f} req/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'duration_seconds': args.duration,
+                       'batch_size': args.batch_size, 'results': results, 'best': best}, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
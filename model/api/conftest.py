@@ -0,0 +1,3 @@
+# test_api.py, quick_test.py and load_test.py exercise a running server; they are
+# scripts, not pytest tests (the unit tests live in tests/)
+collect_ignore = ['test_api.py', 'quick_test.py', 'load_test.py']
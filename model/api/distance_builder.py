@@ -0,0 +1,249 @@
+"""
+Zone distance matrix builder
+Computes every pairwise distance between the geocoded taxi zones in one
+vectorized pass (instead of the notebook's per-pair geopy loop) and writes the
+matrix as a CSV and as a dense float32 array in the ZoneDistanceTable layout.
+Distances are in kilometres, like the notebook's geodesic(...).kilometers:
+- haversine:   great circle on a sphere of the mean Earth radius
+- ellipsoidal: Vincenty's inverse formula on the WGS-84 ellipsoid (what geopy's
+               geodesic computes, to well under a millimetre at city scale)
+
+The coordinates each build used are saved next to the binary output, so an
+incremental build only recomputes the rows and columns of zones whose
+coordinates changed.
+
+Usage (run from model/api):
+    python distance_builder.py
+    python distance_builder.py --method haversine --output-csv /tmp/matrix.csv
+    python distance_builder.py --incremental
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from distance_table import MAX_LOCATION_ID, MISSING_DISTANCE
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+DISTANCES_DIR = os.path.join(API_DIR, '..', 'distances')
+ZONES_PATH = os.path.join(DISTANCES_DIR, 'complete_geocoded_taxi_zones.csv')
+OUTPUT_CSV_PATH = os.path.join(DISTANCES_DIR, 'complete_distance_matrix.csv')
+OUTPUT_BINARY_PATH = os.path.join(DISTANCES_DIR, 'complete_distance_matrix.npy')
+
+METHODS = ('haversine', 'ellipsoidal')
+
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1 - WGS84_F)
+
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_MAX_ITERATIONS = 200
+
+
+def read_zone_coordinates(path=ZONES_PATH):
+    """
+    Zone coordinates from a geocoded zones CSV
+    Returns (location_ids, coordinates): the LocationIDs in file order and a
+    (MAX_LOCATION_ID + 1, 2) float64 array of (latitude, longitude) indexed by
+    LocationID, NaN for zones without coordinates
+    """
+    zones = pd.read_csv(path)
+    location_ids = zones['Location ID'].to_numpy(dtype=np.int64)
+    size = max(MAX_LOCATION_ID, location_ids.max(initial=0)) + 1
+
+    coordinates = np.full((size, 2), np.nan)
+    coordinates[location_ids, 0] = zones['Latitude'].to_numpy(dtype=np.float64)
+    coordinates[location_ids, 1] = zones['Longitude'].to_numpy(dtype=np.float64)
+    return location_ids, coordinates
+
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between broadcastable arrays of points (degrees)"""
+    lat1, lon1, lat2, lon2 = (np.radians(values) for values in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def ellipsoidal_distances(lat1, lon1, lat2, lon2):
+    """
+    WGS-84 distance in km between broadcastable arrays of points (degrees)
+    Vincenty's inverse formula, iterated for all pairs at once until every pair
+    has converged. Nearly antipodal pairs, where it does not converge, fall
+    back to haversine; no two taxi zones come anywhere near that.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.radians(np.asarray(values, dtype=np.float64))
+                                                   for values in (lat1, lon1, lat2, lon2)))
+    u1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lon_diff = lon2 - lon1
+    lam = lon_diff.copy()
+    active = np.ones(lam.shape, dtype=bool)
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+
+        coincident = sin_sigma == 0
+        sin_alpha = np.where(coincident, 0.0, cos_u1 * cos_u2 * sin_lam / np.where(coincident, 1.0, sin_sigma))
+        cos2_alpha = 1 - sin_alpha ** 2
+        equatorial = cos2_alpha == 0
+        cos_2sigma_m = np.where(equatorial, 0.0,
+                                cos_sigma - 2 * sin_u1 * sin_u2 / np.where(equatorial, 1.0, cos2_alpha))
+        c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+
+        new_lam = lon_diff + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+        active = np.abs(new_lam - lam) > VINCENTY_TOLERANCE
+        lam = new_lam
+        if not active.any():
+            break
+
+    u_squared = cos2_alpha * (WGS84_A_KM ** 2 - WGS84_B_KM ** 2) / WGS84_B_KM ** 2
+    a = 1 + u_squared / 16384 * (4096 + u_squared * (-768 + u_squared * (320 - 175 * u_squared)))
+    b = u_squared / 1024 * (256 + u_squared * (-128 + u_squared * (74 - 47 * u_squared)))
+    delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+        b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    distances = WGS84_B_KM * a * (sigma - delta_sigma)
+
+    if active.any():
+        distances[active] = haversine_distances(*(np.degrees(values[active]) for values in (lat1, lon1, lat2, lon2)))
+    return distances
+
+
+DISTANCE_FUNCTIONS = {'haversine': haversine_distances, 'ellipsoidal': ellipsoidal_distances}
+
+
+def distances_from(coordinates, zone_ids, method='ellipsoidal'):
+    """
+    (len(zone_ids), size) distances from the given zones to every zone
+    NaN where either zone has no coordinates; 0 from a located zone to itself
+    """
+    if method not in DISTANCE_FUNCTIONS:
+        raise ValueError(f"Unknown distance method '{method}' (expected one of {METHODS})")
+    zone_ids = np.asarray(zone_ids, dtype=np.int64)
+    origins = coordinates[zone_ids]
+    with np.errstate(invalid='ignore'):
+        rows = DISTANCE_FUNCTIONS[method](origins[:, :1], origins[:, 1:],
+                                          coordinates[None, :, 0], coordinates[None, :, 1])
+    located = ~np.isnan(origins[:, 0])
+    rows[np.flatnonzero(located), zone_ids[located]] = 0.0
+    return rows
+
+
+def build_distance_matrix(coordinates, method='ellipsoidal'):
+    """Full (size, size) float64 distance matrix for a LocationID-indexed coordinate array"""
+    return distances_from(coordinates, np.arange(len(coordinates)), method)
+
+
+def changed_zones(previous_coordinates, coordinates):
+    """LocationIDs whose coordinates differ between two coordinate arrays (NaN counts as a value)"""
+    if previous_coordinates.shape != coordinates.shape:
+        return np.arange(len(coordinates))
+    same = (previous_coordinates == coordinates) | (np.isnan(previous_coordinates) & np.isnan(coordinates))
+    return np.flatnonzero(~same.all(axis=1))
+
+
+def update_distance_matrix(distances, previous_coordinates, coordinates, method='ellipsoidal'):
+    """
+    Bring a distance matrix built from previous_coordinates up to date in place
+    Only the rows and columns of zones whose coordinates changed are
+    recomputed. Returns the changed LocationIDs.
+    """
+    changed = changed_zones(previous_coordinates, coordinates)
+    if len(changed):
+        rows = distances_from(coordinates, changed, method)
+        distances[changed, :] = rows
+        distances[:, changed] = rows.T
+    return changed
+
+
+def to_table_array(distances):
+    """float32 copy in the ZoneDistanceTable layout (unknown pairs stored as MISSING_DISTANCE)"""
+    table = distances.astype(np.float32)
+    table[np.isnan(table)] = MISSING_DISTANCE
+    return table
+
+
+def state_path(binary_path):
+    """Where the coordinates and float64 distances of the last build are kept"""
+    return os.path.splitext(binary_path)[0] + '.state.npz'
+
+
+def save_build(distances, coordinates, method, binary_path):
+    np.save(binary_path, to_table_array(distances))
+    np.savez(state_path(binary_path), distances=distances, coordinates=coordinates, method=method)
+
+
+def load_build(binary_path):
+    """(distances, coordinates, method) of the last build next to binary_path, or None"""
+    path = state_path(binary_path)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as state:
+        return state['distances'], state['coordinates'], str(state['method'])
+
+
+def write_distance_csv(path, distances, location_ids):
+    """Write the matrix for location_ids as a CSV labelled by LocationID (blank cells for unknown pairs)"""
+    matrix = pd.DataFrame(distances[np.ix_(location_ids, location_ids)], index=location_ids, columns=location_ids)
+    matrix.to_csv(path, index_label='Location ID')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the zone-to-zone distance matrix')
+    parser.add_argument('--zones', default=ZONES_PATH, help='Geocoded zones CSV')
+    parser.add_argument('--method', choices=METHODS, default='ellipsoidal')
+    parser.add_argument('--output-csv', default=OUTPUT_CSV_PATH, help='Distance matrix CSV')
+    parser.add_argument('--output-binary', default=OUTPUT_BINARY_PATH, help='Dense float32 .npy table')
+    parser.add_argument('--no-csv', action='store_true', help='Only write the binary table')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Recompute only zones whose coordinates changed since the last build')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    location_ids, coordinates = read_zone_coordinates(args.zones)
+    located = int(np.count_nonzero(~np.isnan(coordinates[location_ids, 0])))
+    print(f"🚕 {len(location_ids)} zones ({located} with coordinates), {args.method} distances")
+
+    previous = load_build(args.output_binary) if args.incremental else None
+    if args.incremental and previous is None:
+        print("   No previous build found, computing the full matrix")
+    elif previous is not None and previous[2] != args.method:
+        print(f"   Previous build used {previous[2]} distances, computing the full matrix")
+        previous = None
+
+    compute_start = time.perf_counter()
+    if previous is not None and previous[0].shape == (len(coordinates), len(coordinates)):
+        distances, previous_coordinates, _ = previous
+        changed = update_distance_matrix(distances, previous_coordinates, coordinates, args.method)
+        print(f"   Recomputed {len(changed)} changed zone(s)"
+              + (f": {', '.join(str(zone) for zone in changed[:20])}" if len(changed) else ""))
+    else:
+        distances = build_distance_matrix(coordinates, args.method)
+        print(f"   Computed {len(coordinates) ** 2:,} pairs")
+    compute_ms = (time.perf_counter() - compute_start) * 1000
+
+    save_build(distances, coordinates, args.method, args.output_binary)
+    print(f"✅ Binary table saved to {args.output_binary}")
+    if not args.no_csv:
+        write_distance_csv(args.output_csv, distances, location_ids)
+        print(f"✅ CSV saved to {args.output_csv}")
+
+    known = distances[location_ids][:, location_ids]
+    known = known[known > 0]
+    print(f"📊 {compute_ms:.1f} ms computing, {(time.perf_counter() - start_time) * 1000:.1f} ms total; "
+          f"distances {known.min():.2f}-{known.max():.2f} km (mean {known.mean():.2f} km)")
+
+
+if __name__ == '__main__':
+    main()
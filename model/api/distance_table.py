@@ -0,0 +1,86 @@
+"""
+Dense zone-to-zone distance lookup table
+Replaces label-based DataFrame lookups with direct array indexing by LocationID
+"""
+
+import numpy as np
+import pandas as pd
+
+# TLC LocationIDs run from 1 to 265; row/column 0 is unused
+MAX_LOCATION_ID = 265
+
+# Stored for zone pairs that have no distance in the source matrix
+MISSING_DISTANCE = -1.0
+
+
+class ZoneDistanceTable:
+    """
+    Contiguous float32 distance table indexed directly by [pickup_id, dropoff_id]
+    """
+    def __init__(self, distances):
+        distances = np.ascontiguousarray(distances, dtype=np.float32)
+        if distances.ndim != 2 or distances.shape[0] != distances.shape[1]:
+            raise ValueError(f"Distance table must be square, got shape {distances.shape}")
+        self.distances = distances
+        self.size = distances.shape[0]
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build the table from a distance matrix DataFrame labelled by LocationID"""
+        row_ids = np.asarray(df.index, dtype=np.int64)
+        col_ids = np.asarray([int(c) for c in df.columns], dtype=np.int64)
+        size = max(MAX_LOCATION_ID, row_ids.max(initial=0), col_ids.max(initial=0)) + 1
+
+        distances = np.full((size, size), MISSING_DISTANCE, dtype=np.float32)
+        values = df.to_numpy(dtype=np.float32)
+        values[np.isnan(values)] = MISSING_DISTANCE
+        distances[np.ix_(row_ids, col_ids)] = values
+        return cls(distances)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Build the table from a distance matrix CSV (first column holds LocationIDs)"""
+        return cls.from_dataframe(pd.read_csv(path, index_col=0))
+
+    @classmethod
+    def from_npy(cls, path):
+        """Load a dense table saved with np.save (as written by distance_builder.py)"""
+        return cls(np.load(path))
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a .npy table or a distance matrix CSV, by file extension"""
+        if path.endswith('.npy'):
+            return cls.from_npy(path)
+        return cls.from_csv(path)
+
+    @property
+    def nbytes(self):
+        return self.distances.nbytes
+
+    def lookup(self, pickup_id, dropoff_id):
+        """
+        Distance in kilometres between two zones (geodesic, like the notebook), or None if the pair is unknown
+        """
+        if 0 <= pickup_id < self.size and 0 <= dropoff_id < self.size:
+            distance = self.distances[pickup_id, dropoff_id]
+            if distance != MISSING_DISTANCE:
+                return float(distance)
+        return None
+
+    def lookup_many(self, pickup_ids, dropoff_ids, default=np.nan):
+        """
+        Vectorized lookup for arrays of zone pairs
+        Unknown pairs (including out-of-range IDs) are filled with default
+        """
+        pickup_ids, dropoff_ids = np.broadcast_arrays(
+            np.asarray(pickup_ids, dtype=np.int64),
+            np.asarray(dropoff_ids, dtype=np.int64)
+        )
+
+        in_range = ((pickup_ids >= 0) & (pickup_ids < self.size) &
+                    (dropoff_ids >= 0) & (dropoff_ids < self.size))
+        distances = np.full(pickup_ids.shape, default, dtype=np.float32)
+        distances[in_range] = self.distances[pickup_ids[in_range], dropoff_ids[in_range]]
+        distances[distances == MISSING_DISTANCE] = default
+        return distances
@@ -0,0 +1,196 @@
+"""
+Precomputed fare table for location-based quotes
+/predict_from_locations only varies by zone pair, hour, day, month and
+passenger count, so every answer can be computed offline in large vectorized
+batches. The table is memory-mapped at startup and quotes become an array lookup.
+
+Build the table after training (run from model/api):
+    python fare_table.py --dtype uint16 --months 1 --passenger-counts 1 2 3 4
+
+The table records the model and distance matrix versions it was built from;
+the API refuses to serve a table that doesn't match what it has loaded.
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from artifact_bundle import commit_container, create_container, open_container
+from distance_table import MAX_LOCATION_ID
+
+FARE_TABLE_MAGIC = b'FARETABL'
+FARE_TABLE_FORMAT_VERSION = 1
+DEFAULT_FARE_TABLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'best_models', 'fare_table.bin'
+)
+
+HOURS = 24
+DAYS = 7
+
+# Served fares are clipped to [0, MAX_FARE]; uint16 tables quantize that range linearly
+MAX_FARE = 1000.0
+TABLE_DTYPES = {
+    'float32': (np.float32, 1.0),
+    'float16': (np.float16, 1.0),
+    'uint16': (np.uint16, MAX_FARE / np.iinfo(np.uint16).max)
+}
+
+
+def compute_distance_version(distances):
+    """Content hash of a dense distance table (None when no table is loaded)"""
+    if distances is None:
+        return None
+    return hashlib.sha256(np.ascontiguousarray(distances, dtype=np.float32).tobytes()).hexdigest()[:16]
+
+
+def _encode(fares, dtype, scale):
+    if np.issubdtype(dtype, np.integer):
+        return np.clip(np.rint(fares / scale), 0, np.iinfo(dtype).max).astype(dtype)
+    return fares.astype(dtype)
+
+
+def build_fare_table(path, predict_location_fares, model_version, distance_version,
+                     months=(1,), passenger_counts=(1,), dtype='float32', max_location_id=MAX_LOCATION_ID):
+    """
+    Compute fares for every zone pair x hour x day x month x passenger count and write the table
+
+    Args:
+        path: Output file path
+        predict_location_fares: Function (pickup_ids, dropoff_ids, passenger_counts,
+            hours, days, months) -> clipped fares, evaluated one pickup zone at a time
+        model_version, distance_version: Versions of the artifacts used, recorded in the header
+        months, passenger_counts: Values covered by the table; others fall back to the model
+        dtype: 'float32', 'float16' or 'uint16' (quantized)
+
+    Returns:
+        The table header dict
+    """
+    table_dtype, scale = TABLE_DTYPES[dtype]
+    months = [int(month) for month in months]
+    passenger_counts = [float(count) for count in passenger_counts]
+    size = max_location_id + 1
+
+    header = {
+        'format_version': FARE_TABLE_FORMAT_VERSION,
+        'model_version': model_version,
+        'distance_version': distance_version,
+        'created': datetime.now().isoformat(),
+        'dtype': dtype,
+        'scale': scale,
+        'months': months,
+        'passenger_counts': passenger_counts
+    }
+    shape = (size, size, HOURS, DAYS, len(months), len(passenger_counts))
+    tmp_path, arrays = create_container(
+        path, FARE_TABLE_MAGIC, FARE_TABLE_FORMAT_VERSION, header, {'fares': (table_dtype, shape)}
+    )
+    fares = arrays['fares']
+
+    # One vectorized call per pickup zone covers every dropoff, hour, day, month and passenger count
+    dropoff_ids, hours, days, month_values, count_values = (
+        grid.reshape(-1) for grid in np.meshgrid(
+            np.arange(1, size), np.arange(HOURS), np.arange(DAYS),
+            np.array(months), np.array(passenger_counts), indexing='ij'
+        )
+    )
+    for pickup_id in range(1, size):
+        pickup_fares = predict_location_fares(
+            np.full(len(dropoff_ids), pickup_id), dropoff_ids, count_values, hours, days, month_values
+        )
+        fares[pickup_id, 1:] = _encode(np.asarray(pickup_fares), table_dtype, scale).reshape(shape[1] - 1, *shape[2:])
+
+    commit_container(tmp_path, path, arrays)
+    return header
+
+
+class FareTable:
+    """
+    Read-only, memory-mapped fare table indexed by
+    [pickup_id, dropoff_id, hour, day, month, passenger_count]
+    """
+    def __init__(self, path):
+        self.path = path
+        self.header, arrays = open_container(path, FARE_TABLE_MAGIC, FARE_TABLE_FORMAT_VERSION)
+        self.fares = arrays['fares']
+        self.scale = self.header['scale']
+        self.size = self.fares.shape[0]
+        self._month_index = {float(month): i for i, month in enumerate(self.header['months'])}
+        self._count_index = {float(count): i for i, count in enumerate(self.header['passenger_counts'])}
+
+    @property
+    def model_version(self):
+        return self.header['model_version']
+
+    @property
+    def distance_version(self):
+        return self.header['distance_version']
+
+    @property
+    def dtype(self):
+        return self.header['dtype']
+
+    @property
+    def nbytes(self):
+        return self.fares.nbytes
+
+    def lookup(self, pickup_id, dropoff_id, passenger_count, hour, day, month):
+        """
+        Precomputed fare for a trip, or None if it falls outside the table
+        (day as a number 0-6)
+        """
+        try:
+            hour, day = float(hour), float(day)
+            month_index = self._month_index.get(float(month))
+            count_index = self._count_index.get(float(passenger_count))
+        except (TypeError, ValueError):
+            return None
+
+        if (month_index is None or count_index is None
+                or not (0 < pickup_id < self.size and 0 < dropoff_id < self.size)
+                or not (hour.is_integer() and 0 <= hour < HOURS)
+                or not (day.is_integer() and 0 <= day < DAYS)):
+            return None
+
+        value = self.fares[pickup_id, dropoff_id, int(hour), int(day), month_index, count_index]
+        return float(value) * self.scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the location-based fare table')
+    parser.add_argument('--output', default=DEFAULT_FARE_TABLE_PATH, help='Table file to write')
+    parser.add_argument('--months', type=int, nargs='+', default=[1], help='Pickup months to cover')
+    parser.add_argument('--passenger-counts', type=float, nargs='+', default=[1], help='Passenger counts to cover')
+    parser.add_argument('--dtype', choices=sorted(TABLE_DTYPES), default='float32',
+                        help='Stored dtype (uint16 quantizes fares to ~$0.015 steps)')
+    args = parser.parse_args()
+
+    import predictionAPI
+
+    predictionAPI.load_model_and_scaler()
+    distances = predictionAPI.distance_matrix.distances if predictionAPI.distance_matrix is not None else None
+
+    start_time = time.perf_counter()
+    header = build_fare_table(
+        args.output,
+        predictionAPI.predict_location_fares,
+        predictionAPI.model_version,
+        compute_distance_version(distances),
+        months=args.months,
+        passenger_counts=args.passenger_counts,
+        dtype=args.dtype
+    )
+    elapsed = time.perf_counter() - start_time
+
+    table = FareTable(args.output)
+    entries = table.fares.size
+    print(f"✅ Fare table written to {args.output} ({table.nbytes / 1024 / 1024:.1f} MB, {header['dtype']})")
+    print(f"   Model version: {header['model_version']}")
+    print(f"   Entries: {entries:,} in {elapsed:.1f}s ({entries / elapsed:,.0f} fares/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compiled feature preprocessing for single requests
+Everything a per-call feature loop and scaler.transform work out (feature
+positions, defaults, day numbers, the scaler's mean and scale) is computed
+once when the engine is built. A request then fills a reusable per-thread
+buffer in place and is scaled with two in-place NumPy operations, skipping
+sklearn's input validation.
+"""
+
+import threading
+
+import numpy as np
+
+_MISSING = object()
+
+
+class FeatureEngine:
+    """
+    Builds model feature rows from request dicts
+
+    Args:
+        feature_order: Feature names in model input order
+        defaults: Values for features missing from a request
+        day_mapping: Day name -> number for pickup_day
+        scaler_mean, scaler_scale: StandardScaler statistics (None to leave rows unscaled)
+    """
+    def __init__(self, feature_order, defaults, day_mapping, scaler_mean=None, scaler_scale=None):
+        self.feature_order = list(feature_order)
+        self.n_features = len(self.feature_order)
+        self.day_mapping = dict(day_mapping)
+
+        # (name, column) pairs for plain numeric features; pickup_day is handled separately
+        self._columns = tuple((name, j) for j, name in enumerate(self.feature_order) if name != 'pickup_day')
+        self._day_column = self.feature_order.index('pickup_day') if 'pickup_day' in self.feature_order else None
+
+        self.default_row = np.array([defaults.get(name, 0.0) for name in self.feature_order], dtype=np.float32)
+        self.default_row.flags.writeable = False
+
+        if scaler_mean is not None:
+            self.mean = np.ascontiguousarray(scaler_mean, dtype=np.float32)
+            self.scale = np.ascontiguousarray(scaler_scale, dtype=np.float32)
+        else:
+            self.mean = self.scale = None
+
+        self._local = threading.local()
+
+    def _thread_buffer(self):
+        """This thread's (1, F) buffer and its row view, created on first use"""
+        local = self._local
+        try:
+            return local.batch, local.row
+        except AttributeError:
+            local.batch = np.empty((1, self.n_features), dtype=np.float32)
+            local.row = local.batch[0]
+            return local.batch, local.row
+
+    def fill(self, data, out=None):
+        """
+        Write the unscaled features for one trip into out
+
+        Args:
+            data: Request dict; missing features take their defaults and
+                pickup_day may be a day name or number. data is not modified.
+            out: 1-D float32 array of length F (e.g. a row of a batch matrix).
+                When omitted, this thread's reusable buffer is used.
+
+        Returns:
+            out, or the thread's (1, F) buffer when out is omitted. The buffer
+            is overwritten by the next call on the same thread.
+        """
+        if out is None:
+            result, row = self._thread_buffer()
+        else:
+            result = row = out
+
+        row[:] = self.default_row
+        get = data.get
+        for name, j in self._columns:
+            value = get(name, _MISSING)
+            if value is not _MISSING:
+                row[j] = float(value)
+
+        if self._day_column is not None:
+            day = get('pickup_day', _MISSING)
+            if day is not _MISSING:
+                row[self._day_column] = self.day_mapping.get(day, 0) if isinstance(day, str) else float(day)
+
+        return result
+
+    def scale_rows(self, features, out=None):
+        """
+        Standardize a float32 feature array with the compiled scaler statistics
+        Writes into out (which may be features itself) or a new array
+        """
+        if self.mean is None:
+            if out is None:
+                return np.array(features, dtype=np.float32)
+            out[...] = features
+            return out
+        out = np.subtract(features, self.mean, out=out)
+        np.divide(out, self.scale, out=out)
+        return out
+
+    def transform(self, data, out=None):
+        """
+        fill followed by in-place scaling: the scaled features for one trip, in
+        out (1-D) when given, otherwise in this thread's (1, F) buffer
+        """
+        result = self.fill(data, out)
+        return self.scale_rows(result, out=result)
@@ -0,0 +1,176 @@
+"""
+Compiled CPU inference modes for the torch backend
+- eager:       TaxiFareModel as trained (float32, BatchNorm and Dropout modules)
+- torchscript: BatchNorm folded into the following Linear layers, scripted with
+               torch.jit and frozen, so a forward pass is three fused
+               Linear+ReLU steps with no Python module dispatch
+- int8:        the folded model with dynamic int8 quantization of its nn.Linear
+               layers (weights stored as int8, activations quantized per batch),
+               then scripted and frozen like torchscript
+
+Measure each mode's fare error against the float baseline and its speed on a
+held-out slice of the cleaned data (run from model/api):
+    python inference_modes.py
+    python inference_modes.py --holdout-rows 10000 --output modes.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from numpy_engine import fold_batch_norm
+
+INFERENCE_MODES = ('eager', 'torchscript', 'int8')
+
+
+class FoldedFareModel(nn.Module):
+    """TaxiFareModel in eval form: Linear -> ReLU layers with BatchNorm folded in and Dropout removed"""
+    def __init__(self, weights):
+        super(FoldedFareModel, self).__init__()
+
+        layers = []
+        for weight, bias in fold_batch_norm(weights):
+            linear = nn.Linear(weight.shape[1], weight.shape[0])
+            with torch.no_grad():
+                linear.weight.copy_(torch.from_numpy(weight.astype(np.float32)))
+                linear.bias.copy_(torch.from_numpy(bias.astype(np.float32)))
+            layers.extend([linear, nn.ReLU()])
+
+        # No activation after the output layer
+        self.model = nn.Sequential(*layers[:-1])
+
+    def forward(self, x):
+        return self.model(x).squeeze()
+
+
+def compile_inference_model(eager_model, weights, mode):
+    """
+    The model to serve for an inference mode
+    eager_model is returned unchanged for 'eager'; the other modes are built
+    from its weights (a dict of numpy arrays)
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{mode}' (expected one of {INFERENCE_MODES})")
+    if mode == 'eager':
+        return eager_model
+
+    folded = FoldedFareModel(weights).eval()
+    if mode == 'int8':
+        folded = torch.ao.quantization.quantize_dynamic(folded, {nn.Linear}, dtype=torch.qint8)
+    return torch.jit.freeze(torch.jit.script(folded))
+
+
+def prediction_error(reference, candidate):
+    """|candidate - reference| statistics in dollars"""
+    diff = np.abs(np.asarray(candidate, dtype=np.float64) - np.asarray(reference, dtype=np.float64))
+    return {
+        'mean_abs': float(diff.mean()),
+        'p99_abs': float(np.percentile(diff, 99)),
+        'max_abs': float(diff.max())
+    }
+
+
+def forward(model, scaled_rows):
+    with torch.no_grad():
+        return model(torch.from_numpy(scaled_rows)).reshape(-1).numpy()
+
+
+def time_forward(model, scaled_rows, batch_size, seconds):
+    """Rows per second running model over scaled_rows in batches of batch_size"""
+    batches = [scaled_rows[start:start + batch_size] for start in range(0, len(scaled_rows), batch_size)]
+    for batch in batches[:3]:
+        forward(model, batch)
+
+    rows = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for batch in batches:
+            forward(model, batch)
+            rows += len(batch)
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare torch inference modes against the float baseline')
+    parser.add_argument('--modes', nargs='+', choices=INFERENCE_MODES, default=list(INFERENCE_MODES))
+    parser.add_argument('--holdout-rows', type=int, default=5000,
+                        help='Trips from the end of cleaned_yellow_d1.csv to evaluate on')
+    parser.add_argument('--seconds', type=float, default=2.0, help='Timing duration per mode and batch size')
+    parser.add_argument('--torch-threads', type=int, default=1, help='torch threads while timing')
+    parser.add_argument('--output', help='Save results as JSON')
+    args = parser.parse_args()
+
+    import logging
+    import os
+
+    import pandas as pd
+
+    import predictionAPI
+
+    torch.set_num_threads(args.torch_threads)
+    logging.getLogger('predictionAPI').setLevel(logging.ERROR)
+    state = predictionAPI.load_model_and_scaler()
+    if predictionAPI.INFERENCE_BACKEND != 'torch':
+        parser.error("Inference modes apply to the torch backend (unset INFERENCE_BACKEND)")
+
+    # The training notebook fits on the start of the file, so score its tail
+    data_path = os.path.join(predictionAPI.API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv')
+    holdout = pd.read_csv(data_path, index_col=0).tail(args.holdout_rows)
+    fares = holdout['fare_amount'].to_numpy(dtype=np.float64)
+    trips = holdout.drop(columns=['fare_amount']).to_dict('records')
+
+    raw_rows = np.empty((len(trips), state.feature_engine.n_features), dtype=np.float32)
+    for row, trip in zip(raw_rows, trips):
+        state.feature_engine.fill(trip, out=row)
+    scaled_rows = state.feature_engine.scale_rows(raw_rows)
+
+    # Float baseline: the eager model, whatever INFERENCE_MODE the API was started with
+    hidden_sizes = [value.shape[0] for name, value in state.model_weights.items()
+                    if name.endswith('.weight') and value.ndim == 2][:-1]
+    eager = predictionAPI.build_model(state.model_weights, state.scaler, hidden_sizes,
+                                      state.feature_engine.n_features)[0]
+    baseline = np.minimum(np.abs(forward(eager, scaled_rows)), 1000)
+
+    results = {
+        'holdout_rows': len(trips),
+        'model_version': state.model_version,
+        'torch': torch.__version__,
+        'torch_threads': args.torch_threads,
+        'quantized_engine': torch.backends.quantized.engine,
+        'modes': {}
+    }
+
+    print(f"🚕 Inference modes on {len(trips):,} held-out trips (model {state.model_version}, "
+          f"{args.torch_threads} torch thread(s))")
+    print(f"   {'mode':<12} {'MAE':>8} {'mean |Δ|':>10} {'p99 |Δ|':>10} {'max |Δ|':>10} "
+          f"{'1-row µs':>10} {'rows/s @1024':>14}")
+    for mode in args.modes:
+        model = eager if mode == 'eager' else compile_inference_model(eager, state.model_weights, mode)
+        predictions = np.minimum(np.abs(forward(model, scaled_rows)), 1000)
+        single_row_rps = time_forward(model, scaled_rows[:256], 1, args.seconds)
+
+        stats = {
+            'mae': float(np.mean(np.abs(predictions - fares))),
+            'error_vs_float': prediction_error(baseline, predictions),
+            'single_row_us': 1e6 / single_row_rps,
+            'batch_1024_rows_per_second': time_forward(model, scaled_rows, 1024, args.seconds)
+        }
+        results['modes'][mode] = stats
+
+        error = stats['error_vs_float']
+        print(f"   {mode:<12} {stats['mae']:8.3f} {error['mean_abs']:10.4f} {error['p99_abs']:10.4f} "
+              f"{error['max_abs']:10.4f} {stats['single_row_us']:10.1f} {stats['batch_1024_rows_per_second']:14,.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Load test and latency benchmark for the prediction API
+Starts the API in-process (Flask or ASGI) on a free port, or targets a running
+server with --url, then drives each endpoint with payloads sampled from real
+trips in cleaned_yellow_d1.csv at a fixed concurrency. Reports throughput and
+p50/p95/p99 latency per scenario and saves the results as JSON.
+
+Usage (run from model/api):
+    python load_test.py --concurrency 16 --duration 10 --output results.json
+    python load_test.py --server asgi --mix predict=70,predict_from_locations=25,predict_batch=5
+    python load_test.py --baseline results.json    # exits 1 on a regression
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+TRIPS_CSV = os.path.join(API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv')
+
+# Columns of the cleaned data that aren't request fields
+NON_FEATURE_COLUMNS = ['Unnamed: 0', 'fare_amount']
+
+
+def load_trips(path, limit, seed):
+    """Sample trips from the cleaned data as request dicts"""
+    df = pd.read_csv(path).drop(columns=NON_FEATURE_COLUMNS, errors='ignore')
+    if limit and len(df) > limit:
+        df = df.sample(n=limit, random_state=seed)
+    return df.to_dict('records')
+
+
+def location_payload(trip):
+    return {
+        'pickup_location_id': int(trip['PULocationID']),
+        'dropoff_location_id': int(trip['DOLocationID']),
+        'passenger_count': trip['passenger_count'],
+        'pickup_hour': int(trip['pickup_hour']),
+        'pickup_day': trip['pickup_day'],
+        'pickup_month': int(trip['pickup_month'])
+    }
+
+
+def build_endpoints(trips, batch_size):
+    """Endpoint name -> (method, path, payload factory taking a Random)"""
+    return {
+        'health': ('GET', '/', None),
+        'features': ('GET', '/features', None),
+        'predict': ('POST', '/predict', lambda rng: rng.choice(trips)),
+        'predict_from_locations': ('POST', '/predict_from_locations', lambda rng: location_payload(rng.choice(trips))),
+        'predict_batch': ('POST', '/predict/batch', lambda rng: {'trips': rng.sample(trips, batch_size)})
+    }
+
+
+def parse_mix(mix):
+    """'predict=70,predict_batch=5' -> {'predict': 70.0, 'predict_batch': 5.0}"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def start_flask_server():
+    from werkzeug.serving import make_server
+
+    import predictionAPI
+
+    predictionAPI.load_model_and_scaler()
+    server = make_server('127.0.0.1', 0, predictionAPI.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def start_asgi_server():
+    import socket
+
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config('asgi_app:app', host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+
+    return f'http://127.0.0.1:{port}', stop
+
+
+def run_scenario(base_url, endpoints, weights, concurrency, duration, max_requests, seed):
+    """
+    Send requests from `concurrency` keep-alive connections until duration
+    elapses (or max_requests are sent) and return latency statistics
+    """
+    url = urlparse(base_url)
+    names = list(weights)
+    cumulative_weights = np.cumsum([weights[name] for name in names]).tolist()
+    deadline = time.perf_counter() + duration
+    sent = [0]
+    sent_lock = threading.Lock()
+    results = [[] for _ in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+        latencies = results[index]
+        while time.perf_counter() < deadline:
+            if max_requests:
+                with sent_lock:
+                    if sent[0] >= max_requests:
+                        break
+                    sent[0] += 1
+
+            name = rng.choices(names, cum_weights=cumulative_weights)[0]
+            method, path, make_payload = endpoints[name]
+            body = json.dumps(make_payload(rng)) if make_payload else None
+            headers = {'Content-Type': 'application/json'} if body else {}
+
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+                status = 0
+            latencies.append((time.perf_counter() - start, status))
+        connection.close()
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    samples = [sample for worker_samples in results for sample in worker_samples]
+    latencies_ms = np.array([latency for latency, _ in samples]) * 1000
+    status_counts = {}
+    for _, status in samples:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    errors = sum(count for status, count in status_counts.items() if not status.startswith('2'))
+
+    if not samples:
+        return {'requests': 0, 'errors': 0, 'status_counts': {}, 'duration_seconds': round(elapsed, 3)}
+
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'status_counts': status_counts,
+        'duration_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(float(latencies_ms.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(latencies_ms.max()), 3)
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Print each scenario's change against the baseline run
+    Returns the names of scenarios whose p99 latency or throughput got worse
+    by more than tolerance (a fraction)
+    """
+    regressions = []
+    print(f"\n📊 Compared with baseline ({baseline.get('timestamp')}, commit {baseline.get('git_commit')})")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous.get('requests') or not current.get('requests'):
+            print(f"   {name}: no baseline")
+            continue
+
+        p99_change = current['latency_ms']['p99'] / previous['latency_ms']['p99'] - 1
+        rps_change = current['throughput_rps'] / previous['throughput_rps'] - 1
+        regressed = p99_change > tolerance or rps_change < -tolerance
+        marker = '❌' if regressed else '✅'
+        print(f"   {marker} {name}: p99 {previous['latency_ms']['p99']:.2f} -> {current['latency_ms']['p99']:.2f} ms "
+              f"({p99_change:+.1%}), throughput {previous['throughput_rps']:.0f} -> {current['throughput_rps']:.0f} rps "
+              f"({rps_change:+.1%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Taxi Fare Prediction API')
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask', help='In-process server to start')
+    parser.add_argument('--url', help='Target a running server instead (e.g. http://localhost:5000)')
+    parser.add_argument('--endpoints', nargs='+',
+                        default=['predict', 'predict_from_locations', 'predict_batch'],
+                        help='Endpoints to benchmark one at a time')
+    parser.add_argument('--mix', help='Also run a mixed scenario, e.g. predict=70,predict_from_locations=25,predict_batch=5')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario')
+    parser.add_argument('--requests', type=int, default=0, help='Stop a scenario after this many requests')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Warm-up seconds before each scenario')
+    parser.add_argument('--batch-size', type=int, default=100, help='Trips per /predict/batch request')
+    parser.add_argument('--sample-trips', type=int, default=20000, help='Trips sampled from the cleaned data')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for payload sampling')
+    parser.add_argument('--output', help='Save results as JSON')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed p99/throughput regression against the baseline (fraction)')
+    args = parser.parse_args()
+
+    # Per-request API and access logs would dominate the run
+    for name in ('predictionAPI', 'werkzeug', 'uvicorn.access'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    trips = load_trips(TRIPS_CSV, args.sample_trips, args.seed)
+    endpoints = build_endpoints(trips, args.batch_size)
+
+    scenarios = {name: {name: 1.0} for name in args.endpoints}
+    if args.mix:
+        scenarios['mixed'] = parse_mix(args.mix)
+    unknown = {name for weights in scenarios.values() for name in weights} - set(endpoints)
+    if unknown:
+        parser.error(f"Unknown endpoints {sorted(unknown)} (choose from {sorted(endpoints)})")
+
+    if args.url:
+        base_url, stop_server = args.url.rstrip('/'), None
+        server = 'external'
+    else:
+        base_url, stop_server = start_asgi_server() if args.server == 'asgi' else start_flask_server()
+        server = args.server
+
+    print(f"🚕 Load testing {base_url} ({server}) with {args.concurrency} connections, "
+          f"{len(trips):,} sampled trips")
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'server': server,
+        'inference_backend': os.environ.get('INFERENCE_BACKEND', 'torch'),
+        'inference_mode': os.environ.get('INFERENCE_MODE', 'eager'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'max_requests': args.requests,
+            'batch_size': args.batch_size,
+            'sample_trips': len(trips),
+            'seed': args.seed
+        },
+        'scenarios': {}
+    }
+
+    try:
+        for name, weights in scenarios.items():
+            if args.warmup:
+                run_scenario(base_url, endpoints, weights, args.concurrency, args.warmup, 0, args.seed)
+            stats = run_scenario(base_url, endpoints, weights, args.concurrency,
+                                 args.duration, args.requests, args.seed)
+            stats['weights'] = weights
+            results['scenarios'][name] = stats
+
+            if stats['requests']:
+                latency = stats['latency_ms']
+                print(f"   {name:<24} {stats['throughput_rps']:>9,.1f} rps   p50 {latency['p50']:7.2f} ms   "
+                      f"p95 {latency['p95']:7.2f} ms   p99 {latency['p99']:7.2f} ms   errors {stats['errors']}")
+            else:
+                print(f"   {name:<24} no requests completed")
+    finally:
+        if stop_server:
+            stop_server()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regressions in: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Micro-benchmarks for the preprocessing and inference hot paths
+Times each function across input sizes (1 to 100k rows) against the shipped
+best_models artifacts, and measures peak traced memory and retained
+allocations with tracemalloc. Runs offline; no server is started.
+
+Usage (run from model/api):
+    python micro_benchmarks.py --save-baseline bench_baseline.json
+    python micro_benchmarks.py --baseline bench_baseline.json     # exits 1 if anything got slower
+    python micro_benchmarks.py --only preprocess_input distance_lookup --sizes 1 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import predictionAPI
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+TRIPS_CSV = os.path.join(API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv')
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def load_trip_rows(size):
+    """`size` request dicts from the cleaned data (repeated if the file is shorter)"""
+    df = pd.read_csv(TRIPS_CSV).drop(columns=['Unnamed: 0', 'fare_amount'], errors='ignore')
+    records = df.to_dict('records')
+    return (records * (size // len(records) + 1))[:size]
+
+
+# Each benchmark is (setup, run): setup(rows) builds the inputs outside the timed
+# region (called before every repeat, since preprocess_input converts pickup_day in place),
+# and run(inputs) is the timed call. Size-independent benchmarks have setup=None.
+
+def _copy_rows(rows):
+    return [dict(row) for row in rows]
+
+
+def _preprocess_each(rows):
+    for row in rows:
+        predictionAPI.preprocess_input(row)
+
+
+def _scaled_rows(rows):
+    # preprocess_input reuses a per-thread buffer, so keep copies
+    return [predictionAPI.preprocess_input(dict(row)).copy() for row in rows]
+
+
+def _predict_each(scaled_rows):
+    for features_array in scaled_rows:
+        predictionAPI.make_prediction(features_array)
+
+
+def _feature_matrix(rows):
+    return predictionAPI.build_feature_matrix(_copy_rows(rows))[0]
+
+
+def _zone_pairs(rows):
+    return [(int(row['PULocationID']), int(row['DOLocationID'])) for row in rows]
+
+
+def _lookup_each(pairs):
+    lookup = predictionAPI.distance_matrix.lookup
+    for pickup_id, dropoff_id in pairs:
+        lookup(pickup_id, dropoff_id)
+
+
+def _zone_arrays(rows):
+    pairs = np.array(_zone_pairs(rows), dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+BENCHMARKS = {
+    'preprocess_input': (_copy_rows, _preprocess_each),
+    'build_feature_matrix': (_copy_rows, lambda rows: predictionAPI.build_feature_matrix(rows)),
+    'make_prediction': (_scaled_rows, _predict_each),
+    'predict_raw_features': (_feature_matrix, lambda features_array: predictionAPI.predict_raw_features(features_array)),
+    'distance_lookup': (_zone_pairs, _lookup_each),
+    'distance_lookup_many': (_zone_arrays, lambda ids: predictionAPI.distance_matrix.lookup_many(*ids)),
+    # Startup from the training outputs (torch.load, scaler and pickles, distance CSV),
+    # and from the memory-mapped artifact bundle when one has been built
+    'load_model_and_scaler': (None, lambda _: predictionAPI.load_model_and_scaler(bundle_path=None)),
+    'load_bundle': (None, lambda _: predictionAPI.load_model_and_scaler(bundle_path=predictionAPI.BUNDLE_PATH))
+}
+
+
+def time_benchmark(setup, run, rows, repeats):
+    """Median and best wall time (seconds) over `repeats` runs"""
+    timings = []
+    for _ in range(repeats):
+        inputs = setup(rows) if setup else None
+        start = time.perf_counter()
+        run(inputs)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def trace_benchmark(setup, run, rows):
+    """Peak traced memory (KB) and allocated blocks still alive after one run"""
+    inputs = setup(rows) if setup else None
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return peak / 1024, retained_blocks
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Names of benchmark/size pairs whose median time grew by more than tolerance"""
+    regressions = []
+    for name, sizes in results['benchmarks'].items():
+        for size, stats in sizes.items():
+            previous = baseline.get('benchmarks', {}).get(name, {}).get(size)
+            if not previous:
+                continue
+            change = stats['median_seconds'] / previous['median_seconds'] - 1
+            if change > tolerance:
+                regressions.append(f"{name}[{size}] {change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for preprocessing and inference')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Benchmarks to run (default: all)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Input sizes in rows')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per benchmark and size')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', help='Save results as JSON')
+    parser.add_argument('--save-baseline', help='Save results as a baseline file (same as --output)')
+    parser.add_argument('--baseline', help='Fail if any benchmark is slower than this baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline (fraction of the median time)')
+    args = parser.parse_args()
+
+    logging.getLogger('predictionAPI').setLevel(logging.ERROR)
+    predictionAPI.load_model_and_scaler()
+    all_rows = load_trip_rows(max(args.sizes))
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'inference_backend': predictionAPI.INFERENCE_BACKEND,
+        'inference_mode': predictionAPI.INFERENCE_MODE,
+        'model_version': predictionAPI.model_version,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'repeats': args.repeats,
+        'benchmarks': {}
+    }
+
+    print(f"🚕 Micro-benchmarks ({predictionAPI.INFERENCE_BACKEND} backend, {predictionAPI.INFERENCE_MODE} mode, "
+          f"{args.repeats} repeats)")
+    print(f"   {'benchmark':<24} {'rows':>7} {'median':>11} {'per row':>11} {'peak KB':>10} {'retained':>9}")
+
+    for name in args.only or BENCHMARKS:
+        setup, run = BENCHMARKS[name]
+        if name.startswith('distance_lookup') and predictionAPI.distance_matrix is None:
+            print(f"   {name:<24} skipped (no distance matrix)")
+            continue
+        if name == 'load_bundle' and not os.path.exists(predictionAPI.BUNDLE_PATH):
+            print(f"   {name:<24} skipped (no artifact bundle; build it with artifact_bundle.py)")
+            continue
+
+        results['benchmarks'][name] = {}
+        for size in (args.sizes if setup else [1]):
+            rows = all_rows[:size]
+            median, best = time_benchmark(setup, run, rows, args.repeats)
+            stats = {
+                'median_seconds': median,
+                'min_seconds': best,
+                'per_row_us': median / size * 1e6
+            }
+            if not args.no_memory:
+                stats['peak_kb'], stats['retained_blocks'] = trace_benchmark(setup, run, rows)
+            results['benchmarks'][name][str(size)] = stats
+
+            peak = f"{stats['peak_kb']:10.1f}" if 'peak_kb' in stats else f"{'-':>10}"
+            retained = f"{stats['retained_blocks']:9d}" if 'retained_blocks' in stats else f"{'-':>9}"
+            print(f"   {name:<24} {size:>7} {median * 1000:9.3f}ms {stats['per_row_us']:9.2f}µs {peak} {retained}")
+
+    output = args.save_baseline or args.output
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Slower than baseline (> {args.tolerance:.0%}): {', '.join(regressions)}")
+            raise SystemExit(1)
+        print(f"✅ No benchmark slower than baseline by more than {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
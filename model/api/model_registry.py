@@ -0,0 +1,195 @@
+"""
+Model registry, traffic routing and shadow scoring
+A registry is an immutable set of named serving states plus the rules for
+choosing between them: an explicit model name (X-Model header), otherwise a
+percentage split of traffic. A shadow model can score the same requests on a
+background thread so a candidate is compared under real traffic without
+adding to response latency.
+"""
+
+import bisect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+def read_registry_file(path):
+    """
+    Parse a registry JSON file
+    Relative artifact paths in model entries are resolved against the file's
+    directory. Returns the parsed dict.
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    models = config.get('models')
+    if not models:
+        raise ValueError(f"Registry {path} lists no models")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for name, entry in models.items():
+        for key in ('bundle', 'weights', 'scaler', 'config', 'feature_order'):
+            if entry.get(key):
+                entry[key] = os.path.join(base_dir, entry[key])
+
+    shadow = config.get('shadow')
+    if isinstance(shadow, str):
+        config['shadow'] = {'model': shadow}
+    return config
+
+
+class ModelRegistry:
+    """
+    Named serving states and how requests are routed between them
+
+    Args:
+        models: Dict of model name -> serving state
+        default: Name of the model scripts and un-routed code paths use
+        traffic: Dict of model name -> share of traffic (any positive scale);
+            defaults to all traffic on the default model
+        shadow: Name of a model that scores requests in the background, or None
+        shadow_sample_rate: Fraction of requests also sent to the shadow model
+        source: Where the registry came from (for status reporting)
+    """
+    def __init__(self, models, default, traffic=None, shadow=None, shadow_sample_rate=1.0, source=None):
+        self.models = dict(models)
+        if default not in self.models:
+            raise ValueError(f"Default model '{default}' is not in the registry")
+        self.default = default
+
+        traffic = {name: float(share) for name, share in (traffic or {default: 1}).items() if float(share) > 0}
+        unknown = set(traffic) - set(self.models)
+        if unknown:
+            raise ValueError(f"Traffic split names unknown models: {sorted(unknown)}")
+        if not traffic:
+            raise ValueError("Traffic split gives no model any traffic")
+        total = sum(traffic.values())
+        self.traffic = {name: share / total for name, share in traffic.items()}
+        self._names = list(self.traffic)
+        self._cumulative = []
+        running = 0.0
+        for name in self._names:
+            running += self.traffic[name]
+            self._cumulative.append(running)
+
+        if shadow is not None and shadow not in self.models:
+            raise ValueError(f"Shadow model '{shadow}' is not in the registry")
+        self.shadow = shadow
+        self.shadow_sample_rate = shadow_sample_rate
+        self.source = source
+
+    @property
+    def default_state(self):
+        return self.models[self.default]
+
+    @property
+    def model_version(self):
+        return self.default_state.model_version
+
+    def select(self, name=None, routing_key=None):
+        """
+        (name, state) of the model that should serve a request
+        An explicit name wins; otherwise the traffic split decides, by a hash of
+        routing_key when given (so a caller keeps getting the same model) or at random.
+        Raises KeyError for an unknown name.
+        """
+        if name:
+            return name, self.models[name]
+        if len(self._names) == 1:
+            name = self._names[0]
+            return name, self.models[name]
+
+        if routing_key:
+            point = (zlib.crc32(routing_key.encode('utf-8')) & 0xffffffff) / 2 ** 32
+        else:
+            point = random.random()
+        index = min(bisect.bisect_right(self._cumulative, point), len(self._names) - 1)
+        name = self._names[index]
+        return name, self.models[name]
+
+    def shadow_for(self, name):
+        """(name, state) of the shadow model for a request served by name, or None"""
+        if self.shadow is None or self.shadow == name:
+            return None
+        if self.shadow_sample_rate < 1 and random.random() >= self.shadow_sample_rate:
+            return None
+        return self.shadow, self.models[self.shadow]
+
+    def describe(self):
+        return {
+            'default': self.default,
+            'source': self.source,
+            'shadow': self.shadow,
+            'shadow_sample_rate': self.shadow_sample_rate if self.shadow else None,
+            'models': {
+                name: {
+                    'model_version': state.model_version,
+                    'source': state.source,
+                    'features': len(state.feature_engine.feature_order),
+                    'traffic_share': round(self.traffic.get(name, 0.0), 4),
+                    'loaded_at': state.loaded_at
+                }
+                for name, state in self.models.items()
+            }
+        }
+
+
+class ShadowScorer:
+    """
+    Runs shadow scoring jobs on one background thread
+    Jobs wait in a bounded queue; when it is full new jobs are dropped rather
+    than slowing down the request that submitted them.
+
+    Args:
+        max_pending: Jobs allowed to wait before new ones are dropped
+    """
+    def __init__(self, max_pending=1000):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, function, *args):
+        """Queue function(*args) without blocking; returns False if it was dropped"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                    self._thread.start()
+
+        try:
+            self._queue.put_nowait((function, args))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            function, args = self._queue.get()
+            try:
+                function(*args)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Shadow scoring failed: {e}")
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self._queue.qsize()
+        }
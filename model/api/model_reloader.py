@@ -0,0 +1,192 @@
+"""
+Background model reloading
+A reload builds a complete new serving state off the request path, validates
+it, and only then hands it to activate (a single reference swap), so requests
+keep being answered by the old state until the new one is known to be good.
+Reloads are triggered explicitly or by watching the artifact files. Under a
+multi-process server, a ReloadBroadcast created before the fork carries an
+explicit reload from the worker that received it to every other worker.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReloader:
+    """
+    Runs load -> validate -> activate in a background thread, one reload at a time
+
+    Args:
+        load: Function(**options) returning a new serving state
+        validate: Function(state) returning a summary dict; raises to reject the state
+        activate: Function(state) that makes the state live
+        watch_paths: Files whose modification triggers a reload when watching,
+            or a function returning them (called on every poll)
+    """
+    def __init__(self, load, validate, activate, watch_paths=()):
+        self.load = load
+        self.validate = validate
+        self.activate = activate
+        self._watch_paths = watch_paths
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._follower = None
+        self._stop_watching = threading.Event()
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_result = None
+
+    def reload(self, wait=False, **options):
+        """
+        Start a reload; options are passed to load
+        Returns False if another reload is already running, otherwise True
+        (with wait=True, only after the reload has finished)
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        self._thread = threading.Thread(target=self._run, kwargs=options, name='model-reload', daemon=True)
+        self._thread.start()
+        if wait:
+            self._thread.join()
+        return True
+
+    def join(self):
+        """Wait for the reload started last (if any) to finish"""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, **options):
+        start_time = time.perf_counter()
+        result = {'started_at': datetime.now().isoformat(), 'options': options}
+        try:
+            state = self.load(**options)
+            result['validation'] = self.validate(state)
+            self.activate(state)
+            result.update(status='success', model_version=state.model_version, source=state.source)
+            self.reloads += 1
+            logger.info(f"Model reloaded in {time.perf_counter() - start_time:.2f}s "
+                        f"(model version {state.model_version} from {state.source})")
+        except Exception as e:
+            result.update(status='error', message=str(e))
+            self.failures += 1
+            logger.error(f"Model reload failed, still serving the previous model: {str(e)}")
+        finally:
+            result['seconds'] = round(time.perf_counter() - start_time, 3)
+            self.last_result = result
+            self._lock.release()
+
+    @property
+    def watch_paths(self):
+        paths = self._watch_paths() if callable(self._watch_paths) else self._watch_paths
+        return [path for path in paths if path]
+
+    @property
+    def in_progress(self):
+        return self._lock.locked()
+
+    def status(self):
+        return {
+            'in_progress': self.in_progress,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+            'following_broadcast': self._follower is not None and self._follower.is_alive(),
+            'last_result': self.last_result
+        }
+
+    def _mtimes(self):
+        mtimes = {}
+        for path in self.watch_paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def start_watching(self, poll_seconds=5.0):
+        """
+        Poll watch_paths and reload when they change
+        A change is acted on once the files have stopped changing for one poll,
+        so a reload doesn't start while a file is still being written
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def watch():
+            seen = self._mtimes()
+            pending = None
+            while not self._stop_watching.wait(poll_seconds):
+                current = self._mtimes()
+                if current != seen:
+                    pending = [path for path in current if current[path] != seen.get(path)] + (pending or [])
+                    seen = current
+                elif pending:
+                    logger.info(f"Artifacts changed ({', '.join(sorted(set(pending)))}), reloading")
+                    if self.reload(changed=sorted(set(pending))):
+                        pending = None
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=watch, name='model-watch', daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching {len(self.watch_paths)} artifact files every {poll_seconds}s")
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def start_following(self, broadcast, poll_seconds=1.0):
+        """
+        Reload whenever another process publishes a reload on broadcast
+        A reload that can't start yet (one is already running) is retried on the next poll
+        """
+        if self._follower is not None and self._follower.is_alive():
+            return
+
+        def follow():
+            while not self._stop_watching.wait(poll_seconds):
+                generation, source = broadcast.latest()
+                if generation != broadcast.seen and self.reload(source=source):
+                    logger.info(f"Reload {generation} requested by another worker, reloading")
+                    broadcast.seen = generation
+
+        self._stop_watching.clear()
+        self._follower = threading.Thread(target=follow, name='model-reload-follow', daemon=True)
+        self._follower.start()
+
+
+class ReloadBroadcast:
+    """
+    Reload requests shared between forked server processes
+    Create it before forking; a process calls publish() when it starts a
+    reload itself, and every other process picks the request up through
+    ModelReloader.start_following()
+    """
+    SOURCES = ('auto', 'files')
+
+    def __init__(self):
+        self._generation = multiprocessing.Value('q', 0)
+        self._source = multiprocessing.Value('i', 0)
+        self.seen = 0  # Per process after the fork: the last generation this process acted on
+
+    def publish(self, source='auto'):
+        """Announce a reload to the other processes; returns its generation"""
+        with self._generation.get_lock():
+            self._generation.value += 1
+            self._source.value = self.SOURCES.index(source)
+            self.seen = self._generation.value
+            return self.seen
+
+    def latest(self):
+        """(generation, source) of the most recent reload request"""
+        with self._generation.get_lock():
+            return self._generation.value, self.SOURCES[self._source.value]
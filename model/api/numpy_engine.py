@@ -0,0 +1,186 @@
+"""
+Pure-NumPy inference engine for TaxiFareModel
+In eval mode every BatchNorm layer is a fixed affine transform and Dropout is
+the identity, so both fold into the adjacent Linear weights. The StandardScaler
+folds into the first Linear layer as well, leaving a chain of float32 matmuls
+that runs without torch.
+
+Check the engine against the torch model (run from model/api):
+    python numpy_engine.py
+"""
+
+import sys
+
+import numpy as np
+
+# Matches torch.nn.BatchNorm1d's default
+BATCH_NORM_EPS = 1e-5
+
+# Allowed difference from the torch model: |numpy - torch| <= ATOL + RTOL * |torch|
+# (USD; the relative term covers float32 rounding on very large raw outputs)
+PREDICTION_ATOL = 1e-3
+PREDICTION_RTOL = 1e-6
+
+
+def _group_layers(weights):
+    """
+    Group flat state_dict arrays ('model.<index>.<param>') into layers in forward order
+    """
+    layers = {}
+    for name, value in weights.items():
+        prefix, _, param = name.rpartition('.')
+        layers.setdefault(prefix, {})[param] = np.asarray(value, dtype=np.float64)
+    return [layers[prefix] for prefix in sorted(layers, key=lambda p: int(p.rsplit('.', 1)[-1]))]
+
+
+def fold_batch_norm(weights, eps=BATCH_NORM_EPS):
+    """
+    Fold each eval-mode BatchNorm into the Linear layer that follows it
+
+    Assumes the training architecture: [Linear -> ReLU -> BatchNorm -> Dropout] * n -> Linear
+
+    Returns:
+        List of float64 (weight, bias) pairs, one per Linear layer, with ReLU between them
+    """
+    folded = []
+    pending_norm = None
+
+    for params in _group_layers(weights):
+        if 'running_mean' in params:
+            scale = params['weight'] / np.sqrt(params['running_var'] + eps)
+            shift = params['bias'] - scale * params['running_mean']
+            pending_norm = (scale, shift)
+            continue
+
+        weight, bias = params['weight'], params['bias']
+        if pending_norm is not None:
+            scale, shift = pending_norm
+            bias = bias + weight @ shift
+            weight = weight * scale[np.newaxis, :]
+            pending_norm = None
+        folded.append((weight, bias))
+
+    if pending_norm is not None:
+        raise ValueError("Cannot fold a BatchNorm layer that is not followed by a Linear layer")
+    return folded
+
+
+class NumpyFareModel:
+    """
+    TaxiFareModel with BatchNorm and the scaler folded into the Linear layers
+
+    Assumes the training architecture: [Linear -> ReLU -> BatchNorm -> Dropout] * n -> Linear,
+    so each BatchNorm folds into the Linear layer that follows it
+    """
+    def __init__(self, weights, scaler_mean=None, scaler_scale=None, eps=BATCH_NORM_EPS):
+        # Fold in float64, then store float32 weights for serving
+        folded = fold_batch_norm(weights, eps)
+
+        self.input_size = folded[0][0].shape[1]
+
+        # First layer for inputs that are already scaled, and for raw inputs with the scaler folded in
+        first_weight, first_bias = folded[0]
+        self._first_scaled = self._pack(first_weight, first_bias)
+        if scaler_mean is not None and scaler_scale is not None:
+            raw_weight = first_weight / np.asarray(scaler_scale, dtype=np.float64)[np.newaxis, :]
+            raw_bias = first_bias - raw_weight @ np.asarray(scaler_mean, dtype=np.float64)
+            self._first_raw = self._pack(raw_weight, raw_bias)
+        else:
+            self._first_raw = self._first_scaled
+
+        self._layers = [self._pack(weight, bias) for weight, bias in folded[1:]]
+
+    @staticmethod
+    def _pack(weight, bias):
+        # Transposed so a batch is evaluated as x @ W + b
+        return np.ascontiguousarray(weight.T, dtype=np.float32), bias.astype(np.float32)
+
+    def predict(self, features, scaled=False):
+        """
+        Predict fares for a (N, input_size) feature matrix
+
+        Args:
+            features: Feature rows in feature_order
+            scaled: True if the rows were already transformed by the scaler
+
+        Returns:
+            1-D float32 array of N predictions
+        """
+        x = np.asarray(features, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+
+        weight, bias = self._first_scaled if scaled else self._first_raw
+        hidden = x @ weight
+        hidden += bias
+        for weight, bias in self._layers:
+            np.maximum(hidden, 0, out=hidden)
+            hidden = hidden @ weight
+            hidden += bias
+        return hidden.reshape(-1)
+
+    def __call__(self, features):
+        return self.predict(features)
+
+
+def main():
+    """Compare the NumPy engine with the torch model on real and random trips"""
+    import os
+    import time
+
+    import pandas as pd
+    import torch
+
+    import predictionAPI
+    from taxi_fare_model import TaxiFareModel
+
+    predictionAPI.load_model_and_scaler()
+    engine = NumpyFareModel(predictionAPI.model_weights, predictionAPI.scaler.mean_, predictionAPI.scaler.scale_)
+
+    # Torch reference model built from the same weights
+    reference = TaxiFareModel(input_size=len(predictionAPI.feature_order))
+    reference.load_state_dict({name: torch.from_numpy(np.array(value))
+                               for name, value in predictionAPI.model_weights.items()})
+    reference.eval()
+
+    data_path = os.path.join(predictionAPI.API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv')
+    trips = pd.read_csv(data_path, index_col=0).head(10000).to_dict('records')
+    # Real trips built the way requests are, plus random rows well outside their range
+    rng = np.random.default_rng(42)
+    raw = rng.normal(predictionAPI.scaler.mean_, 3 * predictionAPI.scaler.scale_ + 1,
+                     size=(len(trips) + 10000, engine.input_size)).astype(np.float32)
+    for row, trip in zip(raw, trips):
+        predictionAPI.feature_engine.fill(trip, out=row)
+
+    with torch.no_grad():
+        expected = reference(torch.tensor(predictionAPI.scaler.transform(raw), dtype=torch.float32)).numpy()
+    actual = engine.predict(raw)
+    diff = np.abs(expected - actual)
+    max_diff = float(np.max(diff))
+    within_tolerance = bool(np.all(diff <= PREDICTION_ATOL + PREDICTION_RTOL * np.abs(expected)))
+
+    # Single-row latency, the common /predict case
+    single = raw[:1]
+    start = time.perf_counter()
+    for _ in range(2000):
+        with torch.no_grad():
+            reference(torch.tensor(predictionAPI.scaler.transform(single), dtype=torch.float32))
+    torch_us = (time.perf_counter() - start) / 2000 * 1e6
+    start = time.perf_counter()
+    for _ in range(2000):
+        engine.predict(single)
+    numpy_us = (time.perf_counter() - start) / 2000 * 1e6
+
+    print(f"Rows compared: {len(raw)}")
+    print(f"Max |torch - numpy|: ${max_diff:.6f} "
+          f"(tolerance ${PREDICTION_ATOL} + {PREDICTION_RTOL} * |fare|)")
+    print(f"Single-row latency: torch {torch_us:.1f} µs, numpy {numpy_us:.1f} µs")
+
+    if not within_tolerance:
+        print("❌ NumPy engine is outside the tolerance")
+        sys.exit(1)
+    print("✅ NumPy engine matches the torch model")
+
+
+if __name__ == '__main__':
+    main()
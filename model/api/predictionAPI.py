@@ -3,18 +3,75 @@ Taxi Fare Prediction API using Flask
 Serves a PyTorch model trained on NYC taxi data for fare predictions
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import torch
-import torch.nn as nn
 import numpy as np
-import pandas as pd
+import json
 import pickle
+import joblib
 import os
 from sklearn.preprocessing import StandardScaler
 import traceback
 from datetime import datetime
 import logging
+import threading
+import time
+from collections import namedtuple
+
+from distance_table import ZoneDistanceTable
+from artifact_bundle import DEFAULT_BUNDLE_PATH, compute_model_version, load_bundle, stale_sources
+from numpy_engine import NumpyFareModel
+from request_coalescer import BATCH_SIZE_BUCKETS, RequestCoalescer
+from quote_cache import QuoteCache
+from fare_table import DEFAULT_FARE_TABLE_PATH, FareTable, compute_distance_version
+from stream_scoring import iter_chunks, iter_csv_records, iter_ndjson_records
+from metrics import REGISTRY, SIZE_BUCKETS
+from model_reloader import ModelReloader, ReloadBroadcast
+from model_registry import ModelRegistry, ShadowScorer, read_registry_file
+from feature_engine import FeatureEngine
+from zone_index import ZoneIndex
+from concurrency import EXECUTION_MODES, InferencePool, PoolFullError, configure_torch_threads
+from columnar import (ARROW_STREAM_MIMETYPES, RAW_FLOAT32_MIMETYPES, decode_arrow_stream,
+                      decode_raw_float32, encode_fares)
+
+# Inference backend: 'torch' runs TaxiFareModel, 'numpy' runs the folded NumpyFareModel
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch').lower()
+if INFERENCE_BACKEND not in ('torch', 'numpy'):
+    raise ValueError(f"Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}' (expected 'torch' or 'numpy')")
+
+# How the torch backend runs the model: 'eager', 'torchscript' or 'int8' (see inference_modes.py)
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'eager').lower()
+if INFERENCE_BACKEND == 'numpy' and INFERENCE_MODE != 'eager':
+    raise ValueError(f"INFERENCE_MODE '{INFERENCE_MODE}' needs the torch backend")
+
+# A compiled mode is refused when its mean fare error against the float model
+# on the sample trips is larger than this (USD)
+INFERENCE_MODE_MAX_ERROR = float(os.environ.get('INFERENCE_MODE_MAX_ERROR', 0.25))
+
+# torch is only imported for the torch backend (or to read .pth files when no bundle exists)
+if INFERENCE_BACKEND == 'torch':
+    import torch
+    from taxi_fare_model import TaxiFareModel
+    from inference_modes import INFERENCE_MODES, compile_inference_model, prediction_error
+    
+    if INFERENCE_MODE not in INFERENCE_MODES:
+        raise ValueError(f"Unknown INFERENCE_MODE '{INFERENCE_MODE}' (expected one of {INFERENCE_MODES})")
+
+# torch threads per process; 0 keeps torch's default of one intra-op thread per core,
+# which oversubscribes the CPU as soon as several requests run at once
+TORCH_INTRA_OP_THREADS = int(os.environ.get('TORCH_INTRA_OP_THREADS', 1))
+TORCH_INTER_OP_THREADS = int(os.environ.get('TORCH_INTER_OP_THREADS', 1))
+if INFERENCE_BACKEND == 'torch':
+    configure_torch_threads(TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS)
+
+# Where forward passes run: on the request thread ('inline') or on a fixed pool
+# of INFERENCE_POOL_THREADS threads ('pool'), which bounds concurrent forward
+# passes however many request threads the server has
+INFERENCE_EXECUTION = os.environ.get('INFERENCE_EXECUTION', 'inline').lower()
+if INFERENCE_EXECUTION not in EXECUTION_MODES:
+    raise ValueError(f"Unknown INFERENCE_EXECUTION '{INFERENCE_EXECUTION}' (expected one of {EXECUTION_MODES})")
+INFERENCE_POOL_THREADS = int(os.environ.get('INFERENCE_POOL_THREADS', 1))
+INFERENCE_POOL_MAX_QUEUE = int(os.environ.get('INFERENCE_POOL_MAX_QUEUE', 256))
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -24,10 +81,38 @@ CORS(app)  # Enable CORS for React frontend
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Artifact locations (resolved relative to this file, not the working directory)
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(API_DIR, '..', 'best_models', 'best_taxi_fare_model.pth')
+SCALER_PATH = os.path.join(API_DIR, '..', 'best_models', 'scaler.pkl')
+DISTANCE_MATRIX_PATH = os.environ.get(
+    'DISTANCE_MATRIX_PATH', os.path.join(API_DIR, '..', 'distances', 'full_taxi_zone_distance_matrix.csv'))
+MODEL_CONFIG_PATH = os.path.join(API_DIR, '..', 'best_models', 'model_config.pkl')
+FEATURE_ORDER_PATH = os.path.join(API_DIR, '..', 'best_models', 'feature_order.pkl')
+BUNDLE_PATH = os.environ.get('TAXI_FARE_BUNDLE', DEFAULT_BUNDLE_PATH)
+
+# Training outputs the bundle is built from; a bundle older than any of them isn't served
+BUNDLE_SOURCE_PATHS = [MODEL_PATH, SCALER_PATH, MODEL_CONFIG_PATH, FEATURE_ORDER_PATH, DISTANCE_MATRIX_PATH]
+
+# Registry file listing several model versions to serve (see model_registry.py)
+MODEL_REGISTRY = os.environ.get('MODEL_REGISTRY')
+
 # Global variables for model and scaler
 model = None
+model_weights = None
 scaler = None
 distance_matrix = None
+model_version = None
+artifacts_ready = False  # Reported by /ready; set once load_model_and_scaler succeeds
+
+# Everything one request is served with. Loaded as a whole and swapped in with a
+# single assignment, so a reload never mixes artifacts from two model versions.
+ServingState = namedtuple('ServingState', [
+    'model', 'model_weights', 'scaler', 'feature_engine', 'distance_matrix',
+    'model_version', 'fare_table', 'source', 'loaded_at', 'inference_error'
+])
+current_state = None  # The default model's state
+current_registry = None  # Every model being served, and how requests are routed between them
 feature_order = [
     'passenger_count', 'trip_distance',
     'extra', 'mta_tax', 'tip_amount', 'tolls_amount',
@@ -35,147 +120,618 @@ feature_order = [
     'trip_duration_minutes', 'pickup_hour', 'pickup_day', 'pickup_month'
 ]
 
-# Model Architecture (same as training)
-class TaxiFareModel(nn.Module):
+# Default values for missing features (updated for 14 features)
+FEATURE_DEFAULTS = {
+    'passenger_count': 1, 'trip_distance': 5.0, 'extra': 0.5, 'mta_tax': 0.5,
+    'tip_amount': 2.0, 'tolls_amount': 0.0, 'payment_type': 1, 
+    'congestion_surcharge': 2.5, 'Airport_fee': 0.0, 'cbd_congestion_fee': 0.75, 
+    'trip_duration_minutes': 20, 'pickup_hour': 12, 'pickup_day': 3, 'pickup_month': 1
+}
+
+# Day name to number conversion (unknown names map to Monday)
+DAY_MAPPING = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+    'Friday': 4, 'Saturday': 5, 'Sunday': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+# Compiled preprocessing; recompiled with the scaler statistics whenever artifacts load
+feature_engine = FeatureEngine(feature_order, FEATURE_DEFAULTS, DAY_MAPPING)
+
+# Rows per forward pass when scoring batches
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 2048))
+
+# Rows parsed and scored at a time by the streaming endpoint
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 5000))
+
+# Micro-batching of concurrent single-trip requests (off by default)
+COALESCE_REQUESTS = os.environ.get('COALESCE_REQUESTS', '0') == '1'
+COALESCE_MAX_BATCH = int(os.environ.get('COALESCE_MAX_BATCH', 64))
+COALESCE_WAIT_MS = float(os.environ.get('COALESCE_WAIT_MS', 2.0))
+coalescer = None
+_coalescer_lock = threading.Lock()
+
+# Created on first use, so each forked worker starts its own threads
+inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+# Location quotes come from the model, or from a precomputed fare table ('table')
+LOCATION_QUOTE_MODE = os.environ.get('LOCATION_QUOTE_MODE', 'model').lower()
+FARE_TABLE_PATH = os.environ.get('FARE_TABLE_PATH', DEFAULT_FARE_TABLE_PATH)
+fare_table = None
+
+# Cache of location-based quotes, cleared whenever new artifacts are loaded
+quote_cache = QuoteCache(
+    max_size=int(os.environ.get('QUOTE_CACHE_SIZE', 10000)),
+    ttl_seconds=float(os.environ.get('QUOTE_CACHE_TTL', 300))
+)
+
+# Nearest-zone lookup for /predict_from_coordinates, built once at startup
+ZONE_CENTROIDS_PATH = os.environ.get('ZONE_CENTROIDS_PATH',
+                                     os.path.join(API_DIR, '..', 'distances', 'complete_geocoded_taxi_zones.csv'))
+# Points farther than this from every zone centroid are rejected
+ZONE_MAX_DISTANCE_KM = float(os.environ.get('ZONE_MAX_DISTANCE_KM', 5.0))
+zone_index = None
+
+# Hot reload: POST /admin/reload, or watch the artifact files when RELOAD_WATCH=1
+RELOAD_WATCH = os.environ.get('RELOAD_WATCH', '0') == '1'
+RELOAD_POLL_SECONDS = float(os.environ.get('RELOAD_POLL_SECONDS', 5.0))
+# Shared by the serve.py workers (created in the master before forking) so
+# POST /admin/reload reloads every worker, not just the one that received it
+reload_broadcast = None
+# Admin token for /admin/reload; without one only local requests may reload
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Trips a new model must score before it is swapped in
+RELOAD_SAMPLES_PATH = os.environ.get('RELOAD_SAMPLES_PATH',
+                                     os.path.join(API_DIR, '..', 'cleaned_data', 'cleaned_yellow_d1.csv'))
+RELOAD_SAMPLE_SIZE = int(os.environ.get('RELOAD_SAMPLE_SIZE', 500))
+# Reject a new model whose MAE on the samples is this fraction worse than the current one
+RELOAD_MAX_MAE_INCREASE = float(os.environ.get('RELOAD_MAX_MAE_INCREASE', 0.25))
+_reload_samples = None
+
+# Background scoring by the registry's shadow model
+shadow_scorer = ShadowScorer(max_pending=int(os.environ.get('SHADOW_MAX_PENDING', 1000)))
+
+# Metrics exposed on /metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    'taxi_fare_stage_seconds', 'Time spent in each request stage',
+    ['stage']  # parse, zone_lookup, preprocess, queue (inference pool wait), coalesce_queue, scale, forward, serialize
+)
+REQUEST_SECONDS = REGISTRY.histogram('taxi_fare_request_seconds', 'End-to-end request latency', ['route'])
+REQUESTS_TOTAL = REGISTRY.counter('taxi_fare_requests_total', 'Requests handled', ['route', 'method', 'status'])
+REQUEST_ERRORS_TOTAL = REGISTRY.counter('taxi_fare_request_errors_total', 'Requests answered with a 4xx/5xx status', ['route'])
+BATCH_SIZE = REGISTRY.histogram('taxi_fare_batch_size', 'Rows per bulk request or chunk', ['endpoint'], SIZE_BUCKETS)
+COALESCED_BATCH_SIZE = REGISTRY.histogram('taxi_fare_coalescer_batch_size', 'Requests per coalesced batch',
+                                          buckets=BATCH_SIZE_BUCKETS)
+QUOTE_SOURCE_TOTAL = REGISTRY.counter(
+    'taxi_fare_location_quotes_total', 'Location quotes by source',
+    ['source']  # fare_table, cache, model
+)
+ROUTED_TOTAL = REGISTRY.counter('taxi_fare_routed_requests_total', 'Prediction requests by serving model', ['model'])
+SHADOW_SECONDS = REGISTRY.histogram('taxi_fare_shadow_seconds', 'Shadow model scoring time per request', ['model'])
+SHADOW_ABS_DELTA = REGISTRY.histogram(
+    'taxi_fare_shadow_abs_delta_dollars', 'Absolute difference between shadow and served fares per trip',
+    ['model'], (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+)
+SHADOW_TOTAL = REGISTRY.counter(
+    'taxi_fare_shadow_requests_total', 'Requests sent to the shadow model',
+    ['model', 'outcome']  # scored, dropped
+)
+
+def scaler_from_stats(mean, scale):
+    """Rebuild a fitted StandardScaler from its mean and scale vectors"""
+    restored = StandardScaler()
+    restored.mean_ = np.array(mean, dtype=np.float64)
+    restored.scale_ = np.array(scale, dtype=np.float64)
+    restored.var_ = restored.scale_ ** 2
+    restored.n_features_in_ = len(restored.mean_)
+    restored.n_samples_seen_ = 1
+    return restored
+
+def load_weights_file(path):
+    """Read a .pth state_dict into a dict of numpy arrays"""
+    import torch
+    
+    state_dict = torch.load(path, map_location='cpu')
+    return {name: value.detach().cpu().numpy() for name, value in state_dict.items()}
+
+def check_feature_order(order):
+    """Refuse models trained on features the API can't build"""
+    unknown = [feature for feature in order if feature not in FEATURE_DEFAULTS]
+    if unknown:
+        raise ValueError(f"Model expects features the API doesn't know: {unknown}")
+
+def compile_feature_engine(scaler, model_feature_order=None):
+    """Feature engine for a model's feature order with the scaler's mean and scale compiled in"""
+    order = model_feature_order or feature_order
+    if scaler is None:
+        return FeatureEngine(order, FEATURE_DEFAULTS, DAY_MAPPING)
+    return FeatureEngine(order, FEATURE_DEFAULTS, DAY_MAPPING, scaler.mean_, scaler.scale_)
+
+def build_model(weights, scaler, hidden_sizes=(128, 64, 32), input_size=None):
     """
-    Deep Neural Network for taxi fare prediction
+    Build the serving model for the configured backend
+    Returns the model and the weights it was built from
     """
-    def __init__(self, input_size, hidden_sizes=[128, 64, 32], dropout_rate=0.2):
-        super(TaxiFareModel, self).__init__()
-        
-        layers = []
-        prev_size = input_size
-        
-        # Build hidden layers
-        for hidden_size in hidden_sizes:
-            layers.extend([
-                nn.Linear(prev_size, hidden_size),
-                nn.ReLU(),
-                nn.BatchNorm1d(hidden_size),
-                nn.Dropout(dropout_rate)
-            ])
-            prev_size = hidden_size
-        
-        # Output layer (single neuron for regression)
-        layers.append(nn.Linear(prev_size, 1))
-        
-        self.model = nn.Sequential(*layers)
-        
-    def forward(self, x):
-        return self.model(x).squeeze()
+    if INFERENCE_BACKEND == 'numpy':
+        if weights is None:
+            raise RuntimeError("The numpy inference backend requires trained model weights")
+        return NumpyFareModel(weights, scaler.mean_, scaler.scale_), weights
+    
+    torch_model = TaxiFareModel(input_size=input_size or len(feature_order), hidden_sizes=list(hidden_sizes))
+    if weights is not None:
+        torch_model.load_state_dict({
+            name: torch.from_numpy(np.array(value)) for name, value in weights.items()
+        })
+    torch_model.eval()
+    weights = {name: value.numpy() for name, value in torch_model.state_dict().items()}
+    return torch_model, weights
 
-def load_model_and_scaler():
-    """Load the trained model and scaler"""
-    global model, scaler, distance_matrix
+def compile_for_inference(eager_model, model_weights, engine):
+    """
+    Compile the eager torch model for INFERENCE_MODE
+    Returns the model to serve and its fare error against the eager model on
+    the sample trips (None in eager mode and on the numpy backend). Raises
+    ValueError when the mean error is over INFERENCE_MODE_MAX_ERROR.
+    """
+    if INFERENCE_BACKEND != 'torch' or INFERENCE_MODE == 'eager':
+        return eager_model, None
+    
+    compiled = compile_inference_model(eager_model, model_weights, INFERENCE_MODE)
+    
+    scaled_rows = torch.from_numpy(engine.scale_rows(sample_feature_rows(engine)))
+    with torch.no_grad():
+        reference = np.minimum(np.abs(eager_model(scaled_rows).reshape(-1).numpy()), 1000)
+        candidate = np.minimum(np.abs(compiled(scaled_rows).reshape(-1).numpy()), 1000)
+    error = {name: round(value, 4) for name, value in prediction_error(reference, candidate).items()}
+    
+    if error['mean_abs'] > INFERENCE_MODE_MAX_ERROR:
+        raise ValueError(f"Inference mode '{INFERENCE_MODE}' changes fares by ${error['mean_abs']:.4f} on average "
+                         f"(max ${error['max_abs']:.4f}), over INFERENCE_MODE_MAX_ERROR=${INFERENCE_MODE_MAX_ERROR}")
+    logger.info(f"Inference mode '{INFERENCE_MODE}': mean fare error ${error['mean_abs']:.4f}, "
+                f"max ${error['max_abs']:.4f} against the float model")
+    return compiled, error
+
+def build_serving_state(model, model_weights, scaler, distance_matrix, model_version, source,
+                        model_feature_order=None, with_fare_table=True):
+    """
+    Bundle loaded artifacts into a ServingState (compiling the feature engine
+    and the model, and loading the fare table)
+    """
+    feature_engine = compile_feature_engine(scaler, model_feature_order)
+    model, inference_error = compile_for_inference(model, model_weights, feature_engine)
+    return ServingState(
+        model=model,
+        model_weights=model_weights,
+        scaler=scaler,
+        feature_engine=feature_engine,
+        distance_matrix=distance_matrix,
+        model_version=model_version,
+        fare_table=load_fare_table(model_version, distance_matrix) if with_fare_table else None,
+        source=source,
+        loaded_at=datetime.now().isoformat(),
+        inference_error=inference_error
+    )
+
+def load_from_bundle(bundle_path, with_fare_table=True):
+    """Load the model, scaler and distance table from a memory-mapped artifact bundle"""
+    bundle = load_bundle(bundle_path)
+    check_feature_order(bundle.feature_order)
+    
+    scaler = scaler_from_stats(bundle.scaler_mean, bundle.scaler_scale)
+    
+    # Weights are copied into the model; they are small next to the distance table
+    model, model_weights = build_model(bundle.weights, scaler, bundle.model_config['hidden_sizes'],
+                                       len(bundle.feature_order))
+    
+    # The distance table stays a view into the mapping, shared between worker processes
+    distance_matrix = ZoneDistanceTable(bundle.distances) if bundle.distances is not None else None
+    
+    logger.info(f"Artifacts loaded from bundle {bundle_path} (model version {bundle.model_version})")
+    return build_serving_state(model, model_weights, scaler, distance_matrix, bundle.model_version, bundle_path,
+                               bundle.feature_order, with_fare_table)
+
+def load_fare_table(model_version, distance_matrix):
+    """
+    Load the precomputed fare table when LOCATION_QUOTE_MODE is 'table'
+    A table built by a different model or distance matrix is refused (returns None)
+    """
+    if LOCATION_QUOTE_MODE != 'table':
+        return None
+    
+    if not os.path.exists(FARE_TABLE_PATH):
+        logger.warning(f"Fare table {FARE_TABLE_PATH} not found. Location quotes will use the model.")
+        return None
     
     try:
-        # Load model
-        input_size = len(feature_order)  # Updated to 14 features
-        model = TaxiFareModel(input_size=input_size)
-        
-        # Load trained weights
-        model_path = '../best_models/best_taxi_fare_model.pth'
-        if os.path.exists(model_path):
-            try:
-                model.load_state_dict(torch.load(model_path, map_location='cpu'))
-                model.eval()
-                logger.info("Model loaded successfully")
-            except Exception as e:
-                logger.warning(f"Error loading model weights: {e}. Using untrained model.")
+        table = FareTable(FARE_TABLE_PATH)
+        distance_version = compute_distance_version(distance_matrix.distances if distance_matrix is not None else None)
+        if table.model_version != model_version or table.distance_version != distance_version:
+            logger.error(f"Fare table {FARE_TABLE_PATH} was built for model {table.model_version} "
+                         f"(distances {table.distance_version}) but model {model_version} "
+                         f"(distances {distance_version}) is loaded. Refusing to serve it; rebuild with fare_table.py.")
+            return None
+        logger.info(f"Fare table loaded ({table.nbytes / 1024 / 1024:.1f} MB, {table.dtype})")
+        return table
+    except Exception as e:
+        logger.warning(f"Error loading fare table: {e}. Location quotes will use the model.")
+        return None
+
+def load_scaler(scaler_path=SCALER_PATH):
+    """
+    Load a saved StandardScaler, or a dummy-fitted one if it is missing or corrupted
+    joblib reads both joblib.dump files (how the notebook saved scaler.pkl) and plain pickles
+    """
+    if os.path.exists(scaler_path):
+        try:
+            scaler = joblib.load(scaler_path)
+            logger.info("Scaler loaded successfully")
+            return scaler
+        except (pickle.UnpicklingError, EOFError, ValueError, KeyError) as e:
+            logger.warning(f"Scaler file corrupted or invalid: {e}. Creating new scaler.")
+    else:
+        logger.warning("Scaler not found. Created dummy scaler.")
+    
+    # Fit with dummy data that matches expected ranges (14 features)
+    scaler = StandardScaler()
+    dummy_data = np.array([[
+        1, 5, 0.5, 0.5, 2, 0, 1, 2.5, 0, 0.75, 20, 12, 3, 1
+    ]])
+    scaler.fit(dummy_data)
+    return scaler
+
+def load_model_config(config_path=MODEL_CONFIG_PATH, feature_order_path=FEATURE_ORDER_PATH):
+    """
+    Hidden layer sizes and feature order a model was trained with
+    Read from the training notebook's model_config.pkl and feature_order.pkl;
+    the API defaults are used for files that don't exist
+    """
+    hidden_sizes = [128, 64, 32]
+    model_feature_order = list(feature_order)
+    
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'rb') as f:
+            hidden_sizes = list(pickle.load(f)['hidden_sizes'])
+    if feature_order_path and os.path.exists(feature_order_path):
+        with open(feature_order_path, 'rb') as f:
+            model_feature_order = list(pickle.load(f))
+    
+    check_feature_order(model_feature_order)
+    return hidden_sizes, model_feature_order
+
+def load_distance_matrix(distance_matrix_path=DISTANCE_MATRIX_PATH):
+    """Load the zone distance matrix CSV or .npy table (None if unavailable)"""
+    if not os.path.exists(distance_matrix_path):
+        logger.warning("Distance matrix not found. Location-based predictions will use default distance.")
+        return None
+    try:
+        distance_matrix = ZoneDistanceTable.from_file(distance_matrix_path)
+        logger.info(f"Distance matrix loaded successfully ({distance_matrix.nbytes / 1024:.0f} KB)")
+        return distance_matrix
+    except Exception as e:
+        logger.warning(f"Error loading distance matrix: {e}. Location-based predictions will use default distance.")
+        return None
+
+def load_from_files(model_path=MODEL_PATH, scaler_path=SCALER_PATH, config_path=MODEL_CONFIG_PATH,
+                    feature_order_path=FEATURE_ORDER_PATH, distance_matrix=None, with_fare_table=True):
+    """
+    Load the model, scaler and distance matrix from the individual training outputs
+    Pass distance_matrix to share an already loaded one instead of reading the CSV
+    """
+    # Load trained weights
+    weights = None
+    if os.path.exists(model_path):
+        try:
+            weights = load_weights_file(model_path)
+            logger.info("Model loaded successfully")
+        except Exception as e:
+            logger.warning(f"Error loading model weights: {e}. Using untrained model.")
+    else:
+        logger.warning(f"Model file {model_path} not found. Using untrained model.")
+    
+    scaler = load_scaler(scaler_path)
+    hidden_sizes, model_feature_order = load_model_config(config_path, feature_order_path)
+    
+    # Build the model for the configured backend (the numpy backend folds the scaler in)
+    model, model_weights = build_model(weights, scaler, hidden_sizes, len(model_feature_order))
+    
+    if distance_matrix is None:
+        distance_matrix = load_distance_matrix()
+    
+    model_version = compute_model_version(model_weights, scaler.mean_, scaler.scale_)
+    return build_serving_state(model, model_weights, scaler, distance_matrix, model_version, model_path,
+                               model_feature_order, with_fare_table)
+
+def load_artifacts(bundle_path=BUNDLE_PATH):
+    """
+    Load a complete ServingState without touching the one being served
+    The prebuilt artifact bundle is preferred when it exists and was built from
+    the current training outputs; a stale bundle falls back to the files
+    """
+    if bundle_path and os.path.exists(bundle_path):
+        try:
+            stale = stale_sources(load_bundle(bundle_path).sources, BUNDLE_SOURCE_PATHS)
+            if not stale:
+                return load_from_bundle(bundle_path)
+            logger.warning(f"Artifact bundle {bundle_path} is out of date ({', '.join(stale)} changed since it "
+                           f"was built). Loading the individual files; rebuild it with artifact_bundle.py.")
+        except Exception as e:
+            logger.warning(f"Error loading artifact bundle {bundle_path}: {e}. Falling back to individual files.")
+    return load_from_files()
+
+def load_registry_file(path):
+    """
+    Load every model listed in a registry file (see read_registry_file)
+    File-based models share one distance matrix, and entries that resolve to the
+    same model version share one model, so extra versions cost only their weights
+    """
+    config = read_registry_file(path)
+    default = config.get('default') or next(iter(config['models']))
+    
+    distance_matrix = None
+    if any(not entry.get('bundle') for entry in config['models'].values()):
+        distance_matrix = load_distance_matrix()
+    
+    models = {}
+    by_version = {}
+    for name, entry in config['models'].items():
+        # A fare table is built for one model; only the default one can use it
+        with_fare_table = name == default
+        if entry.get('bundle'):
+            state = load_from_bundle(entry['bundle'], with_fare_table)
         else:
-            logger.warning(f"Model file {model_path} not found. Using untrained model.")
+            state = load_from_files(
+                entry.get('weights', MODEL_PATH), entry.get('scaler', SCALER_PATH),
+                entry.get('config', MODEL_CONFIG_PATH), entry.get('feature_order', FEATURE_ORDER_PATH),
+                distance_matrix, with_fare_table
+            )
         
-        # Load scaler
-        scaler_path = '../best_models/scaler.pkl'
-        if os.path.exists(scaler_path):
-            try:
-                with open(scaler_path, 'rb') as f:
-                    scaler = pickle.load(f)
-                logger.info("Scaler loaded successfully")
-            except (pickle.UnpicklingError, EOFError, ValueError) as e:
-                logger.warning(f"Scaler file corrupted or invalid: {e}. Creating new scaler.")
-                # Create a new scaler if the file is corrupted
-                scaler = StandardScaler()
-                # Fit with dummy data that matches expected ranges (14 features)
-                dummy_data = np.array([[
-                    1, 5, 0.5, 0.5, 2, 0, 1, 2.5, 0, 0.75, 20, 12, 3, 1
-                ]])
-                scaler.fit(dummy_data)
-        else:
-            # Create a dummy scaler if not found
-            scaler = StandardScaler()
-            # Fit with dummy data that matches expected ranges (14 features)
-            dummy_data = np.array([[
-                1, 5, 0.5, 0.5, 2, 0, 1, 2.5, 0, 0.75, 20, 12, 3, 1
-            ]])
-            scaler.fit(dummy_data)
-            logger.warning("Scaler not found. Created dummy scaler.")
-        
-        # Load distance matrix
-        distance_matrix_path = '../distances/full_taxi_zone_distance_matrix.csv'
-        if os.path.exists(distance_matrix_path):
-            try:
-                distance_matrix = pd.read_csv(distance_matrix_path, index_col=0)
-                logger.info("Distance matrix loaded successfully")
-            except Exception as e:
-                logger.warning(f"Error loading distance matrix: {e}. Location-based predictions will use default distance.")
-                distance_matrix = None
-        else:
-            logger.warning("Distance matrix not found. Location-based predictions will use default distance.")
-            distance_matrix = None
+        shared = by_version.get(state.model_version)
+        if shared is not None and shared.feature_engine.feature_order == state.feature_engine.feature_order:
+            state = state._replace(model=shared.model, model_weights=shared.model_weights,
+                                   feature_engine=shared.feature_engine)
+        by_version.setdefault(state.model_version, state)
+        models[name] = state
+        logger.info(f"Registry model '{name}': version {state.model_version} from {state.source}")
+    
+    shadow = config.get('shadow') or {}
+    return ModelRegistry(models, default, config.get('traffic'), shadow.get('model'),
+                         float(shadow.get('sample_rate', 1.0)), source=path)
+
+def load_registry(source='auto', changed=None, bundle_path=BUNDLE_PATH):
+    """
+    Load the ModelRegistry to serve without touching the one being served
+    Uses MODEL_REGISTRY when set, otherwise a single model named 'default'.
+    source='files' skips the bundle; so do file-watch reloads where only the
+    individual training outputs changed
+    """
+    if MODEL_REGISTRY:
+        return load_registry_file(MODEL_REGISTRY)
+    
+    if source == 'files' or (changed and bundle_path not in changed):
+        state = load_from_files()
+    else:
+        state = load_artifacts(bundle_path)
+    return ModelRegistry({'default': state}, 'default', source=state.source)
+
+def activate_registry(registry):
+    """
+    Make registry the one new requests are routed with
+    Requests already running keep the model they started with; the module-level
+    model, scaler, etc. are updated to the default model for scripts that read them
+    """
+    global current_registry, current_state, model, model_weights, scaler, feature_engine, distance_matrix
+    global model_version, fare_table, artifacts_ready
+    
+    state = registry.default_state
+    model = state.model
+    model_weights = state.model_weights
+    scaler = state.scaler
+    feature_engine = state.feature_engine
+    distance_matrix = state.distance_matrix
+    model_version = state.model_version
+    fare_table = state.fare_table
+    
+    # One reference assignment each: a request reads current_registry once
+    current_state = state
+    current_registry = registry
+    artifacts_ready = True
+    
+    # Quote cache keys include the model version; clearing just frees the old entries
+    quote_cache.clear()
+
+def load_model_and_scaler(bundle_path=BUNDLE_PATH):
+    """Load the trained model and scaler"""
+    start_time = time.perf_counter()
+    
+    try:
+        registry = load_registry(bundle_path=bundle_path)
+        activate_registry(registry)
+        if zone_index is None:
+            load_zone_index()
+        logger.info(f"Startup artifacts ready in {time.perf_counter() - start_time:.3f}s "
+                    f"({INFERENCE_BACKEND} backend, model version {registry.model_version}, "
+                    f"{len(registry.models)} model(s))")
+        return registry.default_state
             
     except Exception as e:
         logger.error(f"Error loading model/scaler: {str(e)}")
         raise
 
-def preprocess_input(data):
+def load_zone_index(zones_path=ZONE_CENTROIDS_PATH):
+    """Build the nearest-zone index from the geocoded zone centroids (None if unavailable)"""
+    global zone_index
+    
+    if not os.path.exists(zones_path):
+        logger.warning(f"Zone centroids {zones_path} not found. Coordinate-based predictions are unavailable.")
+        return None
+    try:
+        start_time = time.perf_counter()
+        zone_index = ZoneIndex.from_csv(zones_path, max_distance_km=ZONE_MAX_DISTANCE_KM)
+        logger.info(f"Zone index built in {time.perf_counter() - start_time:.3f}s "
+                    f"({len(zone_index.location_ids)} zones, {zone_index.nbytes / 1024:.0f} KB)")
+        return zone_index
+    except Exception as e:
+        logger.warning(f"Error building zone index: {e}. Coordinate-based predictions are unavailable.")
+        return None
+
+def load_reload_samples():
     """
-    Preprocess input data for prediction
+    Sample trips used to validate a reloaded model or a compiled inference mode: (trips, fares)
+    Read once from RELOAD_SAMPLES_PATH; None when the file is missing. The
+    training notebook fits on the start of the file, so the samples are the
+    last RELOAD_SAMPLE_SIZE trips, held out like inference_modes.py's
     """
-    try:
-        # Handle day name to number conversion
-        if 'pickup_day' in data and isinstance(data['pickup_day'], str):
-            day_mapping = {
-                'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
-                'Friday': 4, 'Saturday': 5, 'Sunday': 6,
-                'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-                'friday': 4, 'saturday': 5, 'sunday': 6
-            }
-            data['pickup_day'] = day_mapping.get(data['pickup_day'], 0)
-        
-        # Create feature array in correct order
-        features = []
-        for feature in feature_order:
-            if feature in data:
-                features.append(float(data[feature]))
-            else:
-                # Default values for missing features (updated for 14 features)
-                defaults = {
-                    'passenger_count': 1, 'trip_distance': 5.0, 'extra': 0.5, 'mta_tax': 0.5,
-                    'tip_amount': 2.0, 'tolls_amount': 0.0, 'payment_type': 1, 
-                    'congestion_surcharge': 2.5, 'Airport_fee': 0.0, 'cbd_congestion_fee': 0.75, 
-                    'trip_duration_minutes': 20, 'pickup_hour': 12, 'pickup_day': 3, 'pickup_month': 1
-                }
-                features.append(defaults.get(feature, 0.0))
-        
-        # Convert to numpy array
-        features_array = np.array([features], dtype=np.float32)
+    global _reload_samples
+    
+    if _reload_samples is None:
+        if not os.path.exists(RELOAD_SAMPLES_PATH):
+            logger.warning(f"Reload samples {RELOAD_SAMPLES_PATH} not found. Reloads only check for finite predictions.")
+            return None
         
-        # Apply scaling
-        if scaler:
-            features_array = scaler.transform(features_array)
+        import csv
+        from collections import deque
         
-        return features_array
+        with open(RELOAD_SAMPLES_PATH, newline='') as f:
+            trips = list(deque(csv.DictReader(f), maxlen=RELOAD_SAMPLE_SIZE))
+        fares = [float(record.pop('fare_amount')) for record in trips]
+        _reload_samples = (trips, np.array(fares))
+    return _reload_samples
+
+def sample_feature_rows(engine):
+    """Unscaled feature matrix of the sample trips for a feature engine (default rows without samples)"""
+    samples = load_reload_samples()
+    trips = samples[0] if samples is not None else [{}] * 8
+    features_array = np.empty((len(trips), engine.n_features), dtype=np.float32)
+    for row, trip in zip(features_array, trips):
+        engine.fill(trip, out=row)
+    return features_array
+
+def validate_state(state, previous=None):
+    """
+    Warm up a newly loaded state and check it before it is swapped in
+    Raises ValueError if it produces non-finite fares or its MAE on the sample
+    trips is more than RELOAD_MAX_MAE_INCREASE worse than the previous model's
+    """
+    samples = load_reload_samples()
+    fares = samples[1] if samples is not None else None
+    
+    def sample_predictions(sample_state):
+        return predict_raw_features(sample_feature_rows(sample_state.feature_engine), state=sample_state)
+    
+    # The first calls on a new model are slow; make them here instead of in a request
+    predict_raw_features(state.feature_engine.default_row.reshape(1, -1), state=state)
+    predictions = sample_predictions(state)
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError("New model produced non-finite fares on the sample trips")
+    
+    summary = {'samples': len(predictions)}
+    if fares is not None:
+        summary['mae'] = round(float(np.mean(np.abs(predictions - fares))), 4)
+        if previous is not None:
+            summary['previous_mae'] = round(float(np.mean(np.abs(sample_predictions(previous) - fares))), 4)
+            if summary['mae'] > summary['previous_mae'] * (1 + RELOAD_MAX_MAE_INCREASE):
+                raise ValueError(f"New model MAE {summary['mae']} is more than {RELOAD_MAX_MAE_INCREASE:.0%} "
+                                 f"worse than the current model's {summary['previous_mae']}")
+    return summary
+
+def validate_registry(registry):
+    """validate_state for each model, against the model of the same name currently served (or the default)"""
+    active = current_registry
+    summary = {}
+    for name, state in registry.models.items():
+        previous = None
+        if active is not None:
+            previous = active.models.get(name, active.default_state)
+        try:
+            summary[name] = validate_state(state, previous)
+        except ValueError as e:
+            raise ValueError(f"Model '{name}': {e}")
+    return summary
+
+def reload_watch_paths():
+    """
+    Artifact files whose change triggers a reload: the default training outputs,
+    the bundle, the registry file and every file the registry lists
+    """
+    paths = [MODEL_PATH, SCALER_PATH, MODEL_CONFIG_PATH, FEATURE_ORDER_PATH, DISTANCE_MATRIX_PATH, BUNDLE_PATH]
+    if MODEL_REGISTRY:
+        paths.append(MODEL_REGISTRY)
+        try:
+            for entry in read_registry_file(MODEL_REGISTRY)['models'].values():
+                paths.extend(entry.get(key) for key in ('bundle', 'weights', 'scaler', 'config', 'feature_order'))
+        except Exception as e:
+            # A half-written registry file is picked up on the next poll
+            logger.warning(f"Could not read registry file {MODEL_REGISTRY} for watching: {e}")
+    return list(dict.fromkeys(path for path in paths if path))
+
+reloader = ModelReloader(load_registry, validate_registry, activate_registry, watch_paths=reload_watch_paths)
+
+def start_reload_watcher():
+    """
+    Start watching the artifact files if RELOAD_WATCH is on, and follow
+    reloads requested in other worker processes when serving under serve.py
+    """
+    if RELOAD_WATCH:
+        reloader.start_watching(RELOAD_POLL_SECONDS)
+    if reload_broadcast is not None:
+        reloader.start_following(reload_broadcast)
+
+def convert_pickup_day(data):
+    """
+    Replace a pickup_day name in data with its number
+    Responses echo the request with the converted day, so the API keeps doing this in place
+    """
+    if 'pickup_day' in data and isinstance(data['pickup_day'], str):
+        data['pickup_day'] = DAY_MAPPING.get(data['pickup_day'], 0)
+
+def preprocess_input(data, out=None, state=None):
+    """
+    Preprocess input data for prediction
+    Returns the scaled features written into out (a 1-D row of length F) when
+    given, otherwise this thread's reusable (1, F) buffer, which the next call
+    on the same thread overwrites (copy it to keep it)
+    """
+    state = state or current_state
+    try:
+        convert_pickup_day(data)
+        return state.feature_engine.transform(data, out)
         
     except Exception as e:
         logger.error(f"Error preprocessing input: {str(e)}")
         raise
 
-def make_prediction(features_array):
+def build_feature_matrix(trips, state=None):
+    """
+    Build one unscaled (N, F) feature matrix for a list of trips
+    Returns the matrix, the trip index of each row and a dict of
+    per-trip errors for trips that could not be converted
+    """
+    feature_engine = (state or current_state).feature_engine
+    features_array = np.empty((len(trips), feature_engine.n_features), dtype=np.float32)
+    row_indices = []
+    errors = {}
+    
+    for i, trip in enumerate(trips):
+        try:
+            convert_pickup_day(trip)
+            feature_engine.fill(trip, out=features_array[len(row_indices)])
+            row_indices.append(i)
+        except Exception as e:
+            errors[i] = str(e)
+    
+    return features_array[:len(row_indices)], row_indices, errors
+
+def make_prediction(features_array, state=None):
     """
     Make prediction using the loaded model
     """
+    model = (state or current_state).model
     try:
+        if INFERENCE_BACKEND == 'numpy':
+            return float(model.predict(features_array, scaled=True)[0])
+        
         with torch.no_grad():
             # Convert to tensor
             input_tensor = torch.tensor(features_array, dtype=torch.float32)
@@ -190,23 +746,484 @@ def make_prediction(features_array):
         logger.error(f"Error making prediction: {str(e)}")
         raise
 
-# API Routes
+def get_inference_pool():
+    """This process's inference pool, started on first use"""
+    global inference_pool
+    
+    if inference_pool is None:
+        with _inference_pool_lock:
+            if inference_pool is None:
+                inference_pool = InferencePool(
+                    INFERENCE_POOL_THREADS, INFERENCE_POOL_MAX_QUEUE,
+                    on_wait=lambda seconds: STAGE_SECONDS.observe(seconds, 'queue')
+                )
+    return inference_pool
 
-@app.route('/', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
+def predict_raw_features(features_array, chunk_size=None, state=None):
+    """
+    Predict fares for an unscaled feature matrix, one forward pass per chunk of rows
+    Uses the given ServingState, or the active one. With INFERENCE_EXECUTION=pool
+    the forward passes run on the inference pool (PoolFullError when its queue is full).
+    """
+    state = state or current_state
+    if INFERENCE_EXECUTION == 'pool':
+        return get_inference_pool().run(forward_raw_features, features_array, chunk_size, state)
+    return forward_raw_features(features_array, chunk_size, state)
+
+def forward_raw_features(features_array, chunk_size, state):
+    """
+    predict_raw_features on the calling thread
+    The torch backend scales each chunk; the numpy backend has the scaler folded in
+    """
+    model = state.model
+    chunk_size = chunk_size or BATCH_CHUNK_SIZE
+    predictions = np.empty(len(features_array), dtype=np.float32)
+    
+    try:
+        for start in range(0, len(features_array), chunk_size):
+            chunk = np.ascontiguousarray(features_array[start:start + chunk_size], dtype=np.float32)
+            
+            if INFERENCE_BACKEND == 'numpy':
+                # The scaler is folded into the first layer, so there's no separate scale stage
+                with STAGE_SECONDS.time('forward'):
+                    predictions[start:start + len(chunk)] = model.predict(chunk)
+                continue
+            
+            # Compiled mean/scale arrays instead of scaler.transform and its input validation
+            with STAGE_SECONDS.time('scale'):
+                chunk = state.feature_engine.scale_rows(chunk)
+            with STAGE_SECONDS.time('forward'), torch.no_grad():
+                output = model(torch.from_numpy(chunk))
+            predictions[start:start + len(chunk)] = output.reshape(-1).numpy()
+        
+        return predictions
+        
+    except Exception as e:
+        logger.error(f"Error making batch prediction: {str(e)}")
+        raise
+
+def predict_coalesced_batch(features_array, state):
+    return predict_raw_features(features_array, state=state)
+
+def predict_single(features_row, state=None):
+    """
+    Predict the fare for one unscaled feature row
+    With COALESCE_REQUESTS enabled the row joins a micro-batch with concurrent requests
+    """
+    global coalescer
+    
+    state = state or current_state
+    if COALESCE_REQUESTS:
+        if coalescer is None:
+            with _coalescer_lock:
+                if coalescer is None:
+                    coalescer = RequestCoalescer(
+                        predict_coalesced_batch, COALESCE_MAX_BATCH, COALESCE_WAIT_MS,
+                        on_wait=lambda seconds: STAGE_SECONDS.observe(seconds, 'coalesce_queue'),
+                        on_batch=COALESCED_BATCH_SIZE.observe
+                    )
+        # Rows are only batched with others scored by the same state
+        return coalescer.submit(features_row, context=state)
+    
+    features_array = np.asarray(features_row, dtype=np.float32).reshape(1, -1)
+    return float(predict_raw_features(features_array, state=state)[0])
+
+def build_location_features(pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month,
+                            state=None):
+    """
+    Build the full feature dict for a zone-to-zone trip from the inputs the UI provides
+    """
+    distance_matrix = (state or current_state).distance_matrix
+    
+    # Get distance from matrix
+    trip_distance = 5.0  # Default distance
+    if distance_matrix is not None:
+        distance = distance_matrix.lookup(pickup_id, dropoff_id)
+        if distance is None:
+            logger.warning(f"Distance not found for {pickup_id} -> {dropoff_id}, using default")
+        else:
+            trip_distance = distance
+    
+    # Estimate trip duration (rough estimate: 2.5 minutes per mile + base time)
+    trip_duration_minutes = max(5, int(trip_distance * 2.5))
+    
+    # Create trip features with intelligent estimates
+    return {
+        'passenger_count': passenger_count,
+        'trip_distance': trip_distance,
+        'extra': 0.5,  # Standard extra charge
+        'mta_tax': 0.5,  # Standard MTA tax
+        'tip_amount': max(2.0, trip_distance * 0.3),  # Estimated tip (30% of distance)
+        'tolls_amount': 0.0,  # Default no tolls
+        'payment_type': 1,  # Default credit card
+        'congestion_surcharge': 2.5 if 6 <= pickup_hour <= 20 else 0.0,  # Peak hours
+        'Airport_fee': 5.0 if pickup_id in [1, 132, 138] or dropoff_id in [1, 132, 138] else 0.0,
+        'cbd_congestion_fee': 0.75 if pickup_id <= 100 or dropoff_id <= 100 else 0.0,  # Manhattan zones
+        'trip_duration_minutes': trip_duration_minutes,
+        'pickup_hour': pickup_hour,
+        'pickup_day': pickup_day,
+        'pickup_month': pickup_month
+    }
+
+def build_location_feature_matrix(pickup_ids, dropoff_ids, passenger_counts, pickup_hours, pickup_days, pickup_months,
+                                  state=None):
+    """
+    Vectorized build_location_features for arrays of trips (pickup_days as numbers 0-6)
+    Returns an unscaled (N, F) feature matrix in the model's feature order
+    """
+    state = state or current_state
+    distance_matrix = state.distance_matrix
+    pickup_ids, dropoff_ids, passenger_counts, pickup_hours, pickup_days, pickup_months = (
+        column.reshape(-1) for column in np.broadcast_arrays(
+            pickup_ids, dropoff_ids, passenger_counts, pickup_hours, pickup_days, pickup_months
+        )
+    )
+    
+    if distance_matrix is not None:
+        trip_distance = distance_matrix.lookup_many(pickup_ids, dropoff_ids, default=5.0).astype(np.float64)
+    else:
+        trip_distance = np.full(len(pickup_ids), 5.0)
+    
+    airport_zones = [1, 132, 138]
+    columns = {
+        'passenger_count': passenger_counts,
+        'trip_distance': trip_distance,
+        'extra': 0.5,
+        'mta_tax': 0.5,
+        'tip_amount': np.maximum(2.0, trip_distance * 0.3),
+        'tolls_amount': 0.0,
+        'payment_type': 1,
+        'congestion_surcharge': np.where((pickup_hours >= 6) & (pickup_hours <= 20), 2.5, 0.0),
+        'Airport_fee': np.where(np.isin(pickup_ids, airport_zones) | np.isin(dropoff_ids, airport_zones), 5.0, 0.0),
+        'cbd_congestion_fee': np.where((pickup_ids <= 100) | (dropoff_ids <= 100), 0.75, 0.0),
+        'trip_duration_minutes': np.maximum(5, np.floor(trip_distance * 2.5)),
+        'pickup_hour': pickup_hours,
+        'pickup_day': pickup_days,
+        'pickup_month': pickup_months
+    }
+    
+    model_feature_order = state.feature_engine.feature_order
+    features_array = np.empty((len(pickup_ids), len(model_feature_order)), dtype=np.float32)
+    for j, feature in enumerate(model_feature_order):
+        features_array[:, j] = columns[feature]
+    return features_array
+
+def predict_location_fares(pickup_ids, dropoff_ids, passenger_counts, pickup_hours, pickup_days, pickup_months,
+                           state=None):
+    """
+    Predict clipped fares for arrays of zone-to-zone trips (used to build the fare table)
+    """
+    state = state or current_state
+    features_array = build_location_feature_matrix(
+        pickup_ids, dropoff_ids, passenger_counts, pickup_hours, pickup_days, pickup_months, state=state
+    )
+    return np.minimum(np.abs(predict_raw_features(features_array, state=state)), 1000)
+
+def quote_location_trip(pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month,
+                        state=None):
+    """
+    Predict the fare for a zone-to-zone trip
+    Returns the fare and the trip features it was based on; fares come from the
+    fare table when one is loaded, and repeated quotes are served from quote_cache
+    """
+    state = state or current_state
+    
+    # Precomputed fares answer with a table lookup
+    if state.fare_table is not None:
+        day_number = DAY_MAPPING.get(pickup_day, 0) if isinstance(pickup_day, str) else pickup_day
+        table_fare = state.fare_table.lookup(pickup_id, dropoff_id, passenger_count, pickup_hour, day_number, pickup_month)
+        if table_fare is not None:
+            QUOTE_SOURCE_TOTAL.inc('fare_table')
+            return table_fare, build_location_features(
+                pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month, state=state
+            )
+    
+    # Keyed by model version too, so a request still running on the old model
+    # can't cache its quote for the new one
+    key = QuoteCache.make_key(
+        state.model_version, pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month
+    )
+    cached = quote_cache.get(key)
+    if cached is not None:
+        QUOTE_SOURCE_TOTAL.inc('cache')
+        return cached
+    
+    QUOTE_SOURCE_TOTAL.inc('model')
+    with STAGE_SECONDS.time('preprocess'):
+        trip_features = build_location_features(
+            pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month, state=state
+        )
+        features_row = state.feature_engine.fill(trip_features)
+    predicted_fare = predict_single(features_row, state=state)
+    
+    # Ensure prediction is reasonable
+    if predicted_fare < 0:
+        predicted_fare = abs(predicted_fare)
+    if predicted_fare > 1000:
+        predicted_fare = 1000
+    
+    quote = (predicted_fare, trip_features)
+    quote_cache.put(key, quote)
+    return quote
+
+def score_record_stream(records, chunk_size, include_inputs=True, id_field='id', state=None):
+    """
+    Score an iterator of trip records chunk by chunk, yielding NDJSON result lines
+    Only one chunk of records is held in memory at a time, and the whole stream
+    is scored by one model (state, or the default model active when it started)
+    """
+    state = state or current_state
+    row = 0
+    try:
+        for chunk in iter_chunks(records, chunk_size):
+            # Records the reader couldn't parse arrive as exceptions
+            parsed = [i for i, record in enumerate(chunk) if not isinstance(record, Exception)]
+            BATCH_SIZE.observe(len(chunk), 'stream')
+            with STAGE_SECONDS.time('preprocess'):
+                features_array, row_indices, errors = build_feature_matrix([chunk[i] for i in parsed], state=state)
+            fares = np.minimum(np.abs(predict_raw_features(features_array, state=state)), 1000).tolist()
+            
+            chunk_fares = {parsed[j]: fare for j, fare in zip(row_indices, fares)}
+            chunk_errors = {parsed[j]: message for j, message in errors.items()}
+            
+            lines = []
+            for i, record in enumerate(chunk):
+                result = {'row': row + i}
+                if isinstance(record, Exception):
+                    result['error'] = str(record)
+                else:
+                    if id_field in record:
+                        result['id'] = record[id_field]
+                    if i in chunk_fares:
+                        result['predicted_fare'] = round(chunk_fares[i], 2)
+                    else:
+                        result['error'] = chunk_errors[i]
+                    if include_inputs:
+                        result['input_data'] = record
+                lines.append(json.dumps(result))
+            
+            row += len(chunk)
+            yield '\n'.join(lines) + '\n'
+        
+        logger.info(f"Streaming prediction: {row} rows scored")
+        
+    except Exception as e:
+        # Headers are already sent, so report the failure as a final line
+        logger.error(f"Streaming prediction error after {row} rows: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield json.dumps({'row': row, 'error': f'Streaming prediction failed: {str(e)}'}) + '\n'
+
+def collect_component_metrics():
+    """
+    Quote cache and coalescer counters, read at scrape time (coalesced batch
+    sizes and queue waits are histograms updated by the coalescer itself)
+    """
+    cache = quote_cache.stats()
+    samples = [
+        ('taxi_fare_quote_cache_hits_total', 'counter', 'Quote cache hits', [({}, cache['hits'])]),
+        ('taxi_fare_quote_cache_misses_total', 'counter', 'Quote cache misses', [({}, cache['misses'])]),
+        ('taxi_fare_quote_cache_evictions_total', 'counter', 'Quote cache LRU evictions', [({}, cache['evictions'])]),
+        ('taxi_fare_quote_cache_hit_ratio', 'gauge', 'Quote cache hit rate since startup', [({}, cache['hit_rate'])]),
+        ('taxi_fare_quote_cache_entries', 'gauge', 'Entries in the quote cache', [({}, cache['size'])])
+    ]
+    if inference_pool is not None:
+        stats = inference_pool.stats()
+        samples += [
+            ('taxi_fare_inference_pool_queue_depth', 'gauge', 'Calls waiting for an inference thread', [({}, stats['queue_depth'])]),
+            ('taxi_fare_inference_pool_busy_threads', 'gauge', 'Inference threads running a forward pass', [({}, stats['busy_threads'])]),
+            ('taxi_fare_inference_pool_rejected_total', 'counter', 'Calls refused because the inference queue was full', [({}, stats['rejected_total'])])
+        ]
+    if coalescer is not None:
+        stats = coalescer.stats()
+        samples += [
+            ('taxi_fare_coalescer_requests_total', 'counter', 'Requests scored by the coalescer', [({}, stats['requests_total'])]),
+            ('taxi_fare_coalescer_batches_total', 'counter', 'Batches run by the coalescer', [({}, stats['batches_total'])]),
+            ('taxi_fare_coalescer_queue_depth', 'gauge', 'Requests waiting for the coalescer', [({}, stats['queue_depth'])])
+        ]
+    samples.append(('taxi_fare_shadow_queue_depth', 'gauge', 'Requests waiting for the shadow model',
+                    [({}, shadow_scorer.stats()['pending'])]))
+    return samples
+
+REGISTRY.register_collector(collect_component_metrics)
+
+# Model routing and shadow scoring
+
+def route_model(model_name=None, routing_key=None):
+    """
+    (registry, model name, state) serving one request, from the registry active now
+    The whole request is served by that state even if a reload swaps the registry
+    meanwhile. Raises KeyError for an unknown model_name.
+    """
+    registry = current_registry
+    name, state = registry.select(model_name, routing_key)
+    ROUTED_TOTAL.inc(name)
+    return registry, name, state
+
+def unknown_model_payload(model_name):
+    return {
+        'status': 'error',
+        'message': f"Unknown model '{model_name}'",
+        'available_models': sorted(current_registry.models),
+        'timestamp': datetime.now().isoformat()
+    }
+
+def score_shadow(shadow_name, state, trips, served_fares):
+    """
+    Score trips with the shadow model and record its latency and fare deltas (runs on the shadow thread)
+    The forward pass runs right here rather than on the inference pool, so
+    shadow traffic never takes queue slots from live requests
+    """
+    start_time = time.perf_counter()
+    features_array, row_indices, _ = build_feature_matrix(trips, state=state)
+    shadow_fares = np.minimum(np.abs(forward_raw_features(features_array, None, state)), 1000)
+    SHADOW_SECONDS.observe(time.perf_counter() - start_time, shadow_name)
+    
+    deltas = np.abs(shadow_fares - np.asarray(served_fares, dtype=np.float64)[row_indices])
+    for delta in deltas[np.isfinite(deltas)].tolist():
+        SHADOW_ABS_DELTA.observe(delta, shadow_name)
+    SHADOW_TOTAL.inc(shadow_name, 'scored')
+
+def submit_shadow(registry, name, trips, served_fares):
+    """
+    Send trips the served model priced to the registry's shadow model, if any
+    Never blocks: when the shadow queue is full the trips are dropped.
+    served_fares lines up with trips (NaN for trips that weren't priced).
+    """
+    shadow = registry.shadow_for(name)
+    if shadow is None:
+        return
+    shadow_name, shadow_state = shadow
+    if not shadow_scorer.submit(score_shadow, shadow_name, shadow_state, trips, served_fares):
+        SHADOW_TOTAL.inc(shadow_name, 'dropped')
+
+# Request handlers
+# Each handler takes the parsed JSON body and returns (payload, status), so the
+# Flask routes below and the ASGI app (asgi_app.py) serve identical responses
+
+def concurrency_payload():
+    """Thread settings and inference pool state for this process"""
+    payload = {
+        'inference_execution': INFERENCE_EXECUTION,
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None
+    }
+    if INFERENCE_BACKEND == 'torch':
+        payload['torch_intra_op_threads'] = torch.get_num_threads()
+        payload['torch_inter_op_threads'] = torch.get_num_interop_threads()
+    return payload
+
+def server_busy_payload():
+    return {
+        'status': 'error',
+        'message': 'Server busy, retry later',
+        'timestamp': datetime.now().isoformat()
+    }
+
+def health_payload():
+    """API status and model loading information"""
+    return {
         'status': 'success',
         'message': 'Taxi Fare Prediction API is running',
         'model_loaded': model is not None,
         'scaler_loaded': scaler is not None,
         'distance_matrix_loaded': distance_matrix is not None,
+        'model_version': model_version,
+        'inference_backend': INFERENCE_BACKEND,
+        'inference_mode': INFERENCE_MODE,
+        'inference_error': current_state.inference_error if current_state is not None else None,
         'total_features': len(feature_order),
+        'coalescer': coalescer.stats() if coalescer is not None else None,
+        'concurrency': concurrency_payload(),
+        'quote_cache': quote_cache.stats(),
+        'location_quote_mode': LOCATION_QUOTE_MODE,
+        'fare_table_loaded': fare_table is not None,
+        'zone_index_loaded': zone_index is not None,
+        'model_loaded_at': current_state.loaded_at if current_state is not None else None,
+        'models': sorted(current_registry.models) if current_registry is not None else [],
         'timestamp': datetime.now().isoformat()
-    })
+    }
 
-@app.route('/predict', methods=['POST'])
-def predict_fare():
+def handle_admin_reload(params, token, remote_addr):
+    """
+    Start (POST) or inspect (GET, params=None) a model reload
+    params: 'source' ('auto' or 'files') and 'wait' ('1' to block until done)
+    """
+    if ADMIN_TOKEN:
+        allowed = token == ADMIN_TOKEN
+    else:
+        allowed = remote_addr in ('127.0.0.1', '::1')
+    if not allowed:
+        return {
+            'status': 'error',
+            'message': 'Reloading requires the X-Admin-Token header' if ADMIN_TOKEN else 'Reloading is only allowed from localhost',
+            'timestamp': datetime.now().isoformat()
+        }, 403
+    
+    if params is None:
+        return {'status': 'success', 'reload': reloader.status(), 'timestamp': datetime.now().isoformat()}, 200
+    
+    source = params.get('source', 'auto')
+    if source not in ('auto', 'files'):
+        return {
+            'status': 'error',
+            'message': f"Unknown source '{source}' (expected 'auto' or 'files')",
+            'timestamp': datetime.now().isoformat()
+        }, 400
+    
+    wait = params.get('wait') == '1'
+    if not reloader.reload(source=source):
+        return {
+            'status': 'error',
+            'message': 'A reload is already in progress',
+            'reload': reloader.status(),
+            'timestamp': datetime.now().isoformat()
+        }, 409
+    
+    # Other workers pick the reload up within a second; wait=1 only waits for this one
+    if reload_broadcast is not None:
+        reload_broadcast.publish(source)
+    
+    if wait:
+        reloader.join()
+        result = reloader.last_result
+        return {
+            'status': result['status'],
+            'reload': result,
+            'model_version': model_version,
+            'timestamp': datetime.now().isoformat()
+        }, 200 if result['status'] == 'success' else 422
+    return {
+        'status': 'success',
+        'message': 'Reload started',
+        'model_version': model_version,
+        'timestamp': datetime.now().isoformat()
+    }, 202
+
+def models_payload():
+    """Models in the active registry, the traffic split and shadow scoring counts"""
+    registry = current_registry
+    if registry is None:
+        return {
+            'status': 'error',
+            'message': 'Models are not loaded yet',
+            'timestamp': datetime.now().isoformat()
+        }, 503
+    payload = {'status': 'success'}
+    payload.update(registry.describe())
+    payload['shadow_scoring'] = shadow_scorer.stats()
+    payload['timestamp'] = datetime.now().isoformat()
+    return payload, 200
+
+def readiness_payload():
+    """Readiness probe: 503 until the model, scaler and distance table are loaded"""
+    return {
+        'status': 'success' if artifacts_ready else 'error',
+        'ready': artifacts_ready,
+        'model_version': model_version,
+        'pid': os.getpid(),
+        'timestamp': datetime.now().isoformat()
+    }, 200 if artifacts_ready else 503
+
+def handle_predict(data, model_name=None, routing_key=None):
     """
     Main prediction endpoint
     Expected JSON format:
@@ -231,23 +1248,24 @@ def predict_fare():
     }
     """
     try:
-        # Get JSON data from request
-        data = request.get_json()
-        
+        registry, name, state = route_model(model_name, routing_key)
+    except KeyError:
+        return unknown_model_payload(model_name), 400
+    try:
         if not data:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'No JSON data provided'
-            }), 400
+            }, 400
         
         # Log the request
         logger.info(f"Prediction request: {data}")
         
-        # Preprocess input
-        features_array = preprocess_input(data)
-        
-        # Make prediction
-        predicted_fare = make_prediction(features_array)
+        # Build features and predict
+        with STAGE_SECONDS.time('preprocess'):
+            convert_pickup_day(data)
+            features_row = state.feature_engine.fill(data)
+        predicted_fare = predict_single(features_row, state=state)
         
         # Ensure prediction is reasonable (basic validation)
         if predicted_fare < 0:
@@ -255,31 +1273,70 @@ def predict_fare():
         if predicted_fare > 1000:  # Cap at $1000
             predicted_fare = 1000
         
+        submit_shadow(registry, name, [data], [predicted_fare])
+        
         # Prepare response
         response = {
             'status': 'success',
             'predicted_fare': round(predicted_fare, 2),
             'currency': 'USD',
+            'model': name,
             'input_data': data,
             'timestamp': datetime.now().isoformat()
         }
         
         logger.info(f"Prediction successful: ${predicted_fare:.2f}")
-        return jsonify(response)
+        return response, 200
         
+    except PoolFullError:
+        return server_busy_payload(), 503
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Prediction error: {error_msg}")
         logger.error(traceback.format_exc())
         
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'Prediction failed: {error_msg}',
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/predict_from_locations', methods=['POST'])
-def predict_fare_from_locations():
+def location_quote(data, pickup_id, dropoff_id, state):
+    """
+    Quote a zone-to-zone trip using the optional trip fields of a request
+    Returns the fare, the trip features and the quote fields of the response
+    """
+    passenger_count = data.get('passenger_count', 1)
+    pickup_hour = data.get('pickup_hour', 14)
+    pickup_day = data.get('pickup_day', 'Friday')
+    pickup_month = data.get('pickup_month', 1)
+    
+    predicted_fare, trip_features = quote_location_trip(
+        pickup_id, dropoff_id, passenger_count, pickup_hour, pickup_day, pickup_month, state=state
+    )
+    
+    return predicted_fare, trip_features, {
+        'predicted_fare': round(predicted_fare, 2),
+        'currency': 'USD',
+        'trip_details': {
+            'pickup_location_id': pickup_id,
+            'dropoff_location_id': dropoff_id,
+            'trip_distance': round(trip_features['trip_distance'], 2),
+            'trip_duration_minutes': trip_features['trip_duration_minutes'],
+            'passenger_count': passenger_count,
+            'pickup_hour': pickup_hour,
+            'pickup_day': pickup_day,
+            'pickup_month': pickup_month
+        },
+        'estimated_features': {
+            'congestion_surcharge': trip_features['congestion_surcharge'],
+            'airport_fee': trip_features['Airport_fee'],
+            'cbd_congestion_fee': trip_features['cbd_congestion_fee'],
+            'estimated_tip': trip_features['tip_amount']
+        }
+    }
+
+def handle_predict_from_locations(data, model_name=None, routing_key=None):
     """
     Location-based prediction endpoint for simplified UI
     Expected JSON format:
@@ -293,118 +1350,232 @@ def predict_fare_from_locations():
     }
     """
     try:
-        data = request.get_json()
-        
+        registry, name, state = route_model(model_name, routing_key)
+    except KeyError:
+        return unknown_model_payload(model_name), 400
+    try:
         if not data:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'No JSON data provided'
-            }), 400
+            }, 400
         
         # Required fields
         required_fields = ['pickup_location_id', 'dropoff_location_id']
         missing_fields = [field for field in required_fields if field not in data]
         
         if missing_fields:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': f'Missing required fields: {missing_fields}'
-            }), 400
+            }, 400
         
         # Extract location IDs
         pickup_id = int(data['pickup_location_id'])
         dropoff_id = int(data['dropoff_location_id'])
         
-        # Get distance from matrix
-        trip_distance = 5.0  # Default distance
-        if distance_matrix is not None:
-            try:
-                trip_distance = distance_matrix.loc[pickup_id, str(dropoff_id)]
-                if pd.isna(trip_distance):
-                    trip_distance = 5.0  # Fallback for missing distances
-            except (KeyError, IndexError):
-                logger.warning(f"Distance not found for {pickup_id} -> {dropoff_id}, using default")
-                trip_distance = 5.0
-        
-        # Estimate trip duration (rough estimate: 2.5 minutes per mile + base time)
-        trip_duration_minutes = max(5, int(trip_distance * 2.5))
-        
-        # Get other parameters with defaults
-        passenger_count = data.get('passenger_count', 1)
-        pickup_hour = data.get('pickup_hour', 14)
-        pickup_day = data.get('pickup_day', 'Friday')
-        pickup_month = data.get('pickup_month', 1)
-        
-        # Create trip features with intelligent estimates
-        trip_features = {
-            'passenger_count': passenger_count,
-            'trip_distance': trip_distance,
-            'extra': 0.5,  # Standard extra charge
-            'mta_tax': 0.5,  # Standard MTA tax
-            'tip_amount': max(2.0, trip_distance * 0.3),  # Estimated tip (30% of distance)
-            'tolls_amount': 0.0,  # Default no tolls
-            'payment_type': 1,  # Default credit card
-            'congestion_surcharge': 2.5 if 6 <= pickup_hour <= 20 else 0.0,  # Peak hours
-            'Airport_fee': 5.0 if pickup_id in [1, 132, 138] or dropoff_id in [1, 132, 138] else 0.0,
-            'cbd_congestion_fee': 0.75 if pickup_id <= 100 or dropoff_id <= 100 else 0.0,  # Manhattan zones
-            'trip_duration_minutes': trip_duration_minutes,
-            'pickup_hour': pickup_hour,
-            'pickup_day': pickup_day,
-            'pickup_month': pickup_month
-        }
-        
-        # Preprocess and predict
-        features_array = preprocess_input(trip_features)
-        predicted_fare = make_prediction(features_array)
+        predicted_fare, trip_features, quote = location_quote(data, pickup_id, dropoff_id, state)
         
-        # Ensure prediction is reasonable
-        if predicted_fare < 0:
-            predicted_fare = abs(predicted_fare)
-        if predicted_fare > 1000:
-            predicted_fare = 1000
+        # trip_features may be a cached quote, so the shadow model gets a copy
+        submit_shadow(registry, name, [dict(trip_features)], [predicted_fare])
         
         # Prepare response
         response = {
             'success': True,
             'status': 'success',
-            'predicted_fare': round(predicted_fare, 2),
-            'currency': 'USD',
-            'trip_details': {
-                'pickup_location_id': pickup_id,
-                'dropoff_location_id': dropoff_id,
-                'trip_distance': round(trip_distance, 2),
-                'trip_duration_minutes': trip_duration_minutes,
-                'passenger_count': passenger_count,
-                'pickup_hour': pickup_hour,
-                'pickup_day': pickup_day,
-                'pickup_month': pickup_month
-            },
-            'estimated_features': {
-                'congestion_surcharge': trip_features['congestion_surcharge'],
-                'airport_fee': trip_features['Airport_fee'],
-                'cbd_congestion_fee': trip_features['cbd_congestion_fee'],
-                'estimated_tip': trip_features['tip_amount']
-            },
+            **quote,
+            'model': name,
             'timestamp': datetime.now().isoformat()
         }
         
         logger.info(f"Location-based prediction: {pickup_id}->{dropoff_id} = ${predicted_fare:.2f}")
-        return jsonify(response)
+        return response, 200
         
+    except PoolFullError:
+        return server_busy_payload(), 503
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Location-based prediction error: {error_msg}")
         logger.error(traceback.format_exc())
         
-        return jsonify({
+        return {
             'success': False,
             'status': 'error',
             'message': f'Location-based prediction failed: {error_msg}',
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/predict/batch', methods=['POST'])
-def predict_batch():
+COORDINATE_FIELDS = ('pickup_latitude', 'pickup_longitude', 'dropoff_latitude', 'dropoff_longitude')
+
+def parse_coordinates(trip):
+    """
+    (pickup_lat, pickup_lon, dropoff_lat, dropoff_lon) of a trip and an error message (None if valid)
+    Never raises: every invalid trip comes back as (None, message)
+    """
+    if not isinstance(trip, dict):
+        return None, f'Trip must be a JSON object, got {type(trip).__name__}'
+    missing_fields = [field for field in COORDINATE_FIELDS if field not in trip]
+    if missing_fields:
+        return None, f'Missing required fields: {missing_fields}'
+    try:
+        return tuple(float(trip[field]) for field in COORDINATE_FIELDS), None
+    except (TypeError, ValueError):
+        return None, f'Coordinates must be numbers: {COORDINATE_FIELDS}'
+
+def resolve_zones(coordinates):
+    """
+    Nearest zones for an (n, 4) array of pickup/dropoff coordinates
+    Returns (n, 2) LocationIDs (0 where no zone is close enough) and distances in km
+    """
+    if len(coordinates) == 1:
+        # Scalar lookups skip the numpy overhead of a one-row batch
+        resolved = [zone_index.lookup(*coordinates[0, :2]), zone_index.lookup(*coordinates[0, 2:])]
+        return (np.array([[location_id or 0 for location_id, _ in resolved]]),
+                np.array([[np.nan if distance is None else distance for _, distance in resolved]]))
+    
+    location_ids, distances = zone_index.nearest(coordinates[:, [0, 2]], coordinates[:, [1, 3]])
+    return location_ids.reshape(-1, 2), distances.reshape(-1, 2)
+
+def handle_predict_from_coordinates(data, model_name=None, routing_key=None):
+    """
+    Coordinate-based prediction endpoint
+    Pickup and dropoff points are resolved to the nearest zone centroids and
+    priced like /predict_from_locations. Expected JSON format (or
+    {"trips": [...]} of these for a batch):
+    {
+        "pickup_latitude": 40.7580,
+        "pickup_longitude": -73.9855,
+        "dropoff_latitude": 40.6413,
+        "dropoff_longitude": -73.7781,
+        "passenger_count": 1,
+        "pickup_hour": 14,
+        "pickup_day": "Friday",
+        "pickup_month": 1
+    }
+    """
+    try:
+        registry, name, state = route_model(model_name, routing_key)
+    except KeyError:
+        return unknown_model_payload(model_name), 400
+    try:
+        if not data:
+            return {
+                'status': 'error',
+                'message': 'No JSON data provided'
+            }, 400
+        
+        if zone_index is None:
+            return {
+                'status': 'error',
+                'message': 'Zone centroids not loaded; coordinate-based predictions are unavailable',
+                'timestamp': datetime.now().isoformat()
+            }, 503
+        
+        batch = isinstance(data, dict) and 'trips' in data
+        trips = data['trips'] if batch else [data]
+        if batch:
+            if not isinstance(trips, list) or not trips:
+                return {
+                    'status': 'error',
+                    'message': 'trips must be a non-empty list. Expected format: {"trips": [...]}'
+                }, 400
+            BATCH_SIZE.observe(len(trips), 'coordinates')
+        
+        coordinates = np.full((len(trips), 4), np.nan)
+        errors = {}
+        for i, trip in enumerate(trips):
+            values, error = parse_coordinates(trip)
+            if error is None:
+                coordinates[i] = values
+            else:
+                errors[i] = error
+        
+        with STAGE_SECONDS.time('zone_lookup'):
+            location_ids, distances = resolve_zones(coordinates)
+        
+        results = []
+        shadow_trips, shadow_fares = [], []
+        for i, trip in enumerate(trips):
+            if i in errors:
+                results.append({'error': errors[i]})
+                continue
+            
+            pickup_id, dropoff_id = (int(location_id) for location_id in location_ids[i])
+            if not pickup_id or not dropoff_id:
+                point = 'pickup' if not pickup_id else 'dropoff'
+                results.append({'error': f'No taxi zone within {ZONE_MAX_DISTANCE_KM:g} km of the {point} point'})
+                continue
+            
+            try:
+                predicted_fare, trip_features, quote = location_quote(trip, pickup_id, dropoff_id, state)
+            except PoolFullError:
+                raise
+            except Exception as e:
+                # Bad optional fields (e.g. a non-numeric pickup_hour) fail this trip only
+                errors[i] = str(e)
+                results.append({'error': errors[i]})
+                continue
+            quote['resolved_zones'] = {
+                'pickup': {'location_id': pickup_id, 'distance_km': round(float(distances[i, 0]), 3)},
+                'dropoff': {'location_id': dropoff_id, 'distance_km': round(float(distances[i, 1]), 3)}
+            }
+            results.append(quote)
+            shadow_trips.append(dict(trip_features))
+            shadow_fares.append(predicted_fare)
+        
+        if shadow_trips:
+            submit_shadow(registry, name, shadow_trips, shadow_fares)
+        
+        if not batch:
+            result = results[0]
+            if 'error' in result:
+                return {
+                    'success': False,
+                    'status': 'error',
+                    'message': result['error'],
+                    'timestamp': datetime.now().isoformat()
+                }, 400 if 0 in errors else 422
+            
+            logger.info(f"Coordinate-based prediction: {result['trip_details']['pickup_location_id']}->"
+                        f"{result['trip_details']['dropoff_location_id']} = ${result['predicted_fare']:.2f}")
+            return {
+                'success': True,
+                'status': 'success',
+                **result,
+                'model': name,
+                'timestamp': datetime.now().isoformat()
+            }, 200
+        
+        predictions = []
+        for i, (trip, result) in enumerate(zip(trips, results)):
+            predictions.append({'trip_index': i, **result, 'input_data': trip})
+        
+        logger.info(f"Coordinate batch prediction: {len(shadow_trips)}/{len(trips)} trips priced")
+        
+        return {
+            'status': 'success',
+            'predictions': predictions,
+            'total_trips': len(trips),
+            'successful_predictions': len(shadow_trips),
+            'model': name,
+            'timestamp': datetime.now().isoformat()
+        }, 200
+        
+    except PoolFullError:
+        return server_busy_payload(), 503
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Coordinate-based prediction error: {error_msg}")
+        logger.error(traceback.format_exc())
+        
+        return {
+            'success': False,
+            'status': 'error',
+            'message': f'Coordinate-based prediction failed: {error_msg}',
+            'timestamp': datetime.now().isoformat()
+        }, 500
+
+def handle_predict_batch(data, model_name=None, routing_key=None):
     """
     Batch prediction endpoint
     Expected JSON format:
@@ -417,60 +1588,71 @@ def predict_batch():
     }
     """
     try:
-        data = request.get_json()
-        
+        registry, name, state = route_model(model_name, routing_key)
+    except KeyError:
+        return unknown_model_payload(model_name), 400
+    try:
         if not data or 'trips' not in data:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'No trips data provided. Expected format: {"trips": [...]}'
-            }), 400
+            }, 400
         
         trips = data['trips']
-        predictions = []
+        BATCH_SIZE.observe(len(trips), 'batch')
+        
+        # Build one feature matrix and run it through the model in chunks
+        with STAGE_SECONDS.time('preprocess'):
+            features_array, row_indices, errors = build_feature_matrix(trips, state=state)
+        fares = predict_raw_features(features_array, state=state)
         
+        # Basic validation
+        fares = np.minimum(np.abs(fares), 1000)
+        
+        if registry.shadow is not None:
+            served_fares = np.full(len(trips), np.nan)
+            served_fares[row_indices] = fares
+            submit_shadow(registry, name, trips, served_fares)
+        
+        predictions = []
+        row_fares = dict(zip(row_indices, fares.tolist()))
         for i, trip in enumerate(trips):
-            try:
-                features_array = preprocess_input(trip)
-                predicted_fare = make_prediction(features_array)
-                
-                # Basic validation
-                if predicted_fare < 0:
-                    predicted_fare = abs(predicted_fare)
-                if predicted_fare > 1000:
-                    predicted_fare = 1000
-                
+            if i in errors:
                 predictions.append({
                     'trip_index': i,
-                    'predicted_fare': round(predicted_fare, 2),
+                    'error': errors[i],
                     'input_data': trip
                 })
-                
-            except Exception as e:
+            else:
                 predictions.append({
                     'trip_index': i,
-                    'error': str(e),
+                    'predicted_fare': round(row_fares[i], 2),
                     'input_data': trip
                 })
         
-        return jsonify({
+        logger.info(f"Batch prediction: {len(row_indices)}/{len(trips)} trips scored")
+        
+        return {
             'status': 'success',
             'predictions': predictions,
             'total_trips': len(trips),
             'successful_predictions': len([p for p in predictions if 'predicted_fare' in p]),
+            'model': name,
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
         
+    except PoolFullError:
+        return server_busy_payload(), 503
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}")
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'Batch prediction failed: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/features', methods=['GET'])
-def get_features():
-    """Get information about required features"""
+def features_payload():
+    """Information about required features"""
     feature_info = {
         'required_features': feature_order,
         'feature_descriptions': {
@@ -512,24 +1694,232 @@ def get_features():
             'pickup_hour': 14,
             'pickup_day': 'Friday',
             'pickup_month': 1
+        },
+        'coordinate_based_example': {
+            'pickup_latitude': 40.7580,
+            'pickup_longitude': -73.9855,
+            'dropoff_latitude': 40.6413,
+            'dropoff_longitude': -73.7781,
+            'passenger_count': 1,
+            'pickup_hour': 14,
+            'pickup_day': 'Friday',
+            'pickup_month': 1
         }
     }
     
-    return jsonify(feature_info)
+    return feature_info
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({
+def not_found_payload():
+    """Error body for unknown endpoints"""
+    return {
         'status': 'error',
         'message': 'Endpoint not found',
         'available_endpoints': [
             'GET /',
+            'GET /ready',
+            'GET /metrics',
+            'GET /models',
             'POST /predict',
             'POST /predict_from_locations',
+            'POST /predict_from_coordinates',
             'POST /predict/batch',
-            'GET /features'
+            'POST /predict/stream',
+            'POST /predict/columnar',
+            'GET /features',
+            'GET|POST /admin/reload'
         ]
-    }), 404
+    }
+
+# API Routes
+
+def get_request_json():
+    """Parsed JSON body (None if missing or invalid), timed as the parse stage"""
+    with STAGE_SECONDS.time('parse'):
+        return request.get_json(silent=True)
+
+def request_model_routing():
+    """Routing headers: X-Model picks a model by name, X-Routing-Key keeps a caller on one model"""
+    return {
+        'model_name': request.headers.get('X-Model'),
+        'routing_key': request.headers.get('X-Routing-Key')
+    }
+
+def json_response(payload, status=200):
+    """jsonify, timed as the serialize stage"""
+    with STAGE_SECONDS.time('serialize'):
+        return jsonify(payload), status
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if route != '/metrics':
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, route)
+    REQUESTS_TOTAL.inc(route, request.method, str(response.status_code))
+    if response.status_code >= 400:
+        REQUEST_ERRORS_TOTAL.inc(route)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics for this process"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return json_response(health_payload())
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe"""
+    return json_response(*readiness_payload())
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """Registered models, traffic split and shadow scoring status"""
+    return json_response(*models_payload())
+
+@app.route('/predict', methods=['POST'])
+def predict_fare():
+    """Main prediction endpoint (see handle_predict)"""
+    return json_response(*handle_predict(get_request_json(), **request_model_routing()))
+
+@app.route('/predict_from_locations', methods=['POST'])
+def predict_fare_from_locations():
+    """Location-based prediction endpoint (see handle_predict_from_locations)"""
+    return json_response(*handle_predict_from_locations(get_request_json(), **request_model_routing()))
+
+@app.route('/predict_from_coordinates', methods=['POST'])
+def predict_from_coordinates():
+    """Coordinate-based prediction endpoint (see handle_predict_from_coordinates)"""
+    return json_response(*handle_predict_from_coordinates(get_request_json(), **request_model_routing()))
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint (see handle_predict_batch)"""
+    return json_response(*handle_predict_batch(get_request_json(), **request_model_routing()))
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming bulk scoring endpoint
+    Accepts an NDJSON (Content-Type: application/x-ndjson) or CSV (text/csv)
+    upload, optionally sent with chunked transfer encoding, and streams back one
+    NDJSON line per input row:
+        {"row": 0, "id": "abc", "predicted_fare": 23.5, "input_data": {...}}
+        {"row": 1, "error": "could not convert string to float: 'x'"}
+    Query parameters:
+        fields=minimal  return only row numbers, IDs and fares
+        id_field=name   input field echoed back as "id" (default "id")
+    """
+    try:
+        _, _, state = route_model(**request_model_routing())
+    except KeyError:
+        return json_response(unknown_model_payload(request.headers.get('X-Model')), 400)
+    
+    mimetype = request.mimetype
+    if mimetype in ('text/csv', 'application/csv'):
+        records = iter_csv_records(request.stream)
+    elif mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonlines'):
+        records = iter_ndjson_records(request.stream)
+    else:
+        return jsonify({
+            'status': 'error',
+            'message': 'Unsupported Content-Type. Send application/x-ndjson or text/csv.'
+        }), 415
+    
+    include_inputs = request.args.get('fields', 'all') != 'minimal'
+    id_field = request.args.get('id_field', 'id')
+    
+    results = score_record_stream(records, STREAM_CHUNK_SIZE, include_inputs, id_field, state)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+@app.route('/predict/columnar', methods=['POST'])
+def predict_columnar():
+    """
+    Columnar batch scoring for service-to-service calls
+    Accepts an Arrow IPC stream (Content-Type: application/vnd.apache.arrow.stream)
+    with one column per feature, or a raw little-endian float32 buffer
+    (application/octet-stream) holding N x F values in the model's feature order.
+    Query parameters:
+        layout=rows     raw buffer is one trip after another (default)
+        layout=columns  raw buffer is one feature column after another
+    Returns the N clipped fares as packed little-endian float32
+    (application/octet-stream), with X-Row-Count, X-Model and X-Model-Version headers
+    """
+    try:
+        _, name, state = route_model(**request_model_routing())
+    except KeyError:
+        return json_response(unknown_model_payload(request.headers.get('X-Model')), 400)
+    model_feature_order = state.feature_engine.feature_order
+    mimetype = request.mimetype
+    try:
+        with STAGE_SECONDS.time('parse'):
+            if mimetype in ARROW_STREAM_MIMETYPES:
+                features_array = decode_arrow_stream(request.get_data(), model_feature_order, FEATURE_DEFAULTS, DAY_MAPPING)
+            elif mimetype in RAW_FLOAT32_MIMETYPES:
+                features_array = decode_raw_float32(
+                    request.get_data(), len(model_feature_order), request.args.get('layout', 'rows')
+                )
+            else:
+                return json_response({
+                    'status': 'error',
+                    'message': 'Unsupported Content-Type. Send application/vnd.apache.arrow.stream '
+                               'or application/octet-stream.'
+                }, 415)
+    except ImportError:
+        return json_response({
+            'status': 'error',
+            'message': 'Arrow input requires pyarrow, which is not installed'
+        }, 415)
+    except ValueError as e:
+        return json_response({
+            'status': 'error',
+            'message': f'Invalid columnar input: {str(e)}'
+        }, 400)
+    
+    try:
+        BATCH_SIZE.observe(len(features_array), 'columnar')
+        fares = np.minimum(np.abs(predict_raw_features(features_array, state=state)), 1000)
+        
+        with STAGE_SECONDS.time('serialize'):
+            body = encode_fares(fares)
+        logger.info(f"Columnar prediction: {len(fares)} trips scored")
+        return Response(body, mimetype='application/octet-stream', headers={
+            'X-Row-Count': str(len(fares)),
+            'X-Model': name,
+            'X-Model-Version': state.model_version or ''
+        })
+        
+    except PoolFullError:
+        return json_response(server_busy_payload(), 503)
+    except Exception as e:
+        logger.error(f"Columnar prediction error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return json_response({
+            'status': 'error',
+            'message': f'Columnar prediction failed: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }, 500)
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """Reload the model in the background (POST) or report reload status (GET)"""
+    params = request.args if request.method == 'POST' else None
+    return json_response(*handle_admin_reload(params, request.headers.get('X-Admin-Token'), request.remote_addr))
+
+@app.route('/features', methods=['GET'])
+def get_features():
+    """Get information about required features"""
+    return json_response(features_payload())
+
+@app.errorhandler(404)
+def not_found(error):
+    return jsonify(not_found_payload()), 404
 
 @app.errorhandler(500)
 def internal_error(error):
@@ -546,9 +1936,10 @@ if __name__ == '__main__':
         
         # Load model and scaler
         load_model_and_scaler()
+        start_reload_watcher()
         
-        # Start the Flask app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        # Start the Flask development server (production uses serve.py)
+        app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1', host='0.0.0.0', port=5000)
         
     except Exception as e:
         logger.error(f"Failed to start API: {str(e)}")
@@ -0,0 +1,103 @@
+"""
+Bounded LRU/TTL cache for location-based fare quotes
+/predict_from_locations only varies by zone pair, passenger count, hour, day
+and month, and traffic repeats heavily, so repeated quotes can skip feature
+construction and inference entirely
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_quote_value(value):
+    """
+    Normalize one request value for use in a cache key
+    Numbers compare by value, so 1 and 1.0 share an entry; strings are kept as
+    given because day names map to numbers case-sensitively
+    """
+    if isinstance(value, bool) or value is None:
+        raise TypeError(f"Unsupported quote value: {value!r}")
+    if isinstance(value, str):
+        return value
+    return float(value)
+
+
+class QuoteCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live
+
+    Args:
+        max_size: Most entries kept; the least recently used entry is evicted first
+        ttl_seconds: Entries older than this are treated as misses (0 disables expiry)
+    """
+    def __init__(self, max_size=10000, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(*values):
+        """
+        Build a cache key from request values, or None if they can't be normalized
+        (such requests bypass the cache and are validated by the normal path)
+        """
+        try:
+            return tuple(normalize_quote_value(value) for value in values)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not self.ttl_seconds or time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full"""
+        if key is None or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (called whenever a new model or scaler is loaded)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,150 @@
+"""
+Micro-batching request coalescer
+Single-row prediction requests from concurrent server threads are queued and
+run through the model together by one background thread, so a burst of N
+requests costs one forward pass instead of N
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class RequestCoalescer:
+    """
+    Collects requests for up to max_wait_ms (or until max_batch_size rows are
+    waiting) and scores them with one call to predict_batch
+
+    Args:
+        predict_batch: Function (matrix, context) mapping a (N, F) float32 matrix
+            to N predictions; context is whatever the rows were submitted with
+        max_batch_size: Most rows scored in one batch
+        max_wait_ms: Longest a request waits for others to join its batch
+        on_wait: Optional callback given each request's queue wait in seconds
+        on_batch: Optional callback given each batch's size
+    """
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=2.0, on_wait=None, on_batch=None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_wait = on_wait
+        self.on_batch = on_batch
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # Metrics
+        self.requests_total = 0
+        self.batches_total = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+
+    def start(self):
+        """Start the batching thread (safe to call more than once)"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='request-coalescer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the batching thread once queued requests are done"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def submit(self, features_row, context=None, timeout=None):
+        """
+        Queue one feature row and block until its prediction is ready
+        Rows are only batched with rows submitted with the same context object
+
+        Returns:
+            The prediction as a float
+        """
+        self.start()
+        future = Future()
+        self._queue.put((np.asarray(features_row, dtype=np.float32).reshape(-1), time.perf_counter(), future, context))
+        return future.result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Gather more requests until the batch is full or the wait window closes
+            batch = [item]
+            deadline = item[1] + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._score(batch)
+            if stopping:
+                return
+
+    def _score(self, batch):
+        started = time.perf_counter()
+
+        # Almost always one group; more only while a new model is being swapped in
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[3]), []).append(item)
+
+        for items in groups.values():
+            futures = [future for _, _, future, _ in items]
+            try:
+                predictions = self.predict_batch(np.stack([row for row, _, _, _ in items]), items[0][3])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, prediction in zip(futures, predictions):
+                    future.set_result(float(prediction))
+
+        queue_seconds = [started - submitted for _, submitted, _, _ in batch]
+        with self._stats_lock:
+            self.requests_total += len(batch)
+            self.batches_total += 1
+            self.batch_size_counts[np.searchsorted(BATCH_SIZE_BUCKETS, len(batch))] += 1
+            self.queue_seconds_total += sum(queue_seconds)
+            self.queue_seconds_max = max(self.queue_seconds_max, max(queue_seconds))
+
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+        if self.on_wait is not None:
+            for seconds in queue_seconds:
+                self.on_wait(seconds)
+
+    def stats(self):
+        """Batch size and queueing metrics"""
+        with self._stats_lock:
+            buckets = {str(bound): count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)}
+            buckets['+Inf'] = self.batch_size_counts[-1]
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'requests_total': self.requests_total,
+                'batches_total': self.batches_total,
+                'mean_batch_size': round(self.requests_total / self.batches_total, 2) if self.batches_total else 0.0,
+                'batch_size_buckets': buckets,
+                'mean_queue_ms': round(self.queue_seconds_total / self.requests_total * 1000, 3) if self.requests_total else 0.0,
+                'max_queue_ms': round(self.queue_seconds_max * 1000, 3),
+                'queue_depth': self._queue.qsize()
+            }
@@ -0,0 +1,168 @@
+"""
+Offline bulk scoring for TLC trip parquet files
+Streams each file in slices of --batch-rows rows (so even a file stored as a
+single row group is spread over every worker and never read whole), derives
+the model features the same way preprocess_input does, scores the slices
+across a process pool and writes a parquet file per input with the predicted
+fare appended
+
+Usage (run from model/api):
+    python score_parquet.py "../../green taxi data/green_tripdata_2025-01.parquet" --output-dir ../scored --residuals
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from concurrency import peak_rss_mb
+
+# Pickup/dropoff timestamp columns used by yellow (tpep), green (lpep) and cleaned data
+DATETIME_COLUMNS = [
+    ('tpep_pickup_datetime', 'tpep_dropoff_datetime'),
+    ('lpep_pickup_datetime', 'lpep_dropoff_datetime'),
+    ('pickup_datetime', 'dropoff_datetime')
+]
+
+# Loaded once per worker process
+_api = None
+
+
+def derive_features(df, feature_order, defaults, day_mapping):
+    """
+    Build the unscaled (N, F) feature matrix for a DataFrame of trips, columns in feature_order
+    Vectorized equivalent of FeatureEngine.fill: day names map to numbers, and
+    missing columns or null values take the feature defaults
+    """
+    derived = {}
+    for pickup_column, dropoff_column in DATETIME_COLUMNS:
+        if pickup_column in df.columns and dropoff_column in df.columns:
+            pickup = pd.to_datetime(df[pickup_column])
+            dropoff = pd.to_datetime(df[dropoff_column])
+            derived = {
+                'trip_duration_minutes': (dropoff - pickup).dt.total_seconds() / 60,
+                'pickup_hour': pickup.dt.hour,
+                'pickup_day': pickup.dt.dayofweek,  # Monday=0, same as the day name mapping
+                'pickup_month': pickup.dt.month
+            }
+            break
+
+    # TLC files spell some columns differently across years (e.g. airport_fee)
+    columns_by_lower_name = {column.lower(): column for column in df.columns}
+
+    features_array = np.empty((len(df), len(feature_order)), dtype=np.float32)
+    for j, feature in enumerate(feature_order):
+        column = columns_by_lower_name.get(feature.lower())
+        if column is not None:
+            values = df[column]
+        elif feature in derived:
+            values = derived[feature]
+        else:
+            features_array[:, j] = defaults.get(feature, 0.0)
+            continue
+
+        if feature == 'pickup_day' and not pd.api.types.is_numeric_dtype(values):
+            values = values.map(lambda day: day_mapping.get(day, 0) if isinstance(day, str) else day)
+
+        values = pd.to_numeric(values, errors='coerce').astype(np.float64)
+        features_array[:, j] = values.fillna(defaults.get(feature, 0.0)).to_numpy()
+
+    return features_array
+
+
+def _init_worker(torch_threads):
+    """Load the model once per worker and keep torch from oversubscribing the CPU"""
+    global _api
+
+    import predictionAPI
+
+    if predictionAPI.INFERENCE_BACKEND == 'torch':
+        predictionAPI.torch.set_num_threads(torch_threads)
+    predictionAPI.load_model_and_scaler()
+    _api = predictionAPI
+
+
+def iter_slices(paths, batch_rows):
+    """(path, record batch) pairs of at most batch_rows rows, in file order"""
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            yield path, batch
+
+
+def _score_slice(task):
+    """Score one slice; returns the table with predicted_fare (and residual) columns added"""
+    path, batch, residuals = task
+    table = pa.Table.from_batches([batch])
+    df = table.to_pandas()
+
+    # Columns in the order of the model actually loaded (a registry or bundle model may differ)
+    state = _api.current_state
+    features_array = derive_features(df, state.feature_engine.feature_order, _api.FEATURE_DEFAULTS, _api.DAY_MAPPING)
+    fares = np.minimum(np.abs(_api.predict_raw_features(features_array, state=state)), 1000)
+
+    table = table.append_column('predicted_fare', pa.array(fares, type=pa.float32()))
+    if residuals and 'fare_amount' in df.columns:
+        residual = df['fare_amount'].to_numpy(dtype=np.float64) - fares
+        table = table.append_column('fare_residual', pa.array(residual, type=pa.float64()))
+    return path, table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score TLC trip parquet files with the fare model')
+    parser.add_argument('inputs', nargs='+', help='Parquet files to score')
+    parser.add_argument('--output-dir', default='scored', help='Directory for the scored parquet files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--torch-threads', type=int, default=1, help='torch threads per worker')
+    parser.add_argument('--batch-rows', type=int, default=100_000, help='Rows per slice sent to a worker')
+    parser.add_argument('--residuals', action='store_true', help='Add fare_amount - predicted_fare as fare_residual')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    input_rows = sum(pq.ParquetFile(path).metadata.num_rows for path in args.inputs)
+
+    print(f"🚕 Scoring {len(args.inputs)} file(s), {input_rows:,} rows in slices of {args.batch_rows:,} "
+          f"on {args.workers} workers")
+    start_time = time.perf_counter()
+    total_rows = 0
+    writers = {}
+
+    def write(path, table):
+        nonlocal total_rows
+        if path not in writers:
+            name = os.path.splitext(os.path.basename(path))[0] + '_scored.parquet'
+            writers[path] = pq.ParquetWriter(os.path.join(args.output_dir, name), table.schema)
+        writers[path].write_table(table)
+        total_rows += table.num_rows
+
+    try:
+        with Pool(args.workers, initializer=_init_worker, initargs=(args.torch_threads,)) as pool:
+            # Results are written in submission order, so each output mirrors its input.
+            # At most two slices per worker are in flight, which bounds memory
+            pending = deque()
+            for path, batch in iter_slices(args.inputs, args.batch_rows):
+                pending.append(pool.apply_async(_score_slice, ((path, batch, args.residuals),)))
+                if len(pending) >= 2 * args.workers:
+                    write(*pending.popleft().get())
+            while pending:
+                write(*pending.popleft().get())
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    own_rss, worker_rss = peak_rss_mb()
+
+    print(f"✅ Scored {total_rows:,} rows in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/sec)")
+    if own_rss is not None:
+        print(f"   Peak RSS: {own_rss:.0f} MB (main), {worker_rss:.0f} MB (largest worker)")
+    print(f"   Output: {os.path.abspath(args.output_dir)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Production server for the Taxi Fare Prediction API
+The model, scaler and distance table are loaded once in the gunicorn master,
+then N workers are forked and share those pages copy-on-write. Each worker
+pins torch to a fixed number of threads so workers don't oversubscribe CPUs.
+
+Usage (run from model/api):
+    python serve.py --workers 4 --torch-threads 1 --bind 0.0.0.0:5000
+
+SIGTERM/SIGINT stop accepting connections and let in-flight requests finish
+(up to --graceful-timeout seconds) before workers exit.
+
+Because the artifacts load before any worker exists, a worker never answers
+/ready with 503; a failed load stops the server instead.
+"""
+
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+import predictionAPI
+from concurrency import configure_torch_threads
+from model_reloader import ReloadBroadcast
+from predictionAPI import app, logger
+
+
+def default_torch_threads(workers):
+    """Split the CPUs evenly between workers (at least one thread each)"""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def pin_torch_threads(torch_threads):
+    """Limit torch intra-op (and inter-op) threads for this process (no-op on the numpy backend)"""
+    if predictionAPI.INFERENCE_BACKEND != 'torch':
+        return
+    configure_torch_threads(torch_threads, predictionAPI.TORCH_INTER_OP_THREADS)
+
+
+class FareServer(BaseApplication):
+    """gunicorn application that preloads the artifacts before forking workers"""
+    def __init__(self, options, torch_threads):
+        self.options = options
+        self.torch_threads = torch_threads
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+        torch_threads = self.torch_threads
+
+        def post_fork(server, worker):
+            pin_torch_threads(torch_threads)
+            # Each worker swaps in new artifacts for itself, on file changes
+            # (RELOAD_WATCH=1) and on reloads requested in any worker
+            predictionAPI.start_reload_watcher()
+            logger.info(f"Worker {worker.pid} started ({torch_threads} torch threads)")
+
+        def worker_exit(server, worker):
+            # Let queued micro-batches finish before the worker goes away
+            if predictionAPI.coalescer is not None:
+                predictionAPI.coalescer.stop()
+
+        self.cfg.set('post_fork', post_fork)
+        self.cfg.set('worker_exit', worker_exit)
+
+    def load(self):
+        # Runs once in the master because preload_app is on
+        pin_torch_threads(self.torch_threads)
+        predictionAPI.load_model_and_scaler()
+
+        # Created before the fork so every worker shares it (see /admin/reload)
+        predictionAPI.reload_broadcast = ReloadBroadcast()
+
+        # Move everything loaded so far out of the GC's reach, so collections in
+        # the workers don't touch (and copy) the shared pages
+        gc.freeze()
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Taxi Fare Prediction API with gunicorn')
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:5000'), help='Address to listen on')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='Worker processes')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 1)),
+                        help='Request threads per worker')
+    parser.add_argument('--torch-threads', type=int, default=int(os.environ.get('TORCH_INTRA_OP_THREADS', 0)) or None,
+                        help='torch threads per worker (default: TORCH_INTRA_OP_THREADS, else CPUs / workers)')
+    parser.add_argument('--timeout', type=int, default=30, help='Seconds before a stuck worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds workers get to finish in-flight requests on shutdown')
+    args = parser.parse_args()
+
+    torch_threads = args.torch_threads or default_torch_threads(args.workers)
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': '-'
+    }
+
+    logger.info(f"Starting Taxi Fare Prediction API on {args.bind} "
+                f"({args.workers} workers x {args.threads} threads, {torch_threads} torch threads each)")
+    FareServer(options, torch_threads).run()
+
+
+if __name__ == '__main__':
+    main()
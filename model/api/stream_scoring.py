@@ -0,0 +1,55 @@
+"""
+Incremental readers for bulk scoring uploads
+Records are parsed one line at a time from the request stream, so memory use
+doesn't grow with the size of the upload
+"""
+
+import codecs
+import csv
+import json
+from itertools import islice
+
+
+def iter_ndjson_records(stream):
+    """
+    Yield one trip per non-blank NDJSON line
+    Lines that aren't valid JSON objects are yielded as a ValueError so the
+    caller can report them by row without stopping the stream
+    """
+    for line in codecs.iterdecode(stream, 'utf-8'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield ValueError("Each line must be a JSON object")
+            continue
+        yield record
+
+
+def iter_csv_records(stream):
+    """
+    Yield one trip per CSV row (the first row holds the column names)
+    Empty cells are treated as missing so feature defaults apply, and numeric
+    pickup_day values are converted so they aren't mistaken for day names
+    """
+    for row in csv.DictReader(codecs.iterdecode(stream, 'utf-8')):
+        record = {name: value for name, value in row.items() if name and value not in (None, '')}
+        day = record.get('pickup_day')
+        if day is not None and day.lstrip('-').isdigit():
+            record['pickup_day'] = int(day)
+        yield record
+
+
+def iter_chunks(records, chunk_size):
+    """Group an iterator of records into lists of up to chunk_size"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,36 @@
+"""
+TaxiFareModel network definition (same architecture as training)
+Kept in its own module so the API can run without importing torch
+when the NumPy inference backend is selected
+"""
+
+import torch.nn as nn
+
+# Model Architecture (same as training)
+class TaxiFareModel(nn.Module):
+    """
+    Deep Neural Network for taxi fare prediction
+    """
+    def __init__(self, input_size, hidden_sizes=[128, 64, 32], dropout_rate=0.2):
+        super(TaxiFareModel, self).__init__()
+        
+        layers = []
+        prev_size = input_size
+        
+        # Build hidden layers
+        for hidden_size in hidden_sizes:
+            layers.extend([
+                nn.Linear(prev_size, hidden_size),
+                nn.ReLU(),
+                nn.BatchNorm1d(hidden_size),
+                nn.Dropout(dropout_rate)
+            ])
+            prev_size = hidden_size
+        
+        # Output layer (single neuron for regression)
+        layers.append(nn.Linear(prev_size, 1))
+        
+        self.model = nn.Sequential(*layers)
+        
+    def forward(self, x):
+        return self.model(x).squeeze()
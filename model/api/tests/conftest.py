@@ -0,0 +1,37 @@
+"""
+Shared fixtures for the API unit tests
+Run from model/api:
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+# The API modules are imported the same way the server imports them
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+
+@pytest.fixture(scope='session')
+def api():
+    """predictionAPI with its default model loaded, skipped when the training outputs aren't present"""
+    import predictionAPI
+
+    if not all(os.path.exists(path) for path in (predictionAPI.MODEL_PATH, predictionAPI.SCALER_PATH,
+                                                 predictionAPI.DISTANCE_MATRIX_PATH)):
+        pytest.skip("Trained model artifacts not found in best_models/")
+    if predictionAPI.current_registry is None:
+        predictionAPI.activate_registry(predictionAPI.load_registry(source='files'))
+    return predictionAPI
+
+
+@pytest.fixture
+def serving_state(api):
+    """The state being served, restored after the test in case it swapped in another one"""
+    registry = api.current_registry
+    yield api.current_state
+    if api.current_registry is not registry:
+        api.activate_registry(registry)
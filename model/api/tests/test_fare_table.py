@@ -0,0 +1,72 @@
+"""Fare table: precomputed fares agree with what the model quotes for the same trip"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from fare_table import MAX_FARE, TABLE_DTYPES, FareTable, build_fare_table, compute_distance_version
+from quote_cache import QuoteCache
+
+# A few zones keep the table small; the lookup indexing is the same at any size
+MAX_LOCATION_ID = 6
+MONTHS = (1, 6)
+PASSENGER_COUNTS = (1, 3)
+DAYS = ('Monday', 'Wednesday', 'Saturday', 'Sunday')
+
+
+@pytest.fixture
+def build_table(api, serving_state, tmp_path):
+    def build(dtype):
+        path = str(tmp_path / f'fare_table_{dtype}.bin')
+        build_fare_table(
+            path, lambda *trips: api.predict_location_fares(*trips, state=serving_state),
+            serving_state.model_version, compute_distance_version(serving_state.distance_matrix.distances),
+            months=MONTHS, passenger_counts=PASSENGER_COUNTS, dtype=dtype, max_location_id=MAX_LOCATION_ID
+        )
+        return path
+    return build
+
+
+def model_quote(api, state, trip):
+    return api.quote_location_trip(*trip, state=state._replace(fare_table=None))[0]
+
+
+@pytest.mark.parametrize('dtype', sorted(TABLE_DTYPES))
+def test_table_matches_model_quotes(api, serving_state, build_table, monkeypatch, dtype):
+    monkeypatch.setattr(api, 'quote_cache', QuoteCache(max_size=0))
+    table = FareTable(build_table(dtype))
+    state = serving_state._replace(fare_table=table)
+
+    # uint16 quantizes to half a step; float16 keeps ~3 significant digits
+    tolerance = {'float32': 1e-3, 'float16': 0.5, 'uint16': TABLE_DTYPES['uint16'][1] / 2 + 1e-3}[dtype]
+    zones = range(1, MAX_LOCATION_ID + 1)
+    trips = itertools.product(zones, zones, PASSENGER_COUNTS, (0, 8, 17, 23), DAYS, MONTHS)
+    for trip in trips:
+        expected = model_quote(api, serving_state, trip)
+        assert 0 <= expected <= MAX_FARE
+        assert api.quote_location_trip(*trip, state=state)[0] == pytest.approx(expected, abs=tolerance), trip
+
+
+def test_trips_outside_the_table_fall_back_to_the_model(api, serving_state, build_table, monkeypatch):
+    monkeypatch.setattr(api, 'quote_cache', QuoteCache(max_size=0))
+    table = FareTable(build_table('float32'))
+    state = serving_state._replace(fare_table=table)
+
+    for trip in [(1, 2, 1, 12, 'Monday', 3),            # month not in the table
+                 (1, 2, 2, 12, 'Monday', 1),            # passenger count not in the table
+                 (1, MAX_LOCATION_ID + 1, 1, 12, 'Monday', 1)]:  # zone past the table
+        assert table.lookup(trip[0], trip[1], trip[2], trip[3], 0, trip[5]) is None
+        assert api.quote_location_trip(*trip, state=state)[0] == pytest.approx(model_quote(api, serving_state, trip))
+
+
+def test_table_for_another_model_is_refused(api, serving_state, build_table, monkeypatch):
+    path = build_table('float32')
+    monkeypatch.setattr(api, 'LOCATION_QUOTE_MODE', 'table')
+    monkeypatch.setattr(api, 'FARE_TABLE_PATH', path)
+
+    assert api.load_fare_table(serving_state.model_version, serving_state.distance_matrix) is not None
+    assert api.load_fare_table('0' * 16, serving_state.distance_matrix) is None
+
+    other_distances = type(serving_state.distance_matrix)(np.asarray(serving_state.distance_matrix.distances) + 1)
+    assert api.load_fare_table(serving_state.model_version, other_distances) is None
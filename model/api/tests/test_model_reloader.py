@@ -0,0 +1,122 @@
+"""Model reloading: a new state is only swapped in whole, and only after it validates"""
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from model_reloader import ModelReloader
+
+State = namedtuple('State', ['model_version', 'source', 'valid'])
+
+
+def make_reloader(states, served):
+    """Reloader over fake states: load pops the next one, activate records it as served"""
+    def validate(state):
+        if not state.valid:
+            raise ValueError("bad model")
+        return {'samples': 1}
+
+    return ModelReloader(lambda **options: states.pop(0), validate, served.append)
+
+
+def test_valid_state_is_activated():
+    served = []
+    reloader = make_reloader([State('v2', 'files', True)], served)
+
+    assert reloader.reload(wait=True, source='files')
+    assert served == [State('v2', 'files', True)]
+    assert reloader.last_result['status'] == 'success'
+    assert reloader.last_result['model_version'] == 'v2'
+    assert reloader.last_result['options'] == {'source': 'files'}
+    assert (reloader.reloads, reloader.failures) == (1, 0)
+
+
+def test_rejected_state_is_never_activated():
+    served = []
+    reloader = make_reloader([State('v2', 'files', False), State('v3', 'files', True)], served)
+
+    assert reloader.reload(wait=True)
+    assert served == []
+    assert reloader.last_result['status'] == 'error'
+    assert 'bad model' in reloader.last_result['message']
+    assert not reloader.in_progress
+
+    # A failure doesn't block the next reload
+    assert reloader.reload(wait=True)
+    assert [state.model_version for state in served] == ['v3']
+    assert (reloader.reloads, reloader.failures) == (1, 1)
+
+
+def test_only_one_reload_runs_at_a_time():
+    release = threading.Event()
+    served = []
+
+    def load(**options):
+        release.wait(10)
+        return State('v2', 'files', True)
+
+    reloader = ModelReloader(load, lambda state: {}, served.append)
+    assert reloader.reload()
+    assert reloader.in_progress
+    assert not reloader.reload()
+
+    release.set()
+    reloader.join()
+    assert not reloader.in_progress
+    assert len(served) == 1
+
+
+def nan_state(api, state):
+    """A copy of state whose weights are all NaN, under a different model version"""
+    weights = {name: np.full_like(value, np.nan) if np.issubdtype(value.dtype, np.floating) else value
+               for name, value in state.model_weights.items()}
+    hidden_sizes, feature_order = api.load_model_config()
+    model, model_weights = api.build_model(weights, state.scaler, hidden_sizes, len(feature_order))
+    return api.build_serving_state(model, model_weights, state.scaler, state.distance_matrix, 'f' * 16,
+                                   'nan-weights', feature_order, with_fare_table=False)
+
+
+def test_failed_reload_keeps_serving_the_old_model(api, serving_state):
+    registry = api.current_registry
+    bad = api.ModelRegistry({'default': nan_state(api, serving_state)}, 'default', source='nan-weights')
+    reloader = ModelReloader(lambda **options: bad, api.validate_registry, api.activate_registry)
+
+    assert reloader.reload(wait=True)
+    assert reloader.last_result['status'] == 'error'
+    assert 'non-finite' in reloader.last_result['message']
+    assert api.current_registry is registry
+    assert api.current_state is serving_state
+    assert api.model_version == serving_state.model_version
+    assert api.model is serving_state.model
+
+
+def test_successful_reload_swaps_the_whole_state(api, serving_state):
+    new = api.load_registry(source='files')
+    reloader = ModelReloader(lambda **options: new, api.validate_registry, api.activate_registry)
+
+    # Readers running through the swap see either the old state or the new one, never a mix
+    seen = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            registry = api.current_registry
+            seen.append((registry.default_state.model, registry.default_state.scaler))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        assert reloader.reload(wait=True)
+    finally:
+        stop.set()
+        reader.join()
+
+    assert reloader.last_result['status'] == 'success'
+    state = new.default_state
+    assert api.current_registry is new
+    assert api.current_state is state
+    assert (api.model, api.scaler, api.feature_engine, api.model_version) == (
+        state.model, state.scaler, state.feature_engine, state.model_version)
+    assert set(seen) <= {(serving_state.model, serving_state.scaler), (state.model, state.scaler)}
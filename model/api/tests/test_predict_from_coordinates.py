@@ -0,0 +1,41 @@
+"""Coordinate-based predictions: malformed input is a 400 or a per-trip error, never a 500"""
+
+import pytest
+
+TIMES_SQUARE_TO_JFK = {'pickup_latitude': 40.7580, 'pickup_longitude': -73.9855,
+                       'dropoff_latitude': 40.6413, 'dropoff_longitude': -73.7781}
+
+
+@pytest.fixture
+def client(api, serving_state):
+    if api.zone_index is None and api.load_zone_index() is None:
+        pytest.skip("Zone centroids not found")
+    return api.app.test_client()
+
+
+def test_parse_coordinates_returns_errors_instead_of_raising(api):
+    assert api.parse_coordinates(TIMES_SQUARE_TO_JFK) == ((40.7580, -73.9855, 40.6413, -73.7781), None)
+    for trip in (7, [1, 2], None, {'pickup_latitude': 40.7}, dict(TIMES_SQUARE_TO_JFK, pickup_latitude='north')):
+        values, error = api.parse_coordinates(trip)
+        assert values is None and error
+
+
+@pytest.mark.parametrize('trips', [5, 'trips', {}, []])
+def test_trips_must_be_a_non_empty_list(client, trips):
+    response = client.post('/predict_from_coordinates', json={'trips': trips})
+    assert response.status_code == 400
+    assert 'non-empty list' in response.get_json()['message']
+
+
+def test_bad_trips_fail_alone(client):
+    response = client.post('/predict_from_coordinates',
+                           json={'trips': [TIMES_SQUARE_TO_JFK, 7, {'pickup_latitude': 40.7}]})
+    assert response.status_code == 200
+    predictions = response.get_json()['predictions']
+    assert predictions[0]['predicted_fare'] > 0
+    assert 'JSON object' in predictions[1]['error']
+    assert 'Missing required fields' in predictions[2]['error']
+
+
+def test_single_non_object_trip_is_a_400(client):
+    assert client.post('/predict_from_coordinates', json=[1, 2]).status_code == 400
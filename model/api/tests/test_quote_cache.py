@@ -0,0 +1,100 @@
+"""Quote cache: TTL expiry, LRU eviction and invalidation when the model changes"""
+
+import pytest
+
+import quote_cache
+from quote_cache import QuoteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(quote_cache, 'time', clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QuoteCache(max_size=10, ttl_seconds=60)
+    cache.put(('a',), 1.0)
+
+    clock.now += 59
+    assert cache.get(('a',)) == 1.0
+    clock.now += 1
+    assert cache.get(('a',)) is None
+    # The expired entry is dropped, not just skipped
+    assert cache.stats()['size'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = QuoteCache(max_size=10, ttl_seconds=0)
+    cache.put(('a',), 1.0)
+    clock.now += 10 ** 9
+    assert cache.get(('a',)) == 1.0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = QuoteCache(max_size=2, ttl_seconds=60)
+    cache.put(('a',), 1.0)
+    cache.put(('b',), 2.0)
+    assert cache.get(('a',)) == 1.0  # 'b' is now the least recently used
+
+    cache.put(('c',), 3.0)
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 1.0
+    assert cache.get(('c',)) == 3.0
+    assert cache.evictions == 1
+
+
+def test_put_refreshes_ttl_and_recency(clock):
+    cache = QuoteCache(max_size=2, ttl_seconds=60)
+    cache.put(('a',), 1.0)
+    cache.put(('b',), 2.0)
+    clock.now += 50
+    cache.put(('a',), 1.5)
+
+    cache.put(('c',), 3.0)
+    assert cache.get(('b',)) is None
+    clock.now += 50
+    assert cache.get(('a',)) == 1.5
+
+
+def test_make_key_normalizes_numbers_and_rejects_unhashable_values():
+    assert QuoteCache.make_key('v1', 1, 2.0, 'Monday') == QuoteCache.make_key('v1', 1.0, 2, 'Monday')
+    assert QuoteCache.make_key('v1', 1, 'monday') != QuoteCache.make_key('v1', 1, 'Monday')
+    assert QuoteCache.make_key('v1', True) is None
+    assert QuoteCache.make_key('v1', None) is None
+    assert QuoteCache.make_key('v1', [1]) is None
+
+
+def test_quotes_are_keyed_by_model_version(api, serving_state, monkeypatch):
+    monkeypatch.setattr(api, 'quote_cache', QuoteCache(max_size=100, ttl_seconds=0))
+    state = serving_state._replace(fare_table=None)
+    trip = (132, 230, 1, 14, 'Monday', 6)
+
+    fare, _ = api.quote_location_trip(*trip, state=state)
+    key = QuoteCache.make_key(state.model_version, *trip)
+    assert api.quote_cache.get(key)[0] == fare
+
+    # A cached quote is only served to the model version that computed it
+    api.quote_cache.put(key, (-1.0, {}))
+    assert api.quote_location_trip(*trip, state=state)[0] == -1.0
+    other = state._replace(model_version='0' * 16)
+    assert api.quote_location_trip(*trip, state=other)[0] == pytest.approx(fare)
+
+
+def test_activating_a_model_clears_the_cache(api, serving_state, monkeypatch):
+    monkeypatch.setattr(api, 'quote_cache', QuoteCache(max_size=100, ttl_seconds=0))
+    api.quote_cache.put(('anything',), (1.0, {}))
+
+    api.activate_registry(api.current_registry)
+    assert api.quote_cache.stats()['size'] == 0
+    assert api.quote_cache.invalidations == 1
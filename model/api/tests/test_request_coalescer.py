@@ -0,0 +1,114 @@
+"""Request coalescer: every caller gets the prediction for its own row"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from request_coalescer import RequestCoalescer
+
+
+def row_sums(matrix, context):
+    scale = 1.0 if context is None else context['scale']
+    return matrix.sum(axis=1) * scale
+
+
+def submit_concurrently(coalescer, rows, contexts):
+    """Submit each row from its own thread, all released at once; returns results by row index"""
+    results = [None] * len(rows)
+    errors = [None] * len(rows)
+    barrier = threading.Barrier(len(rows))
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = coalescer.submit(rows[i], context=contexts[i], timeout=10)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_results_map_back_to_their_requests():
+    coalescer = RequestCoalescer(row_sums, max_batch_size=16, max_wait_ms=20)
+    rows = [np.arange(4, dtype=np.float32) + 10 * i for i in range(40)]
+    try:
+        results, errors = submit_concurrently(coalescer, rows, [None] * len(rows))
+    finally:
+        coalescer.stop()
+
+    assert errors == [None] * len(rows)
+    assert results == pytest.approx([float(row.sum()) for row in rows])
+
+    stats = coalescer.stats()
+    assert stats['requests_total'] == len(rows)
+    # The burst was scored in batches, never more than max_batch_size rows each
+    assert stats['batches_total'] < len(rows)
+    assert stats['batches_total'] >= len(rows) / 16
+
+
+def test_rows_are_only_batched_with_their_own_context():
+    batch_contexts = []
+
+    def predict(matrix, context):
+        batch_contexts.append(context['scale'])
+        return row_sums(matrix, context)
+
+    coalescer = RequestCoalescer(predict, max_batch_size=64, max_wait_ms=20)
+    old, new = {'scale': 1.0}, {'scale': 100.0}
+    rows = [np.full(3, i, dtype=np.float32) for i in range(20)]
+    contexts = [old if i % 2 else new for i in range(len(rows))]
+    try:
+        results, errors = submit_concurrently(coalescer, rows, contexts)
+    finally:
+        coalescer.stop()
+
+    assert errors == [None] * len(rows)
+    assert results == pytest.approx([3.0 * i * context['scale'] for i, context in enumerate(contexts)])
+    # Each group went through predict_batch on its own
+    assert set(batch_contexts) == {1.0, 100.0}
+
+
+def test_failed_batch_raises_in_every_caller():
+    def predict(matrix, context):
+        raise RuntimeError("model exploded")
+
+    coalescer = RequestCoalescer(predict, max_wait_ms=20)
+    rows = [np.ones(2, dtype=np.float32)] * 5
+    try:
+        results, errors = submit_concurrently(coalescer, rows, [None] * len(rows))
+    finally:
+        coalescer.stop()
+
+    assert results == [None] * len(rows)
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_single_request_is_scored_after_the_wait_window():
+    coalescer = RequestCoalescer(row_sums, max_wait_ms=1)
+    try:
+        assert coalescer.submit([1.0, 2.0, 3.5], timeout=10) == pytest.approx(6.5)
+    finally:
+        coalescer.stop()
+    assert coalescer.stats()['batch_size_buckets']['1'] == 1
+
+
+def test_callbacks_see_every_batch_and_request_wait():
+    waits, batch_sizes = [], []
+    coalescer = RequestCoalescer(row_sums, max_batch_size=8, max_wait_ms=20,
+                                 on_wait=waits.append, on_batch=batch_sizes.append)
+    rows = [np.ones(2, dtype=np.float32)] * 20
+    try:
+        submit_concurrently(coalescer, rows, [None] * len(rows))
+    finally:
+        coalescer.stop()
+
+    assert sum(batch_sizes) == len(rows)
+    assert max(batch_sizes) <= 8
+    assert len(waits) == len(rows)
+    assert all(wait >= 0 for wait in waits)
@@ -0,0 +1,24 @@
+"""Shadow scoring: the shadow model never competes with live requests for the inference pool"""
+
+import pytest
+
+TRIP = {'passenger_count': 1, 'trip_distance': 3.2, 'trip_duration_minutes': 15,
+        'pickup_hour': 14, 'pickup_day': 'Friday', 'pickup_month': 7}
+
+
+def test_shadow_scoring_bypasses_the_inference_pool(api, serving_state, monkeypatch):
+    def no_pool():
+        raise AssertionError("shadow scoring used the inference pool")
+
+    monkeypatch.setattr(api, 'INFERENCE_EXECUTION', 'pool')
+    monkeypatch.setattr(api, 'get_inference_pool', no_pool)
+    served = float(api.forward_raw_features(api.build_feature_matrix([TRIP], state=serving_state)[0],
+                                            None, serving_state)[0])
+
+    scored = api.SHADOW_TOTAL.value('test-shadow', 'scored')
+    api.score_shadow('test-shadow', serving_state, [TRIP], [served])
+
+    assert api.SHADOW_TOTAL.value('test-shadow', 'scored') == scored + 1
+    _, total, count = api.SHADOW_ABS_DELTA.snapshot('test-shadow')
+    assert count == 1
+    assert total == pytest.approx(0.0, abs=1e-3)
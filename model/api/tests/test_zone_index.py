@@ -0,0 +1,87 @@
+"""Zone index: grid lookups resolve to the same zone as comparing every centroid"""
+
+import math
+import os
+
+import numpy as np
+import pytest
+
+from zone_index import DEFAULT_BOUNDS, ZoneIndex
+
+ZONES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'distances',
+                          'complete_geocoded_taxi_zones.csv')
+
+
+def brute_force_nearest(index, latitudes, longitudes):
+    """(location_ids, distances_km, runner-up distances_km) comparing every point with every centroid"""
+    points = index.project(latitudes, longitudes)
+    distances = np.linalg.norm(points[:, None, :] - index.centroids[None, :, :], axis=-1)
+    order = np.argsort(distances, axis=1)
+    nearest = distances[np.arange(len(points)), order[:, 0]]
+    runner_up = distances[np.arange(len(points)), order[:, 1]]
+    return index.location_ids[order[:, 0]], nearest, runner_up
+
+
+def random_points(count, seed, margin=0.1):
+    """Points over the service area and a margin past it, so some land off the grid"""
+    rng = np.random.default_rng(seed)
+    south, west, north, east = DEFAULT_BOUNDS
+    return (rng.uniform(south - margin, north + margin, count),
+            rng.uniform(west - margin, east + margin, count))
+
+
+@pytest.fixture(scope='module')
+def synthetic_index():
+    latitudes, longitudes = random_points(250, seed=1, margin=0)
+    return ZoneIndex(np.arange(1, 251), latitudes, longitudes, cell_km=0.5, max_distance_km=math.inf)
+
+
+@pytest.fixture(scope='module')
+def taxi_zone_index():
+    if not os.path.exists(ZONES_PATH):
+        pytest.skip(f"Zone centroids {ZONES_PATH} not found")
+    return ZoneIndex.from_csv(ZONES_PATH, max_distance_km=math.inf)
+
+
+@pytest.mark.parametrize('index_fixture', ['synthetic_index', 'taxi_zone_index'])
+def test_nearest_matches_brute_force(request, index_fixture):
+    index = request.getfixturevalue(index_fixture)
+    latitudes, longitudes = random_points(20000, seed=2)
+
+    location_ids, distances = index.nearest(latitudes, longitudes)
+    expected_ids, expected_distances, runner_up = brute_force_nearest(index, latitudes, longitudes)
+
+    np.testing.assert_allclose(distances, expected_distances, rtol=0, atol=1e-9)
+    # Points equidistant from two centroids may resolve to either
+    unique = runner_up - expected_distances > 1e-9
+    np.testing.assert_array_equal(location_ids[unique], expected_ids[unique])
+
+
+@pytest.mark.parametrize('index_fixture', ['synthetic_index', 'taxi_zone_index'])
+def test_scalar_lookup_matches_batch(request, index_fixture):
+    index = request.getfixturevalue(index_fixture)
+    latitudes, longitudes = random_points(2000, seed=3)
+
+    location_ids, distances = index.nearest(latitudes, longitudes)
+    for latitude, longitude, location_id, distance in zip(latitudes, longitudes, location_ids, distances):
+        found_id, found_distance = index.lookup(latitude, longitude)
+        assert found_id == location_id
+        assert found_distance == pytest.approx(distance, abs=1e-9)
+
+
+def test_points_beyond_max_distance_are_unresolved():
+    index = ZoneIndex([7, 8], [40.70, 40.80], [-74.00, -73.90], max_distance_km=2.0)
+
+    location_ids, distances = index.nearest([40.70, 40.70, 40.60, np.nan], [-74.00, -73.99, -74.00, -74.00])
+    assert location_ids.tolist() == [7, 7, 0, 0]
+    assert distances[0] == pytest.approx(0.0)
+    assert np.isnan(distances[2:]).all()
+
+    assert index.lookup(40.60, -74.00) == (None, None)
+    assert index.lookup(float('nan'), -74.00) == (None, None)
+    assert index.lookup(40.70, -74.00)[0] == 7
+
+
+def test_index_needs_a_centroid():
+    with pytest.raises(ValueError):
+        ZoneIndex([], [], [])
@@ -0,0 +1,172 @@
+"""
+Nearest taxi zone lookup for GPS coordinates
+Points are resolved to the zone with the nearest centroid (from the geocoded
+zones CSV). At load time the service area is covered by a grid and each cell
+keeps the few centroids that can be nearest to any point inside it, so a
+lookup is a cell index plus a handful of distance computations, vectorized
+over a whole batch. Points off the grid fall back to comparing every centroid.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# TLC placeholder zones ("Unknown", "Outside of NYC") have no real location
+PLACEHOLDER_ZONES = (264, 265)
+
+# Approximate NYC service area (south, west, north, east) covered by the grid
+DEFAULT_BOUNDS = (40.45, -74.30, 40.95, -73.65)
+
+# Candidate count covering nearly every cell near a zone centroid
+COMMON_CANDIDATES = 8
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON_AT_EQUATOR = 111.320
+
+
+class ZoneIndex:
+    """
+    Grid index over zone centroids
+
+    Args:
+        location_ids: Zone LocationIDs
+        latitudes: Centroid latitudes (degrees)
+        longitudes: Centroid longitudes (degrees)
+        bounds: (south, west, north, east) area covered by the grid
+        cell_km: Grid cell size in km
+        max_distance_km: Points farther than this from every centroid resolve to no zone
+    """
+    def __init__(self, location_ids, latitudes, longitudes, bounds=DEFAULT_BOUNDS, cell_km=0.5,
+                 max_distance_km=10.0):
+        self.location_ids = np.asarray(location_ids, dtype=np.int64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if len(self.location_ids) == 0:
+            raise ValueError("Zone index needs at least one zone centroid")
+        self.max_distance_km = max_distance_km
+
+        # Equirectangular projection to km around the middle of the grid; the
+        # error over a city-sized area is far below the spacing between zones
+        south, west, north, east = bounds
+        self.origin = (south, west)
+        self.km_per_degree_lon = KM_PER_DEGREE_LON_AT_EQUATOR * math.cos(math.radians((south + north) / 2))
+        self.centroids = self.project(latitudes, longitudes)
+
+        self.cell_km = cell_km
+        width_km, height_km = self.project(north, east)
+        self.shape = (int(np.ceil(height_km / cell_km)), int(np.ceil(width_km / cell_km)))
+        self.candidates, self.candidate_counts = self._build_candidates()
+
+        # Candidate coordinates laid out like the candidates, so a batch
+        # gathers everything it needs by cell with no second indirection
+        self._candidate_y = self.centroids[self.candidates, 0]
+        self._candidate_x = self.centroids[self.candidates, 1]
+
+        # Per-cell candidate tuples for scalar lookups, which would otherwise
+        # spend most of their time in numpy call overhead
+        self._cell_candidates = [tuple((i, *self.centroids[i].tolist()) for i in dict.fromkeys(cell))
+                                 for cell in self.candidates.tolist()]
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        """Build the index from a geocoded zones CSV (Location ID, Latitude, Longitude)"""
+        zones = pd.read_csv(path).dropna(subset=['Latitude', 'Longitude'])
+        zones = zones[~zones['Location ID'].isin(PLACEHOLDER_ZONES)]
+        return cls(zones['Location ID'], zones['Latitude'], zones['Longitude'], **kwargs)
+
+    def project(self, latitudes, longitudes):
+        """(..., 2) planar km coordinates (y, x) of points relative to the grid origin"""
+        y = (np.asarray(latitudes, dtype=np.float64) - self.origin[0]) * KM_PER_DEGREE_LAT
+        x = (np.asarray(longitudes, dtype=np.float64) - self.origin[1]) * self.km_per_degree_lon
+        return np.stack([y, x], axis=-1)
+
+    def _build_candidates(self):
+        """
+        (cells, k) centroid indices per cell (row-major), nearest to the cell
+        centre first and padded by repeating it, plus each cell's candidate count
+        A centroid can only be nearest to some point in a cell if it is within
+        the nearest distance to the cell centre plus the cell diagonal
+        """
+        rows, cols = self.shape
+        centres = (np.stack(np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij'), axis=-1)
+                   .reshape(-1, 2) + 0.5) * self.cell_km
+        distances = np.linalg.norm(centres[:, None, :] - self.centroids[None, :, :], axis=-1)
+        reach = distances.min(axis=1, keepdims=True) + self.cell_km * np.sqrt(2)
+        within = distances <= reach
+
+        k = int(within.sum(axis=1).max())
+        order = np.argsort(np.where(within, distances, np.inf), axis=1, kind='stable')[:, :k]
+        counts = within.sum(axis=1)
+        padded = np.where(np.arange(k)[None, :] < counts[:, None], order, order[:, :1])
+        return padded.astype(np.intp), counts
+
+    @property
+    def nbytes(self):
+        return self.candidates.nbytes + self._candidate_y.nbytes + self._candidate_x.nbytes
+
+    def nearest(self, latitudes, longitudes):
+        """
+        Nearest zones for arrays of points
+        Returns (location_ids, distances_km); location_id is 0 for points with
+        no centroid within max_distance_km (or without valid coordinates)
+        """
+        y = (np.asarray(latitudes, dtype=np.float64).reshape(-1) - self.origin[0]) * KM_PER_DEGREE_LAT
+        x = (np.asarray(longitudes, dtype=np.float64).reshape(-1) - self.origin[1]) * self.km_per_degree_lon
+        rows, cols = np.floor(y / self.cell_km), np.floor(x / self.cell_km)
+        on_grid = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        cell_ids = np.where(on_grid, rows * self.shape[1] + cols, 0).astype(np.intp)
+
+        # Most cells hold a few candidates; the long tail (open water far from
+        # any centroid) is redone at full width so it doesn't widen the batch
+        nearest, squared = self._closest(cell_ids, COMMON_CANDIDATES, y, x)
+        counts = self.candidate_counts[cell_ids]
+        wide = on_grid & (counts > COMMON_CANDIDATES)
+        if wide.any():
+            nearest[wide], squared[wide] = self._closest(cell_ids[wide], counts[wide].max(), y[wide], x[wide])
+
+        # Off the grid, compare against every centroid (NaN coordinates stay unresolved)
+        off_grid = ~on_grid
+        if off_grid.any():
+            dy = self.centroids[None, :, 0] - y[off_grid, None]
+            dx = self.centroids[None, :, 1] - x[off_grid, None]
+            all_squared = dy * dy + dx * dx
+            nearest[off_grid] = all_squared.argmin(axis=1)
+            squared[off_grid] = all_squared.min(axis=1)
+
+        distances = np.sqrt(squared)
+        found = distances <= self.max_distance_km
+        location_ids = np.where(found, self.location_ids[nearest], 0)
+        return location_ids, np.where(found, distances, np.nan)
+
+    def _closest(self, cell_ids, k, y, x):
+        """(centroid index, squared distance) of the closest of the first k candidates of each point's cell"""
+        candidates = self.candidates[cell_ids, :k]
+        dy = self._candidate_y[cell_ids, :k] - y[:, None]
+        dx = self._candidate_x[cell_ids, :k] - x[:, None]
+        squared = dy * dy + dx * dx
+        best = squared.argmin(axis=1)[:, None]
+        return np.take_along_axis(candidates, best, axis=1)[:, 0], np.take_along_axis(squared, best, axis=1)[:, 0]
+
+    def lookup(self, latitude, longitude):
+        """(location_id, distance_km) of the nearest zone to one point, or (None, None)"""
+        y = (latitude - self.origin[0]) * KM_PER_DEGREE_LAT
+        x = (longitude - self.origin[1]) * self.km_per_degree_lon
+        if not math.isfinite(x + y):
+            return None, None
+        row, col = math.floor(y / self.cell_km), math.floor(x / self.cell_km)
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            location_ids, distances = self.nearest([latitude], [longitude])
+            if location_ids[0] == 0:
+                return None, None
+            return int(location_ids[0]), float(distances[0])
+
+        best, best_squared = None, math.inf
+        for index, centroid_y, centroid_x in self._cell_candidates[row * self.shape[1] + col]:
+            squared = (centroid_y - y) ** 2 + (centroid_x - x) ** 2
+            if squared < best_squared:
+                best, best_squared = index, squared
+        distance = math.sqrt(best_squared)
+        if distance > self.max_distance_km:
+            return None, None
+        return int(self.location_ids[best]), distance
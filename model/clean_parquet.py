@@ -0,0 +1,279 @@
+"""
+Out-of-core cleaning pipeline for TLC trip parquet files
+Applies the cleaning steps of `data cleaning and exploration.ipynb` without
+ever holding the data in one DataFrame:
+1. Statistics pass: a sample of every row group (only the numeric columns)
+   gives the imputation medians and the IQR outlier bounds, computed one
+   column after another on the already-filtered sample like the notebook
+2. Cleaning pass: row groups are streamed through a process pool; each is
+   imputed, filtered, given trip_duration_minutes / pickup_hour / pickup_day /
+   pickup_month, stripped of the unused columns, cast to compact dtypes and
+   written as hive-partitioned parquet
+   (pickup_month=<m>/<file>-<row group>-<batch>.parquet). Row groups are read
+   --batch-rows at a time, so worker memory doesn't grow with file size
+
+The statistics are saved as _cleaning_stats.json in the output directory; pass
+them back with --stats to clean new months with the same medians and bounds.
+
+Usage (run from model):
+    python clean_parquet.py "../green taxi data/green_tripdata_2025-01.parquet" --output-dir cleaned_data/parquet
+    python clean_parquet.py ../yellow_taxi_data/*.parquet --workers 4 --stats-sample 2000000 --overwrite
+
+Read the result with pd.read_parquet(output_dir) or pyarrow.dataset.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Feature derivation, the model definition and the pool helpers are shared with the API
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from concurrency import peak_rss_mb
+from score_parquet import DATETIME_COLUMNS
+
+# Columns the notebook removes (ehail_fee is always empty; the rest aren't model inputs)
+DROP_COLUMNS = ['ehail_fee', 'VendorID', 'RatecodeID', 'improvement_surcharge', 'store_and_fwd_flag',
+                'source_file', 'taxi_type']
+
+# IQR (1.5x) outlier filters, applied in this order
+OUTLIER_COLUMNS = ['trip_distance', 'fare_amount', 'total_amount', 'passenger_count', 'tip_amount']
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Compact output dtypes; other numeric columns are stored as float32
+COMPACT_DTYPES = {
+    'PULocationID': np.int16,
+    'DOLocationID': np.int16,
+    'passenger_count': np.int8,
+    'payment_type': np.int8,
+    'trip_type': np.int8,
+    'pickup_hour': np.int8,
+    'pickup_month': np.int8
+}
+
+PARTITION_COLUMN = 'pickup_month'
+STATS_FILENAME = '_cleaning_stats.json'  # Leading underscore: skipped by parquet dataset readers
+
+
+def normalize_columns(names):
+    """Map a file's column names to the names used downstream (airport_fee is spelled both ways)"""
+    return {name: 'Airport_fee' for name in names if name.lower() == 'airport_fee' and name != 'Airport_fee'}
+
+
+def numeric_columns(schema):
+    """Names of the numeric columns of a parquet schema that survive cleaning"""
+    datetime_names = {name for pair in DATETIME_COLUMNS for name in pair}
+    return [field.name for field in schema
+            if (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+            and field.name not in DROP_COLUMNS and field.name not in datetime_names]
+
+
+def iter_row_group(path, row_group, batch_rows, columns=None):
+    """DataFrames of at most batch_rows rows from one row group"""
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, row_groups=[row_group], columns=columns):
+        yield pa.Table.from_batches([batch]).to_pandas()
+
+
+def _sample_row_group(task):
+    """Random sample (fraction of the rows) of one row group's numeric columns"""
+    path, row_group, fraction, seed, batch_rows = task
+    rng = np.random.default_rng([seed, row_group, len(path)])
+    columns = numeric_columns(pq.ParquetFile(path).schema_arrow)
+    samples = []
+    for df in iter_row_group(path, row_group, batch_rows, columns):
+        if fraction < 1:
+            df = df[rng.random(len(df)) < fraction]
+        samples.append(df.rename(columns=normalize_columns(df.columns)))
+    return pd.concat(samples, ignore_index=True)
+
+
+def compute_stats(sample, integer_columns):
+    """
+    Imputation medians and sequential outlier bounds from a sample
+    Integer columns get their median rounded so the imputed values stay whole
+    """
+    medians = {}
+    for column in sample.columns:
+        median = sample[column].median()
+        if pd.isna(median):
+            continue
+        medians[column] = float(round(median) if column in integer_columns else median)
+    sample = sample.fillna(medians)
+
+    bounds = {}
+    for column in OUTLIER_COLUMNS:
+        if column not in sample.columns:
+            continue
+        q1, q3 = sample[column].quantile([0.25, 0.75])
+        iqr = q3 - q1
+        bounds[column] = [float(q1 - 1.5 * iqr), float(q3 + 1.5 * iqr)]
+        sample = sample[sample[column].between(*bounds[column])]
+
+    return {'medians': medians, 'outlier_bounds': bounds}
+
+
+def clean_frame(df, stats):
+    """
+    Clean one chunk of raw trips
+    Returns the cleaned DataFrame and the rows removed by each outlier filter
+    """
+    df = df.rename(columns=normalize_columns(df.columns))
+
+    derived = {}
+    for pickup_column, dropoff_column in DATETIME_COLUMNS:
+        if pickup_column in df.columns and dropoff_column in df.columns:
+            pickup = pd.to_datetime(df[pickup_column])
+            dropoff = pd.to_datetime(df[dropoff_column])
+            derived = {
+                'trip_duration_minutes': ((dropoff - pickup).dt.total_seconds() / 60).astype(np.float32),
+                'pickup_hour': pickup.dt.hour.astype(np.int8),
+                'pickup_day': pd.Categorical.from_codes(pickup.dt.dayofweek, DAY_NAMES),
+                'pickup_month': pickup.dt.month.astype(np.int8)
+            }
+            break
+    if not derived:
+        raise ValueError("No pickup/dropoff datetime columns found")
+
+    datetime_names = {name for pair in DATETIME_COLUMNS for name in pair}
+    df = df.drop(columns=[column for column in df.columns if column in DROP_COLUMNS or column in datetime_names])
+    df = df.fillna({column: value for column, value in stats['medians'].items() if column in df.columns})
+
+    # Fixed bounds, so one combined mask keeps the same rows as filtering column by column
+    keep = np.ones(len(df), dtype=bool)
+    removed = {}
+    for column, (lower, upper) in stats['outlier_bounds'].items():
+        if column in df.columns:
+            within = df[column].between(lower, upper).to_numpy()
+            removed[column] = int(np.count_nonzero(keep & ~within))
+            keep &= within
+
+    df = df[keep].reset_index(drop=True)
+    for name, values in derived.items():
+        df[name] = values[keep] if isinstance(values, pd.Categorical) else values.to_numpy()[keep]
+
+    for column in df.columns:
+        if column in COMPACT_DTYPES:
+            df[column] = df[column].astype(COMPACT_DTYPES[column])
+        elif pd.api.types.is_float_dtype(df[column]) or pd.api.types.is_integer_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    return df, removed
+
+
+def _clean_row_group(task):
+    """
+    Clean one row group batch by batch and write the partition files
+    Returns the rows read, the rows kept and the rows removed by each outlier filter
+    """
+    path, row_group, stats, output_dir, batch_rows = task
+    stem = os.path.splitext(os.path.basename(path))[0]
+    rows_in = rows_out = 0
+    removed_total = {}
+
+    for batch_index, df in enumerate(iter_row_group(path, row_group, batch_rows)):
+        rows_in += len(df)
+        df, removed = clean_frame(df, stats)
+        rows_out += len(df)
+        for column, count in removed.items():
+            removed_total[column] = removed_total.get(column, 0) + count
+
+        for month, part in df.groupby(PARTITION_COLUMN, sort=True):
+            partition_dir = os.path.join(output_dir, f'{PARTITION_COLUMN}={month}')
+            os.makedirs(partition_dir, exist_ok=True)
+            table = pa.Table.from_pandas(part.drop(columns=[PARTITION_COLUMN]), preserve_index=False)
+            pq.write_table(table, os.path.join(partition_dir, f'{stem}-{row_group:04d}-{batch_index:04d}.parquet'),
+                           compression='zstd')
+    return rows_in, rows_out, removed_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean TLC trip parquet files into partitioned parquet')
+    parser.add_argument('inputs', nargs='+', help='Raw TLC parquet files')
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_data', 'parquet'),
+                        help='Directory for the partitioned output')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--batch-rows', type=int, default=500_000,
+                        help='Rows read at a time (bounds each worker\'s memory)')
+    parser.add_argument('--stats-sample', type=int, default=2_000_000,
+                        help='Rows sampled (across all files) for the medians and outlier bounds')
+    parser.add_argument('--stats', help='Reuse a saved _cleaning_stats.json instead of sampling')
+    parser.add_argument('--seed', type=int, default=42, help='Sampling seed')
+    parser.add_argument('--overwrite', action='store_true', help='Remove existing partitions in the output directory')
+    args = parser.parse_args()
+
+    existing = glob.glob(os.path.join(args.output_dir, f'{PARTITION_COLUMN}=*'))
+    if existing and not args.overwrite:
+        parser.error(f"{args.output_dir} already holds partitions (pass --overwrite to replace them)")
+    for partition_dir in existing:
+        shutil.rmtree(partition_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    row_groups = [(path, row_group) for path in args.inputs
+                  for row_group in range(pq.ParquetFile(path).num_row_groups)]
+    total_rows = sum(pq.ParquetFile(path).metadata.num_rows for path in args.inputs)
+    print(f"🚕 Cleaning {len(args.inputs)} file(s), {total_rows:,} rows in {len(row_groups)} row groups "
+          f"on {args.workers} workers")
+    start_time = time.perf_counter()
+
+    with Pool(args.workers) as pool:
+        if args.stats:
+            with open(args.stats) as f:
+                stats = json.load(f)
+            print(f"   Using statistics from {args.stats}")
+        else:
+            fraction = min(1.0, args.stats_sample / max(total_rows, 1))
+            samples = pool.map(_sample_row_group, [(path, row_group, fraction, args.seed, args.batch_rows)
+                                                   for path, row_group in row_groups])
+            sample = pd.concat(samples, ignore_index=True)
+            del samples
+
+            integer_columns = {
+                normalize_columns([field.name]).get(field.name, field.name)
+                for path in args.inputs for field in pq.ParquetFile(path).schema_arrow
+                if pa.types.is_integer(field.type)
+            }
+            stats = compute_stats(sample, integer_columns)
+            stats.update(sample_rows=len(sample), total_rows=total_rows, inputs=[os.path.basename(p) for p in args.inputs])
+            print(f"   Statistics from {len(sample):,} sampled rows ({time.perf_counter() - start_time:.1f}s)")
+            del sample
+
+        for column, (lower, upper) in stats['outlier_bounds'].items():
+            print(f"   {column:<16} keep [{lower:.2f}, {upper:.2f}]")
+
+        rows_in = rows_out = 0
+        removed_total = {}
+        tasks = [(path, row_group, stats, args.output_dir, args.batch_rows) for path, row_group in row_groups]
+        for group_in, group_out, removed in pool.imap_unordered(_clean_row_group, tasks):
+            rows_in += group_in
+            rows_out += group_out
+            for column, count in removed.items():
+                removed_total[column] = removed_total.get(column, 0) + count
+
+    with open(os.path.join(args.output_dir, STATS_FILENAME), 'w') as f:
+        json.dump(stats, f, indent=2)
+
+    elapsed = time.perf_counter() - start_time
+    own_mb, workers_mb = peak_rss_mb()
+    print(f"✅ {rows_out:,} of {rows_in:,} rows kept ({rows_out / max(rows_in, 1) * 100:.1f}%) "
+          f"in {elapsed:.1f}s ({rows_in / elapsed:,.0f} rows/s) -> {args.output_dir}")
+    for column, count in removed_total.items():
+        print(f"   {column:<16} removed {count:,}")
+    if own_mb is not None:
+        print(f"📊 Peak memory: {own_mb:.0f} MB main process, {workers_mb:.0f} MB largest worker")
+
+
+if __name__ == '__main__':
+    main()
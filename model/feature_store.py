@@ -0,0 +1,308 @@
+"""
+Memory-mapped training feature store
+The notebook's TaxiFareDataset copies the DataFrame, maps day names, casts to
+float32, fits a StandardScaler and keeps a tensor copy, so training needs
+several copies of the data in RAM and a per-item __getitem__ per row. The
+store is built once instead:
+1. Streaming pass: trips are read chunk by chunk (cleaned CSV, parquet files
+   or the partitioned clean_parquet.py output), turned into feature rows in
+   the API's feature_order with derive_features, and appended to a raw float32
+   file
+2. Statistics pass: the rows are assigned one random order, whose last
+   --val-fraction is the validation split. The scaler mean and variance are
+   merged chunk by chunk over the training rows only, like the notebook's
+   StandardScaler fit on its training split
+3. Shuffle pass: rows are gathered in the random order, standardized and
+   written to features.f32 / targets.f32
+
+Training then memory-maps both files and serves each batch as a contiguous
+slice (zero-copy; batch order is reshuffled every epoch), so memory stays at
+the pages being read and the data can be larger than RAM. The split is fixed
+when the store is built, so validation rows never shape the scaler.
+
+Usage (run from model):
+    python feature_store.py cleaned_data/cleaned_yellow_d1.csv --output-dir feature_store
+    python feature_store.py cleaned_data/parquet --output-dir feature_store --overwrite
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Feature derivation, the model definition and the pool helpers are shared with the API
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from concurrency import peak_rss_mb
+from score_parquet import derive_features
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store')
+
+HEADER_FILENAME = 'store.json'
+FEATURES_FILENAME = 'features.f32'
+TARGETS_FILENAME = 'targets.f32'
+STORE_FORMAT_VERSION = 2
+
+TARGET_COLUMN = 'fare_amount'
+
+# Batches are handed to torch straight from the read-only mapping and never written to
+warnings.filterwarnings('ignore', message='The given NumPy array is not writable')
+
+
+def iter_trip_chunks(path, chunk_rows):
+    """DataFrames of at most chunk_rows trips from a CSV, a parquet file or a parquet directory"""
+    if os.path.isdir(path):
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        for batch in dataset.to_batches(batch_size=chunk_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+    elif path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Cleaned CSVs carry the notebook's DataFrame index as their first column
+        yield from pd.read_csv(path, index_col=0, chunksize=chunk_rows)
+
+
+def merge_moments(count, mean, m2, chunk):
+    """Merge a chunk's rows into running (count, mean, sum of squared deviations) per column"""
+    chunk = chunk.astype(np.float64)
+    chunk_count = len(chunk)
+    chunk_mean = chunk.mean(axis=0)
+    chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+
+    total = count + chunk_count
+    delta = chunk_mean - mean
+    mean = mean + delta * (chunk_count / total)
+    m2 = m2 + chunk_m2 + delta ** 2 * (count * chunk_count / total)
+    return total, mean, m2
+
+
+def build_store(inputs, output_dir, feature_order, defaults, day_mapping, chunk_rows=500_000, seed=42,
+                val_fraction=0.2):
+    """
+    Build a feature store from trip files
+    The last val_fraction of the shuffled rows is the validation split; the
+    scaler statistics are computed over the other rows only
+    Returns the store header (also written to store.json)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n_features = len(feature_order)
+    raw_features_path = os.path.join(output_dir, FEATURES_FILENAME + '.raw')
+    raw_targets_path = os.path.join(output_dir, TARGETS_FILENAME + '.raw')
+
+    # Streaming pass: append raw rows
+    count = 0
+    dropped = 0
+    with open(raw_features_path, 'wb') as features_file, open(raw_targets_path, 'wb') as targets_file:
+        for path in inputs:
+            for df in iter_trip_chunks(path, chunk_rows):
+                targets = pd.to_numeric(df[TARGET_COLUMN], errors='coerce').to_numpy(dtype=np.float32)
+                features = derive_features(df, feature_order, defaults, day_mapping)
+                valid = np.isfinite(targets) & np.isfinite(features).all(axis=1)
+                if not valid.all():
+                    dropped += int(np.count_nonzero(~valid))
+                    features, targets = features[valid], targets[valid]
+                if len(features) == 0:
+                    continue
+                features_file.write(features.tobytes())
+                targets_file.write(targets.tobytes())
+                count += len(features)
+
+    if count == 0:
+        raise ValueError("No trips with a fare found in the inputs")
+    train_rows = count - int(round(count * val_fraction))
+    if train_rows == 0:
+        raise ValueError(f"val_fraction {val_fraction} leaves no training rows out of {count}")
+
+    raw_features = np.memmap(raw_features_path, dtype=np.float32, mode='r', shape=(count, n_features))
+    raw_targets = np.memmap(raw_targets_path, dtype=np.float32, mode='r', shape=(count,))
+
+    # Statistics pass over the rows the permutation puts in the training split
+    permutation = np.random.default_rng(seed).permutation(count)
+    in_train = np.zeros(count, dtype=bool)
+    in_train[permutation[:train_rows]] = True
+    moments_count, mean, m2 = 0, np.zeros(n_features), np.zeros(n_features)
+    for start in range(0, count, chunk_rows):
+        block = raw_features[start:start + chunk_rows][in_train[start:start + chunk_rows]]
+        if len(block):
+            moments_count, mean, m2 = merge_moments(moments_count, mean, m2, block)
+
+    # Same statistics as StandardScaler (population variance; constant columns keep scale 1)
+    scale = np.sqrt(m2 / moments_count)
+    scale[scale == 0] = 1.0
+
+    # Shuffle pass: each output chunk gathers its rows in sorted order (mostly
+    # sequential reads), then puts them back in permutation order
+    features = np.memmap(os.path.join(output_dir, FEATURES_FILENAME), dtype=np.float32, mode='w+',
+                         shape=(count, n_features))
+    targets = np.memmap(os.path.join(output_dir, TARGETS_FILENAME), dtype=np.float32, mode='w+', shape=(count,))
+
+    mean32, scale32 = mean.astype(np.float32), scale.astype(np.float32)
+    for start in range(0, count, chunk_rows):
+        rows = permutation[start:start + chunk_rows]
+        order = np.argsort(rows)
+        block = np.empty((len(rows), n_features), dtype=np.float32)
+        block[order] = raw_features[rows[order]]
+        block -= mean32
+        block /= scale32
+        features[start:start + len(rows)] = block
+        targets[start:start + len(rows)][order] = raw_targets[rows[order]]
+
+    features.flush()
+    targets.flush()
+    del raw_features, raw_targets, features, targets
+    os.remove(raw_features_path)
+    os.remove(raw_targets_path)
+
+    header = {
+        'format_version': STORE_FORMAT_VERSION,
+        'rows': int(count),
+        'train_rows': int(train_rows),
+        'val_fraction': val_fraction,
+        'feature_order': list(feature_order),
+        'target': TARGET_COLUMN,
+        'scaler_mean': mean.tolist(),
+        'scaler_scale': scale.tolist(),
+        'dropped_rows': dropped,
+        'seed': seed,
+        'sources': [os.path.basename(os.path.normpath(path)) for path in inputs],
+        'created': datetime.now().isoformat()
+    }
+    with open(os.path.join(output_dir, HEADER_FILENAME), 'w') as f:
+        json.dump(header, f, indent=2)
+    return header
+
+
+class FeatureStore:
+    """
+    Read-only view of a built feature store
+    The training/validation split is the one the store was built with (the
+    scaler statistics cover the training rows only)
+
+    Args:
+        path: Store directory
+    """
+    def __init__(self, path=DEFAULT_STORE_DIR):
+        with open(os.path.join(path, HEADER_FILENAME)) as f:
+            self.header = json.load(f)
+        if self.header.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store version {self.header.get('format_version')}")
+
+        self.path = path
+        self.rows = self.header['rows']
+        self.feature_order = self.header['feature_order']
+        self.scaler_mean = np.array(self.header['scaler_mean'], dtype=np.float32)
+        self.scaler_scale = np.array(self.header['scaler_scale'], dtype=np.float32)
+
+        self.features = np.memmap(os.path.join(path, FEATURES_FILENAME), dtype=np.float32, mode='r',
+                                  shape=(self.rows, len(self.feature_order)))
+        self.targets = np.memmap(os.path.join(path, TARGETS_FILENAME), dtype=np.float32, mode='r',
+                                 shape=(self.rows,))
+
+        self.train_rows = self.header['train_rows']
+        self.train = (0, self.train_rows)
+        self.validation = (self.train_rows, self.rows)
+
+    @property
+    def n_features(self):
+        return len(self.feature_order)
+
+    def batches(self, batch_size, split=None, shuffle=False, rng=None):
+        """
+        (features, targets) slices of up to batch_size rows from a (start, stop) split
+        Each batch is a view of the mapped files; shuffle reorders whole batches
+        """
+        start, stop = split or (0, self.rows)
+        starts = np.arange(start, stop, batch_size)
+        if shuffle:
+            (rng or np.random.default_rng()).shuffle(starts)
+        for batch_start in starts.tolist():
+            batch_stop = min(batch_start + batch_size, stop)
+            yield self.features[batch_start:batch_stop], self.targets[batch_start:batch_stop]
+
+
+def train_epoch(model, optimizer, criterion, store, batch_size, rng=None):
+    """Train the model for one epoch over the store's training split; returns the mean batch loss"""
+    import torch
+
+    model.train()
+    total_loss = 0.0
+    num_batches = 0
+    for features, targets in store.batches(batch_size, store.train, shuffle=True, rng=rng):
+        if len(targets) < 2:  # BatchNorm needs more than one row in training mode
+            continue
+        optimizer.zero_grad()
+        loss = criterion(model(torch.from_numpy(features)), torch.from_numpy(targets))
+        loss.backward()
+        optimizer.step()
+        total_loss += loss.item()
+        num_batches += 1
+    return total_loss / max(num_batches, 1)
+
+
+def evaluate(model, store, split=None, batch_size=8192):
+    """(mse, rmse, mae) of the model over a split (the validation split by default)"""
+    import torch
+
+    model.eval()
+    squared_error = absolute_error = 0.0
+    count = 0
+    with torch.no_grad():
+        for features, targets in store.batches(batch_size, split or store.validation):
+            errors = model(torch.from_numpy(features)).reshape(-1).numpy().astype(np.float64) - targets
+            squared_error += float(np.dot(errors, errors))
+            absolute_error += float(np.abs(errors).sum())
+            count += len(targets)
+    mse = squared_error / max(count, 1)
+    return mse, float(np.sqrt(mse)), absolute_error / max(count, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped training feature store')
+    parser.add_argument('inputs', nargs='+', help='Cleaned CSVs, parquet files or clean_parquet.py output directories')
+    parser.add_argument('--output-dir', default=DEFAULT_STORE_DIR, help='Store directory')
+    parser.add_argument('--chunk-rows', type=int, default=500_000, help='Rows read and shuffled at a time')
+    parser.add_argument('--seed', type=int, default=42, help='Shuffle seed')
+    parser.add_argument('--val-fraction', type=float, default=0.2,
+                        help='Share of the rows held out for validation (excluded from the scaler statistics)')
+    parser.add_argument('--overwrite', action='store_true', help='Replace an existing store')
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.join(args.output_dir, HEADER_FILENAME)) and not args.overwrite:
+        parser.error(f"{args.output_dir} already holds a feature store (pass --overwrite to replace it)")
+
+    # Same feature layout, defaults and day numbering the API serves with
+    import predictionAPI
+
+    print(f"🚕 Building feature store from {len(args.inputs)} input(s) -> {args.output_dir}")
+    start_time = time.perf_counter()
+    header = build_store(args.inputs, args.output_dir, predictionAPI.feature_order,
+                         predictionAPI.FEATURE_DEFAULTS, predictionAPI.DAY_MAPPING,
+                         chunk_rows=args.chunk_rows, seed=args.seed, val_fraction=args.val_fraction)
+    elapsed = time.perf_counter() - start_time
+
+    size_mb = header['rows'] * (len(header['feature_order']) + 1) * 4 / 1024 / 1024
+    print(f"✅ {header['rows']:,} rows x {len(header['feature_order'])} features ({size_mb:.1f} MB) "
+          f"in {elapsed:.1f}s ({header['rows'] / elapsed:,.0f} rows/s)")
+    print(f"   {header['train_rows']:,} training / {header['rows'] - header['train_rows']:,} validation rows "
+          f"(scaler fit on the training rows)")
+    if header['dropped_rows']:
+        print(f"   Dropped {header['dropped_rows']:,} rows without a fare or with non-numeric features")
+    own_mb, _ = peak_rss_mb()
+    if own_mb is not None:
+        print(f"📊 Peak memory: {own_mb:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+"""
+Parallel hyperparameter search over TaxiFareModel
+Samples configurations of hidden sizes, dropout, learning rate and batch size
+and trains them with successive halving: every trial gets --min-epochs, the
+best 1/--eta by validation RMSE continue for --eta times as many epochs, and so
+on up to --max-epochs, so losing trials are pruned after a few epochs. Trials
+also keep the notebook's ReduceLROnPlateau and early stopping.
+
+Each rung runs on a process pool. Workers pin their torch threads and share
+one read-only feature store (built with feature_store.py) through the page
+cache; trial checkpoints travel between rungs as bytes. Every trial records
+its best validation RMSE/MAE and its inference latency (single-row p50/p99
+and per-row cost in a batch), and the run ends with the accuracy/latency
+Pareto front so a winner can be picked on both. Latency is measured after
+training, one architecture at a time with the pool closed and
+--latency-threads torch threads, so trials aren't timed against each other's
+training.
+
+An exported winner is loaded back through predictionAPI.load_from_files and
+must reproduce the trained model's fares, so a drift between the files written
+here and what the API reads fails the run.
+
+Usage (run from model):
+    python hyperparam_search.py --store feature_store --trials 27 --workers 4
+    python hyperparam_search.py --trials 9 --max-epochs 18 --output search.json --export-dir search_best
+"""
+
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import pickle
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+# Also puts model/api (TaxiFareModel, concurrency, predictionAPI) on sys.path
+from feature_store import DEFAULT_STORE_DIR, FeatureStore, evaluate, train_epoch
+
+SEARCH_SPACE = {
+    'hidden_sizes': [[64, 32], [128, 64], [128, 64, 32], [256, 128, 64], [256, 128, 64, 32]],
+    'dropout_rate': [0.0, 0.1, 0.2, 0.3],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+    'batch_size': [64, 256, 1024]
+}
+
+# Notebook training setup
+WEIGHT_DECAY = 1e-5
+LR_PATIENCE = 10
+EARLY_STOPPING_PATIENCE = 15
+
+LATENCY_REPEATS = 200
+LATENCY_BATCH_ROWS = 1024
+
+# Loaded once per worker process
+_store = None
+
+
+def sample_configs(trials, seed):
+    """`trials` distinct configurations drawn from SEARCH_SPACE (the whole grid if it is smaller)"""
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    if trials >= len(grid):
+        return grid
+    rng = np.random.default_rng(seed)
+    return [grid[i] for i in rng.choice(len(grid), size=trials, replace=False)]
+
+
+def rung_budgets(min_epochs, max_epochs, eta):
+    """Cumulative epochs at each successive halving rung, ending at max_epochs"""
+    budgets = []
+    epochs = min_epochs
+    while epochs < max_epochs:
+        budgets.append(epochs)
+        epochs *= eta
+    return budgets + [max_epochs]
+
+
+def _init_worker(store_path, torch_threads):
+    """Open the shared store and pin torch threads once per worker"""
+    global _store
+
+    from concurrency import configure_torch_threads
+
+    configure_torch_threads(torch_threads, 1)
+    _store = FeatureStore(store_path)
+
+
+def measure_latency(model, n_features, repeats=LATENCY_REPEATS, batch_rows=LATENCY_BATCH_ROWS):
+    """Single-row p50/p99 latency (ms) and per-row cost of a batch forward pass (µs) in eval mode"""
+    import torch
+
+    model.eval()
+    row = torch.zeros((1, n_features))
+    batch = torch.zeros((batch_rows, n_features))
+    with torch.no_grad():
+        for _ in range(20):
+            model(row)
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(row)
+            samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(10):
+            model(batch)
+        batch_seconds = (time.perf_counter() - start) / 10
+
+    p50, p99 = np.percentile(np.array(samples) * 1000, [50, 99])
+    return {'single_p50_ms': round(float(p50), 4), 'single_p99_ms': round(float(p99), 4),
+            'batch_row_us': round(batch_seconds / batch_rows * 1e6, 4)}
+
+
+def _run_trial(task):
+    """
+    Train one trial up to its rung budget, resuming from its checkpoint
+    Returns the updated trial record and the new checkpoint bytes
+    """
+    import torch
+
+    from taxi_fare_model import TaxiFareModel
+
+    trial, checkpoint, seed = task
+    config = trial['config']
+    torch.manual_seed(seed + trial['trial_id'])
+
+    model = TaxiFareModel(_store.n_features, config['hidden_sizes'], config['dropout_rate'])
+    optimizer = torch.optim.Adam(model.parameters(), lr=config['learning_rate'], weight_decay=WEIGHT_DECAY)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', patience=LR_PATIENCE)
+    criterion = torch.nn.MSELoss()
+    best_state = None
+    if checkpoint is not None:
+        state = torch.load(io.BytesIO(checkpoint), weights_only=False)
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+        scheduler.load_state_dict(state['scheduler'])
+        best_state = state['best_model']
+
+    trial = dict(trial)
+    rng = np.random.default_rng([seed, trial['trial_id'], trial['epochs']])
+    start = time.perf_counter()
+    while trial['epochs'] < trial['budget'] and not trial['stopped']:
+        train_epoch(model, optimizer, criterion, _store, config['batch_size'], rng)
+        mse, rmse, mae = evaluate(model, _store)
+        scheduler.step(mse)
+        trial['epochs'] += 1
+        trial['history'] = trial['history'] + [round(rmse, 5)]
+
+        if rmse < trial['val_rmse']:
+            trial.update(val_rmse=rmse, val_mae=mae, best_epoch=trial['epochs'], patience_counter=0)
+            best_state = {name: tensor.clone() for name, tensor in model.state_dict().items()}
+        else:
+            trial['patience_counter'] += 1
+            trial['stopped'] = trial['patience_counter'] >= EARLY_STOPPING_PATIENCE
+    trial['train_seconds'] += time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(), 'best_model': best_state}, buffer)
+    return trial, buffer.getvalue()
+
+
+def measure_trial_latencies(trials, n_features, torch_threads):
+    """
+    Record every trial's latency and parameter count, one architecture at a time
+    Run after training with the pool closed, so nothing else competes for the
+    CPU. Latency depends only on the hidden sizes, so trials sharing them share
+    one measurement.
+    """
+    import torch
+
+    from concurrency import configure_torch_threads
+    from taxi_fare_model import TaxiFareModel
+
+    configure_torch_threads(torch_threads, 1)
+    measured = {}
+    for trial in trials:
+        hidden_sizes = tuple(trial['config']['hidden_sizes'])
+        if hidden_sizes not in measured:
+            torch.manual_seed(0)
+            model = TaxiFareModel(n_features, list(hidden_sizes), trial['config']['dropout_rate'])
+            measured[hidden_sizes] = (measure_latency(model, n_features),
+                                      sum(parameter.numel() for parameter in model.parameters()))
+        trial['latency'], trial['parameters'] = measured[hidden_sizes]
+
+
+def pareto_front(trials):
+    """Trials no other trial beats on both validation RMSE and single-row p50 latency"""
+    ranked = sorted(trials, key=lambda t: (t['latency']['single_p50_ms'], t['val_rmse']))
+    front, best_rmse = [], math.inf
+    for trial in ranked:
+        if trial['val_rmse'] < best_rmse:
+            front.append(trial)
+            best_rmse = trial['val_rmse']
+    return front
+
+
+def export_trial(trial, checkpoint, store, export_dir):
+    """Write a trial's best weights with the API's artifact files (weights, config, scaler, feature order)"""
+    import torch
+    from sklearn.preprocessing import StandardScaler
+
+    os.makedirs(export_dir, exist_ok=True)
+    state = torch.load(io.BytesIO(checkpoint), weights_only=False)
+    torch.save(state['best_model'], os.path.join(export_dir, 'best_taxi_fare_model.pth'))
+
+    scaler = StandardScaler()
+    scaler.mean_ = store.scaler_mean.astype(np.float64)
+    scaler.scale_ = store.scaler_scale.astype(np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = store.n_features
+    scaler.n_samples_seen_ = store.train_rows
+
+    config = trial['config']
+    artifacts = {
+        'model_config.pkl': {'input_size': store.n_features, 'hidden_sizes': config['hidden_sizes'],
+                             'dropout_rate': config['dropout_rate'], 'final_rmse': trial['val_rmse'],
+                             'final_mae': trial['val_mae']},
+        'scaler.pkl': scaler,
+        'feature_order.pkl': list(store.feature_order)
+    }
+    for filename, artifact in artifacts.items():
+        with open(os.path.join(export_dir, filename), 'wb') as f:
+            pickle.dump(artifact, f)
+
+
+def verify_export(export_dir, store, rows=1000, tolerance=1e-3):
+    """
+    Load an exported trial the way the API does and check it reproduces the
+    trained model on validation rows
+    Raises ValueError when the API would serve something else (e.g. it fell
+    back to a dummy scaler or untrained weights); returns the max fare difference
+    """
+    import logging
+
+    import torch
+
+    import predictionAPI
+    from taxi_fare_model import TaxiFareModel
+
+    logging.getLogger('predictionAPI').setLevel(logging.ERROR)
+    state = predictionAPI.load_from_files(
+        os.path.join(export_dir, 'best_taxi_fare_model.pth'), os.path.join(export_dir, 'scaler.pkl'),
+        os.path.join(export_dir, 'model_config.pkl'), os.path.join(export_dir, 'feature_order.pkl'),
+        with_fare_table=False
+    )
+    if state.feature_engine.feature_order != list(store.feature_order):
+        raise ValueError(f"API loaded feature order {state.feature_engine.feature_order}, "
+                         f"the store has {store.feature_order}")
+
+    with open(os.path.join(export_dir, 'model_config.pkl'), 'rb') as f:
+        config = pickle.load(f)
+    reference = TaxiFareModel(store.n_features, config['hidden_sizes'], config['dropout_rate'])
+    reference.load_state_dict(torch.load(os.path.join(export_dir, 'best_taxi_fare_model.pth')))
+    reference.eval()
+
+    start, stop = store.validation
+    scaled = np.array(store.features[start:min(stop, start + rows)])
+    with torch.no_grad():
+        expected = reference(torch.from_numpy(scaled)).reshape(-1).numpy()
+    raw = scaled * store.scaler_scale + store.scaler_mean
+    served = predictionAPI.predict_raw_features(raw, state=state)
+
+    difference = float(np.max(np.abs(served - expected))) if len(expected) else 0.0
+    if not difference <= tolerance:
+        raise ValueError(f"Exported model served by the API differs from the trained model by up to "
+                         f"${difference:.4f} (tolerance ${tolerance})")
+    return difference
+
+
+def _describe(config):
+    hidden = 'x'.join(str(size) for size in config['hidden_sizes'])
+    return (f"{hidden:<16} drop {config['dropout_rate']:.1f} lr {config['learning_rate']:.0e} "
+            f"batch {config['batch_size']:>4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Successive halving search over TaxiFareModel configurations')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='Feature store built with feature_store.py')
+    parser.add_argument('--trials', type=int, default=27, help='Configurations sampled from the search space')
+    parser.add_argument('--min-epochs', type=int, default=2, help='Epochs every trial gets before pruning')
+    parser.add_argument('--max-epochs', type=int, default=18, help='Epochs for the trials that survive every rung')
+    parser.add_argument('--eta', type=int, default=3, help='Keep the best 1/eta trials at each rung')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--torch-threads', type=int, default=1, help='torch intra-op threads per worker')
+    parser.add_argument('--latency-threads', type=int, default=1,
+                        help='torch intra-op threads while measuring latency (match the API workers)')
+    parser.add_argument('--seed', type=int, default=42, help='Sampling and training seed')
+    parser.add_argument('--output', help='Save every trial as JSON')
+    parser.add_argument('--export-dir', help='Write the lowest-RMSE trial as API artifacts to this directory')
+    parser.add_argument('--max-latency-ms', type=float,
+                        help='Only export trials whose single-row p50 latency is within this limit')
+    args = parser.parse_args()
+    if args.eta < 2 or args.min_epochs < 1 or args.max_epochs < args.min_epochs:
+        parser.error("Need --eta >= 2 and 1 <= --min-epochs <= --max-epochs")
+
+    store = FeatureStore(args.store)
+    configs = sample_configs(args.trials, args.seed)
+    budgets = rung_budgets(args.min_epochs, args.max_epochs, args.eta)
+    trials = [{'trial_id': i, 'config': config, 'budget': 0, 'epochs': 0, 'history': [],
+               'val_rmse': math.inf, 'val_mae': math.inf, 'best_epoch': 0, 'patience_counter': 0,
+               'stopped': False, 'pruned_at': None, 'train_seconds': 0.0, 'latency': None, 'parameters': None}
+              for i, config in enumerate(configs)]
+    checkpoints = {}
+
+    print(f"🚕 Searching {len(trials)} configurations on {store.train_rows:,} training / "
+          f"{store.rows - store.train_rows:,} validation rows")
+    print(f"   Rungs at {budgets} epochs, keeping 1/{args.eta}; {args.workers} workers x "
+          f"{args.torch_threads} torch threads")
+    start_time = time.perf_counter()
+
+    active = list(trials)
+    with Pool(args.workers, initializer=_init_worker,
+              initargs=(args.store, args.torch_threads)) as pool:
+        for rung, budget in enumerate(budgets):
+            for trial in active:
+                trial['budget'] = budget
+            tasks = [(trial, checkpoints.get(trial['trial_id']), args.seed) for trial in active]
+            for updated, checkpoint in pool.imap_unordered(_run_trial, tasks):
+                trials[updated['trial_id']].update(updated)
+                checkpoints[updated['trial_id']] = checkpoint
+
+            active.sort(key=lambda t: t['val_rmse'])
+            print(f"   Rung {rung + 1}/{len(budgets)} ({budget} epochs): best RMSE {active[0]['val_rmse']:.4f} "
+                  f"({_describe(active[0]['config'])}) after {time.perf_counter() - start_time:.1f}s")
+            if rung == len(budgets) - 1:
+                break
+
+            survivors = max(1, len(active) // args.eta)
+            for trial in active[survivors:]:
+                trial['pruned_at'] = budget
+                checkpoints.pop(trial['trial_id'], None)
+            active = active[:survivors]
+
+    elapsed = time.perf_counter() - start_time
+    epochs = sum(trial['epochs'] for trial in trials)
+    print(f"✅ {len(trials)} trials, {epochs} epochs in {elapsed:.1f}s "
+          f"({len(trials) * args.max_epochs} without pruning)")
+
+    latency_start = time.perf_counter()
+    measure_trial_latencies(trials, store.n_features, args.latency_threads)
+    print(f"   Latency measured with the pool idle on {args.latency_threads} torch thread(s) "
+          f"in {time.perf_counter() - latency_start:.1f}s")
+
+    print(f"\n📊 {'rank':>4}  {'configuration':<48} {'epochs':>6} {'val RMSE':>9} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'µs/row':>7}")
+    ranked = sorted(trials, key=lambda t: t['val_rmse'])
+    for rank, trial in enumerate(ranked[:10], start=1):
+        latency = trial['latency']
+        status = f"pruned@{trial['pruned_at']}" if trial['pruned_at'] else ''
+        print(f"   {rank:>4}  {_describe(trial['config']):<48} {trial['epochs']:>6} {trial['val_rmse']:9.4f} "
+              f"{latency['single_p50_ms']:8.3f} {latency['single_p99_ms']:8.3f} {latency['batch_row_us']:7.2f} {status}")
+
+    front = pareto_front(trials)
+    print("\n   Accuracy/latency Pareto front:")
+    for trial in front:
+        print(f"   #{trial['trial_id']:<3} {_describe(trial['config'])}  RMSE {trial['val_rmse']:.4f}  "
+              f"p50 {trial['latency']['single_p50_ms']:.3f} ms")
+
+    if args.export_dir:
+        eligible = [trial for trial in ranked if trial['pruned_at'] is None and
+                    (args.max_latency_ms is None or trial['latency']['single_p50_ms'] <= args.max_latency_ms)]
+        if not eligible:
+            print(f"⚠️ No fully trained trial within {args.max_latency_ms} ms; nothing exported")
+        else:
+            winner = eligible[0]
+            export_trial(winner, checkpoints[winner['trial_id']], store, args.export_dir)
+            difference = verify_export(args.export_dir, store)
+            print(f"✅ Exported trial #{winner['trial_id']} ({_describe(winner['config'])}) to {args.export_dir} "
+                  f"(API load round trip within ${difference:.5f})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'search_space': SEARCH_SPACE, 'rungs': budgets, 'eta': args.eta, 'store': store.header,
+                       'elapsed_seconds': round(elapsed, 1), 'trials': trials,
+                       'pareto_front': [trial['trial_id'] for trial in front]}, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark of the training data layers
+Runs one training epoch (TaxiFareModel, Adam, MSELoss) in a fresh process per
+loader, so each peak RSS is measured on its own:
+- notebook: the notebook's TaxiFareDataset (DataFrame copy, day mapping,
+  StandardScaler, tensor copy) behind a shuffling DataLoader
+- store: contiguous slices of the memory-mapped feature store
+and reports setup time, epoch time, rows/s and peak memory for each.
+
+Usage (run from model):
+    python feature_store.py cleaned_data/cleaned_yellow_d1.csv --output-dir feature_store
+    python loader_benchmark.py --csv cleaned_data/cleaned_yellow_d1.csv --store feature_store
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+TRIPS_CSV = os.path.join(MODEL_DIR, 'cleaned_data', 'cleaned_yellow_d1.csv')
+
+# Feature derivation, the model definition and the pool helpers are shared with the API
+API_DIR = os.path.join(MODEL_DIR, 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from concurrency import peak_rss_mb
+
+LOADERS = ('notebook', 'store')
+
+
+def _notebook_loader(csv_path, feature_order, batch_size):
+    """The notebook's train split, TaxiFareDataset and DataLoader"""
+    import pandas as pd
+    import torch
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from torch.utils.data import DataLoader, Dataset
+
+    class TaxiFareDataset(Dataset):
+        def __init__(self, features, targets):
+            self.features = features.copy()
+            self.targets = targets.copy()
+            day_mapping = {'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+                           'Friday': 4, 'Saturday': 5, 'Sunday': 6}
+            self.features['pickup_day'] = self.features['pickup_day'].map(day_mapping)
+            self.features = self.features.values.astype(np.float32)
+            self.targets = self.targets.values.astype(np.float32)
+            self.scaler = StandardScaler()
+            self.features = self.scaler.fit_transform(self.features)
+            self.x_data = torch.tensor(self.features, dtype=torch.float32)
+            self.y_data = torch.tensor(self.targets, dtype=torch.float32)
+
+        def __len__(self):
+            return len(self.x_data)
+
+        def __getitem__(self, idx):
+            return self.x_data[idx], self.y_data[idx]
+
+    df = pd.read_csv(csv_path, index_col=0)
+    X = df[[column for column in feature_order if column in df.columns]]
+    X_train, _, y_train, _ = train_test_split(X, df['fare_amount'], test_size=0.2, random_state=42)
+    dataset = TaxiFareDataset(X_train, y_train)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=True, drop_last=True), X.shape[1], len(dataset)
+
+
+def run_loader(loader, csv_path, store_path, batch_size):
+    """Set up one loader and train one epoch in this process"""
+    import torch
+
+    from feature_store import FeatureStore, train_epoch
+    from taxi_fare_model import TaxiFareModel
+
+    torch.manual_seed(42)
+    start = time.perf_counter()
+    if loader == 'notebook':
+        feature_order = FeatureStore(store_path).feature_order
+        data_loader, input_size, rows = _notebook_loader(csv_path, feature_order, batch_size)
+    else:
+        store = FeatureStore(store_path)
+        input_size, rows = store.n_features, store.train_rows
+    setup_seconds = time.perf_counter() - start
+
+    model = TaxiFareModel(input_size)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001, weight_decay=1e-5)
+    criterion = torch.nn.MSELoss()
+
+    start = time.perf_counter()
+    if loader == 'notebook':
+        model.train()
+        for features, targets in data_loader:
+            optimizer.zero_grad()
+            loss = criterion(model(features), targets)
+            loss.backward()
+            optimizer.step()
+    else:
+        train_epoch(model, optimizer, criterion, store, batch_size, rng=np.random.default_rng(42))
+    epoch_seconds = time.perf_counter() - start
+
+    own_mb, _ = peak_rss_mb()
+    return {'loader': loader, 'rows': rows, 'features': input_size, 'setup_seconds': round(setup_seconds, 3),
+            'epoch_seconds': round(epoch_seconds, 3), 'rows_per_second': round(rows / epoch_seconds, 1),
+            'peak_rss_mb': round(own_mb, 1) if own_mb is not None else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the notebook DataLoader with the feature store')
+    parser.add_argument('--csv', default=TRIPS_CSV, help='Cleaned trips CSV for the notebook loader')
+    parser.add_argument('--store', default=os.path.join(MODEL_DIR, 'feature_store'),
+                        help='Feature store built from the same data')
+    parser.add_argument('--loaders', nargs='+', choices=LOADERS, default=list(LOADERS))
+    parser.add_argument('--batch-size', type=int, default=64, help='Training batch size')
+    parser.add_argument('--output', help='Save results as JSON')
+    parser.add_argument('--child', choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_loader(args.child, args.csv, args.store, args.batch_size)))
+        return
+
+    print(f"🚕 Loader benchmark: one epoch at batch size {args.batch_size}")
+    print(f"   {'loader':<9} {'rows':>11} {'setup s':>8} {'epoch s':>8} {'rows/s':>11} {'peak MB':>8}")
+    results = []
+    for loader in args.loaders:
+        command = [sys.executable, os.path.abspath(__file__), '--child', loader, '--csv', args.csv,
+                   '--store', args.store, '--batch-size', str(args.batch_size)]
+        output = subprocess.run(command, cwd=MODEL_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"   {loader:<9} {result['rows']:>11,} {result['setup_seconds']:8.2f} {result['epoch_seconds']:8.2f} "
+              f"{result['rows_per_second']:>11,.0f} {result['peak_rss_mb'] or 0:8.0f}")
+
+    if len(results) == 2:
+        notebook, store = results
+        print(f"📊 Store epoch {notebook['epoch_seconds'] / store['epoch_seconds']:.1f}x faster, "
+              f"peak memory {notebook['peak_rss_mb']:.0f} MB -> {store['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'batch_size': args.batch_size, 'results': results}, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()